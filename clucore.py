@@ -4,12 +4,92 @@
 # Fixed parsing issues and enhanced with new features
 
 import re
-from typing import List, Dict, Any, Union, Optional
-from dataclasses import dataclass
+import os
+import io
+import sys
+import time
+import struct
+import pickle
+import asyncio
+import threading
+import contextlib
+import mmap
+import operator
+from itertools import islice
+from typing import List, Dict, Any, Union, Optional, Set, Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from program import Instruction, Program, Function
 
 
+# Control-flow signals returned by Interpreter.execute_instruction
+SIGNAL_RETURN = "return"
+SIGNAL_BREAK = "break"
+SIGNAL_CONTINUE = "continue"
+
+# Marks a variable lookup that found nothing
+_MISSING = object()
+
+# Comparison keywords and their native implementations
+COMPARISON_OPERATORS = {
+    "greater": operator.gt,
+    "less": operator.lt,
+    "equal": operator.eq,
+    "greater_equal": operator.ge,
+    "less_equal": operator.le,
+    "not_equal": operator.ne,
+}
+
+# Arithmetic keywords and symbols, by canonical name
+OPERATOR_NAMES = {
+    "+": "add", "add": "add",
+    "-": "subtract", "subtract": "subtract",
+    "*": "multiply", "multiply": "multiply",
+    "/": "divide", "divide": "divide",
+}
+
+
+def _int_divide(left: int, right: int) -> int:
+    if right == 0:
+        raise CLUError("Division by zero")
+    return left // right
+
+
+def _float_divide(left: float, right: float) -> float:
+    if right == 0:
+        raise CLUError("Division by zero")
+    return left / right
+
+
+# Native implementations for (operator, left type, right type), matching Interpreter._apply_operator
+SPECIALIZED_OPERATORS = {
+    ("add", int, int): operator.add,
+    ("add", float, float): operator.add,
+    ("add", int, float): operator.add,
+    ("add", float, int): operator.add,
+    ("add", str, str): operator.add,
+    ("subtract", int, int): operator.sub,
+    ("subtract", float, float): operator.sub,
+    ("subtract", int, float): operator.sub,
+    ("subtract", float, int): operator.sub,
+    ("multiply", int, int): operator.mul,
+    ("multiply", float, float): operator.mul,
+    ("multiply", int, float): operator.mul,
+    ("multiply", float, int): operator.mul,
+    ("divide", int, int): _int_divide,
+    ("divide", float, float): _float_divide,
+    ("divide", int, float): _float_divide,
+    ("divide", float, int): _float_divide,
+}
+
+# Tokens of an expression string (shared by the interpreter and static analysis)
+EXPRESSION_TOKEN_RE = re.compile(r'\w+\[[^\]]+\]|\'.*?\'|".*?"|\d+\.\d+|\d+|\w+|[^\s\w]')
+
+
 @dataclass
 class CLUError(Exception):
     """Base exception for CLU runtime errors"""
@@ -37,13 +117,508 @@ class CLUIndexError(CLUError):
     pass
 
 
+class FileStream:
+    """Lazy, re-iterable view over a local file for use in foreach and list builtins.
+
+    Modes:
+        lines   - each line as a char (newline stripped)
+        numbers - every number in the file, in reading order
+        rows    - each line as a list of numbers
+    """
+
+    MMAP_THRESHOLD = 64 * 1024 * 1024  # Files at least this big are mapped instead of read
+    CHUNK_LINES = 4096  # Lines parsed per bulk conversion step
+
+    def __init__(self, path: str, mode: str = "lines"):
+        if not os.path.isfile(path):
+            raise CLUError(f"Cannot open file '{path}': no such file")
+        self.path = path
+        self.mode = mode
+
+    def __repr__(self):
+        return f"{self.mode} of '{self.path}'"
+
+    def _raw_lines(self):
+        """Yield decoded lines without their line endings"""
+        if os.path.getsize(self.path) >= self.MMAP_THRESHOLD:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b""):
+                    yield line.decode("utf-8", errors="replace").rstrip("\r\n")
+        else:
+            with open(self.path, "r", encoding="utf-8", errors="replace", buffering=1 << 16) as f:
+                for line in f:
+                    yield line.rstrip("\r\n")
+
+    def _chunks(self):
+        """Group lines so numeric conversion happens a chunk at a time"""
+        lines = self._raw_lines()
+        while True:
+            chunk = list(islice(lines, self.CHUNK_LINES))
+            if not chunk:
+                return
+            yield chunk
+
+    @staticmethod
+    def _parse_numbers(fields: List[str]) -> List[Union[int, float]]:
+        try:
+            return list(map(int, fields))
+        except ValueError:
+            pass
+        try:
+            return [int(f) if f.lstrip("-").isdigit() else float(f) for f in fields]
+        except ValueError as e:
+            raise CLUTypeError(f"Non-numeric value in file: {e}")
+
+    def __iter__(self):
+        if self.mode == "lines":
+            return self._raw_lines()
+        elif self.mode == "numbers":
+            return self._iter_numbers()
+        return self._iter_rows()
+
+    def _iter_numbers(self):
+        for chunk in self._chunks():
+            # One split and one conversion pass for the whole chunk
+            yield from self._parse_numbers(" ".join(chunk).replace(",", " ").split())
+
+    def _iter_rows(self):
+        for chunk in self._chunks():
+            for line in chunk:
+                fields = line.replace(",", " ").split()
+                if fields:
+                    yield self._parse_numbers(fields)
+
+
+def _memo_key(values: List[Any]) -> tuple:
+    """A hashable cache key for argument values: each value is tagged with its type, so 1, 1.0 and
+    True stay apart, and lists, maps and sets are frozen into tuples"""
+    return tuple(_frozen(value) for value in values)
+
+
+def _frozen(value: Any) -> tuple:
+    value_type = type(value)
+    if value_type is list:
+        return list, tuple(_frozen(item) for item in value)
+    if value_type is dict:
+        # Insertion order is kept: a foreach over the map sees it
+        return dict, tuple((_frozen(key), _frozen(item)) for key, item in value.items())
+    if value_type is set:
+        return set, frozenset(_frozen(item) for item in value)
+    return value_type, value
+
+
+class MemoCache:
+    """Bounded LRU cache of a memoized function's results, keyed by argument values.
+
+    Results are stored and handed out as copies, so a caller changing a returned list or map
+    cannot change what later calls get.
+    """
+
+    DEFAULT_SIZE = 1024
+
+    def __init__(self, maxsize: Optional[int] = None):
+        self.maxsize = maxsize if maxsize else self.DEFAULT_SIZE
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return (found, value), refreshing the entry's recency on a hit"""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, _deep_copy(self.entries[key], {})
+        self.misses += 1
+        return False, None
+
+    def put(self, key, value):
+        self.entries[key] = _deep_copy(value, {})
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self.entries), "maxsize": self.maxsize}
+
+
+class StringBuilder:
+    """Append-only char value behind 'var s is s + ...' so repeated concatenation is linear.
+
+    Builders share one chunk list and each sees only its first `count` chunks, so a
+    value saved elsewhere (e.g. across a function call) never observes later appends.
+    """
+
+    def __init__(self, chunks: List[str], count: int):
+        self.chunks = chunks
+        self.count = count
+
+    @classmethod
+    def from_string(cls, text: str) -> "StringBuilder":
+        return cls([text], 1)
+
+    def append(self, pieces: List[str]) -> "StringBuilder":
+        if len(self.chunks) == self.count:
+            chunks = self.chunks
+        else:
+            # Someone else appended past our view: branch off a private copy
+            chunks = self.chunks[:self.count]
+        chunks.extend(pieces)
+        return StringBuilder(chunks, len(chunks))
+
+    def __str__(self):
+        if len(self.chunks) == self.count:
+            return "".join(self.chunks)
+        return "".join(self.chunks[:self.count])
+
+
+class InlineCache:
+    """Operand-type cache of one 'var x is A op B' instruction (adaptive specialization).
+
+    The instruction runs generically while warming up. Once it has seen the same operand
+    types WARMUP times in a row it switches to the native operator for those types, guarded
+    by a type check; a failed guard deoptimizes it back to warming up. Sites that keep
+    changing types stay generic after MAX_DEOPTS.
+    """
+
+    WARMUP = 8
+    MAX_DEOPTS = 4
+
+    __slots__ = ("op", "types", "streak", "fast", "deopts", "hits", "misses", "generic", "hits_by_types",
+                 "_counted_hits", "proven")
+
+    def __init__(self, op: str):
+        self.op = op
+        self.types: Optional[tuple] = None
+        self.streak = 0
+        self.fast = None
+        self.deopts = 0
+        self.hits = 0
+        self.misses = 0
+        self.generic = 0
+        self.hits_by_types: Optional[Dict[tuple, int]] = None  # Hits of earlier specializations
+        self._counted_hits = 0
+        self.proven = False  # Operand types proven statically, so the guard is skipped
+
+    def observe(self, left_type: type, right_type: type):
+        """Record the operand types of a generic execution, specializing when they are stable"""
+        self.generic += 1
+        if self.deopts >= self.MAX_DEOPTS:
+            return
+        if (left_type, right_type) == self.types:
+            self.streak += 1
+        else:
+            self.types = (left_type, right_type)
+            self.streak = 1
+        if self.streak >= self.WARMUP:
+            self.fast = SPECIALIZED_OPERATORS.get((self.op, left_type, right_type))
+
+    def deoptimize(self):
+        self._settle_hits()
+        self.fast = None
+        self.streak = 0
+        self.deopts += 1
+        self.misses += 1
+
+    def _settle_hits(self):
+        if self.types and self.hits > self._counted_hits:
+            if self.hits_by_types is None:
+                self.hits_by_types = {}
+            self.hits_by_types[self.types] = self.hits_by_types.get(self.types, 0) + self.hits - self._counted_hits
+        self._counted_hits = self.hits
+
+    def type_hits(self) -> Dict[tuple, int]:
+        """Fast-path hits per (left type, right type)"""
+        self._settle_hits()
+        return self.hits_by_types or {}
+
+    def disable(self):
+        """Never specialize (e.g. an operand names a function)"""
+        self.fast = None
+        self.deopts = self.MAX_DEOPTS
+
+
+class CallProfile:
+    """Argument profile of an auto-memoization candidate, sampled over its first calls"""
+
+    SAMPLE_CALLS = 64
+    REPEAT_RATIO = 0.25  # Share of sampled calls that must repeat earlier arguments
+
+    def __init__(self):
+        self.calls = 0
+        self.distinct: Set[Any] = set()
+
+    def record(self, key) -> bool:
+        """Record one call, returning True once the sample is complete"""
+        self.calls += 1
+        self.distinct.add(key)
+        return self.calls >= self.SAMPLE_CALLS
+
+    def shows_repeats(self) -> bool:
+        return self.calls > 0 and (self.calls - len(self.distinct)) / self.calls >= self.REPEAT_RATIO
+
+
+class StepFrame:
+    """One active block of the stepping interpreter: the program, a loop body or a called function"""
+
+    def __init__(self, kind: str, instr: Optional[Instruction], body: List[Instruction], depth: int):
+        self.kind = kind  # 'main', 'call', 'repeat' or 'iterate'
+        self.instr = instr  # The loop or call instruction that opened the frame
+        self.body = body
+        self.index = 0
+        self.depth = depth  # execution_stack depth to restore when the block is left
+        self.iterations = 0
+        self.items = None  # Iterator feeding 'var' (foreach and counted repeat)
+        self.var: Optional[str] = None
+        self.increment_index = -1  # Counted repeat: the counter update, done natively
+        self.next_counter = None
+        self.saved_vars: Optional[Dict[str, Any]] = None
+
+
+# Builtin registry, shared by every interpreter and by the static passes
+
+@dataclass(frozen=True)
+class Builtin:
+    """A builtin function, called as 'name of a' or 'name of a, b'"""
+    name: str
+    func: Callable[..., Any]
+    arity: int = 1
+    arg_types: tuple = ()  # Accepted Python types per argument, None accepts anything
+    result: str = "any"  # Static result type, in TypeInferencer's type names
+    pure: bool = False  # No side effects and no reads besides its arguments (foldable, cacheable, parallel-safe)
+    cost: str = "constant"  # 'constant', 'linear', 'nlogn' or 'io': a hint for optimizers
+    permutes: str = ""  # 'sort' or 'reverse' when the result reorders the argument into a list
+    # True when the result never depends on the order of the argument's elements; 'uniform' when it
+    # does not for all ints or all strings, but may otherwise (float sums round, ties pick by position)
+    order_free: Union[bool, str] = False
+    picks: Optional[int] = None  # Index of the argument's element the result is (first/last)
+
+    def __call__(self, *args):
+        for value, accepted in zip(args, self.arg_types):
+            if accepted is not None and not isinstance(value, accepted):
+                _type_error(self.name, value)
+        return self.func(*args)
+
+
+BUILTINS: Dict[str, Builtin] = {}
+
+
+def register_builtin(name: str, func: Optional[Callable[..., Any]] = None, *, arity: int = 1,
+                     arg_types: tuple = (), result: str = "any", pure: bool = False, cost: str = "constant",
+                     permutes: str = "", order_free: Union[bool, str] = False, picks: Optional[int] = None):
+    """Make func callable from CLU as 'name of ...' in every interpreter (also usable as a decorator)"""
+    if not re.fullmatch(r'[A-Za-z_]\w*', name) or name == "range":
+        raise ValueError(f"Invalid builtin name {name!r}")
+    if arity < 1:
+        raise ValueError("Builtins take at least one argument")
+    if permutes not in ("", "sort", "reverse") or order_free not in (False, True, "uniform") \
+            or (permutes or picks is not None) and arity != 1:
+        raise ValueError(f"Invalid fusion metadata for builtin {name!r}")
+
+    def register(f):
+        BUILTINS[name] = Builtin(name, f, arity, tuple(arg_types), result, pure, cost, permutes, order_free, picks)
+        return f
+
+    return register(func) if func is not None else register
+
+
+def _is_numeric_sequence(value: Any) -> bool:
+    """Check for a list of numbers; ranges and number streams are numeric so skip the element scan"""
+    if isinstance(value, range):
+        return True
+    if isinstance(value, FileStream):
+        return value.mode == "numbers"
+    return isinstance(value, list) and all(isinstance(i, (int, float)) for i in value)
+
+
+def _is_uniform(value: Any) -> bool:
+    """Check for all ints or all strings, where equal elements cannot be told apart"""
+    if isinstance(value, range):
+        return True
+    return all(type(i) is int for i in value) or all(type(i) is str for i in value)
+
+
+def _is_orderable(value: Any) -> bool:
+    """Check that sorting cannot fail: all numbers or all strings"""
+    if isinstance(value, range):
+        return True
+    return all(isinstance(i, (int, float)) for i in value) or all(isinstance(i, str) for i in value)
+
+
+def _type_error(func_name: str, value: Any) -> None:
+    raise CLUTypeError(f"Function '{func_name}' cannot be applied to {type(value).__name__}: {value}")
+
+
+def _to_string(value: Any) -> str:
+    """Convert any value to string"""
+    if isinstance(value, str):
+        return value
+    elif isinstance(value, (int, float)):
+        return str(value)
+    elif isinstance(value, list):
+        return "[" + ", ".join(_to_string(item) for item in value) + "]"
+    elif isinstance(value, dict):
+        return "{" + ", ".join(f"{_to_string(k)}: {_to_string(v)}" for k, v in value.items()) + "}"
+    elif isinstance(value, set):
+        # Sorted by text so output does not depend on hash order
+        return "{" + ", ".join(sorted(_to_string(item) for item in value)) + "}"
+    elif isinstance(value, range):
+        return f"range of {value.start} to {value.stop - 1}"
+    elif isinstance(value, FileStream):
+        return repr(value)
+    else:
+        return str(value)
+
+
+def _to_int(value: Any) -> int:
+    """Convert value to integer"""
+    if isinstance(value, int):
+        return value
+    elif isinstance(value, float):
+        return int(value)
+    elif isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            raise CLUTypeError(f"Cannot convert '{value}' to integer")
+    else:
+        raise CLUTypeError(f"Cannot convert {type(value).__name__} to integer")
+
+
+def _to_float(value: Any) -> float:
+    """Convert value to float"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    elif isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            raise CLUTypeError(f"Cannot convert '{value}' to float")
+    else:
+        raise CLUTypeError(f"Cannot convert {type(value).__name__} to float")
+
+
+def _contains(container: Any, item: Any) -> bool:
+    """Check if container contains item"""
+    if isinstance(container, (dict, set)):
+        # Hashed membership: constant time
+        return _check_key(item) in container
+    if isinstance(container, (list, str, range)):
+        return item in container
+    else:
+        raise CLUTypeError(f"Contains operation not supported for {type(container).__name__}")
+
+
+def _check_key(key: Any) -> Any:
+    """Map keys and set items must be hashable values (chars, numbers, booleans)"""
+    if isinstance(key, (list, dict, set)):
+        raise CLUTypeError(f"{type(key).__name__} cannot be used as a map key or set item")
+    return key
+
+
+def _to_set(value: Any) -> set:
+    """Build a set from a list, range, map (its keys) or file of lines"""
+    if isinstance(value, set):
+        return value
+    if isinstance(value, (list, range, dict, FileStream)):
+        return {_check_key(item) for item in value}
+    return _type_error("set", value)
+
+
+def _map_get(mapping: Any, key: Any) -> Any:
+    """Look up key in a map"""
+    if not isinstance(mapping, dict):
+        _type_error("get", mapping)
+    try:
+        return mapping[_check_key(key)]
+    except KeyError:
+        raise CLUIndexError(f"Key {_to_string(key)!r} not found in map")
+
+
+def _map_has(mapping: Any, key: Any) -> bool:
+    """Check if a map has key"""
+    if not isinstance(mapping, dict):
+        _type_error("has", mapping)
+    return _check_key(key) in mapping
+
+
+def _to_bool(value: Any) -> bool:
+    """Convert value to boolean"""
+    if isinstance(value, bool):
+        return value
+    elif isinstance(value, (int, float)):
+        return value != 0
+    elif isinstance(value, str):
+        return value != ""
+    elif isinstance(value, list):
+        return len(value) > 0
+    return bool(value)
+
+
+SEQUENCE = (list, range)
+SIZED = (list, str, range, dict, set)
+
+register_builtin("sum", lambda x: sum(x) if _is_numeric_sequence(x) else _type_error("sum", x),
+                 result="number", cost="linear", order_free="uniform", pure=True)
+register_builtin("max", lambda x: max(x) if _is_numeric_sequence(x) and x else _type_error("max", x),
+                 result="number", cost="linear", order_free="uniform", pure=True)
+register_builtin("min", lambda x: min(x) if _is_numeric_sequence(x) and x else _type_error("min", x),
+                 result="number", cost="linear", order_free="uniform", pure=True)
+register_builtin("average", lambda x: sum(x) / len(x) if _is_numeric_sequence(x) and x else _type_error("average", x),
+                 arg_types=(SEQUENCE,), result="float", cost="linear", order_free="uniform", pure=True)
+register_builtin("len", len, arg_types=(SIZED,), result="int", order_free=True, pure=True)
+register_builtin("sorted", sorted, arg_types=((list, range, set),), result="list", cost="nlogn", permutes="sort",
+                 pure=True)
+register_builtin("reversed", lambda x: list(reversed(x)), arg_types=(SEQUENCE,), result="list", cost="linear",
+                 permutes="reverse", pure=True)
+register_builtin("first", lambda x: x[0] if x else _type_error("first", x), arg_types=(SEQUENCE,), picks=0, pure=True)
+register_builtin("last", lambda x: x[-1] if x else _type_error("last", x), arg_types=(SEQUENCE,), picks=-1, pure=True)
+
+# Conversions
+register_builtin("str", _to_string, result="str", cost="linear", pure=True)
+register_builtin("int", _to_int, pure=True)
+register_builtin("float", _to_float, pure=True)
+register_builtin("bool", _to_bool, result="bool", pure=True)
+
+# Booleans and utilities
+register_builtin("all", all, arg_types=(SEQUENCE,), result="bool", cost="linear", order_free=True, pure=True)
+register_builtin("any", any, arg_types=(SEQUENCE,), result="bool", cost="linear", order_free=True, pure=True)
+register_builtin("is_bool", lambda x: isinstance(x, bool), result="bool", pure=True)
+register_builtin("type", lambda x: type(x).__name__, result="str", pure=True)
+register_builtin("empty", lambda x: len(x) == 0 if isinstance(x, SIZED) else False, result="bool", order_free=True,
+                 pure=True)
+register_builtin("contains", _contains, arity=2, result="bool", cost="linear", pure=True)
+
+# Maps
+register_builtin("keys", list, arg_types=(dict,), result="list", cost="linear", pure=True)
+register_builtin("values", lambda x: list(x.values()), arg_types=(dict,), result="list", cost="linear", pure=True)
+register_builtin("get", _map_get, arity=2, pure=True)
+register_builtin("has", _map_has, arity=2, result="bool", pure=True)
+
+# Sets
+register_builtin("set", _to_set, result="set", cost="linear", order_free="uniform", pure=True)
+register_builtin("union", lambda a, b: _to_set(a) | _to_set(b), arity=2, result="set", cost="linear", pure=True)
+register_builtin("intersection", lambda a, b: _to_set(a) & _to_set(b), arity=2, result="set", cost="linear", pure=True)
+register_builtin("difference", lambda a, b: _to_set(a) - _to_set(b), arity=2, result="set", cost="linear", pure=True)
+
+# File input (lazy, constant memory)
+register_builtin("lines", lambda x: FileStream(x, "lines"), arg_types=(str,), result="file", pure=False, cost="io")
+register_builtin("numbers", lambda x: FileStream(x, "numbers"), arg_types=(str,), result="file", pure=False, cost="io")
+register_builtin("rows", lambda x: FileStream(x, "rows"), arg_types=(str,), result="file", pure=False, cost="io")
+
+# Builtins every process has after importing this module (worker processes lack ones registered later)
+STANDARD_BUILTINS = frozenset(BUILTINS)
+
+
 class Tokenizer:
-    def __init__(self, lines: List[str]):
+    def __init__(self, lines: Iterable[str]):
         self.lines = lines
         self.token_pattern = r'\d+\.\d+|\w+\([^\)]+\)|\w+\[[^\]]+\]|->|\w+(?:/\w+)*|".*?"|\'.*?\'|\d+|\w+|[^\s\w]'
 
     def tokenize(self) -> List[tuple]:
-        tokenized = []
+        return list(self.iter_tokens())
+
+    def iter_tokens(self) -> Iterator[tuple]:
+        """(tokens, line number) for each non-blank line, reading the lines only as far as needed"""
         for line_num, line in enumerate(self.lines, 1):
             # Strip comments and whitespace
             line = re.sub(r'#.*', '', line).strip()
@@ -51,47 +626,125 @@ class Tokenizer:
                 continue
 
             try:
-                tokens = re.findall(self.token_pattern, line)
-                if tokens:
-                    tokenized.append((tokens, line_num))
+                # Interned, so the many copies of a name or keyword share one string
+                tokens = list(map(sys.intern, re.findall(self.token_pattern, line)))
             except re.error as e:
                 raise CLUError(f"Tokenization error: {e}", line_num)
+            if tokens:
+                yield tokens, line_num
 
-        return tokenized
 
+class ConditionParser:
+    """Parses a condition into a boolean expression tree, with not > and > or and parentheses.
+
+    Nodes are tuples:
+        ("or", children)  ("and", children)  ("not", child)
+        ("compare", left_tokens, op, right_tokens)  ("value", tokens)  ("const", bool)
+    """
+
+    def parse(self, tokens: List[str]) -> tuple:
+        self.tokens = tokens
+        self.pos = 0
+        if not tokens:
+            raise CLUError("Empty condition")
+        node = self._parse_or()
+        if self.pos != len(tokens):
+            raise CLUError(f"Unexpected '{tokens[self.pos]}' in condition")
+        return node
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _parse_or(self) -> tuple:
+        children = [self._parse_and()]
+        while self._peek() == "or":
+            self.pos += 1
+            children.append(self._parse_and())
+        return children[0] if len(children) == 1 else ("or", tuple(children))
+
+    def _parse_and(self) -> tuple:
+        children = [self._parse_not()]
+        while self._peek() == "and":
+            self.pos += 1
+            children.append(self._parse_not())
+        return children[0] if len(children) == 1 else ("and", tuple(children))
+
+    def _parse_not(self) -> tuple:
+        if self._peek() == "not":
+            self.pos += 1
+            return ("not", self._parse_not())
+        return self._parse_primary()
+
+    def _parse_primary(self) -> tuple:
+        if self._peek() == "(":
+            self.pos += 1
+            node = self._parse_or()
+            if self._peek() != ")":
+                raise CLUError("Missing ')' in condition")
+            self.pos += 1
+            return node
+
+        # An operand runs until the next boolean operator or closing parenthesis
+        start = self.pos
+        while self.pos < len(self.tokens) and self.tokens[self.pos] not in ("and", "or", ")"):
+            self.pos += 1
+        operand = self.tokens[start:self.pos]
+        if not operand:
+            raise CLUError("Missing operand in condition")
+
+        for i, token in enumerate(operand):
+            if token in COMPARISON_OPERATORS:
+                if i == 0 or i == len(operand) - 1:
+                    raise CLUError(f"Comparison '{token}' needs a value on both sides")
+                return ("compare", operand[:i], token, operand[i + 1:])
+
+        if len(operand) == 1 and operand[0] in ("True", "False"):
+            return ("const", operand[0] == "True")
+        return ("value", operand)
 
-class Parser:
-    def __init__(self):
-        pass
 
-    def parse(self, lines: List[str]) -> Program:
-        self.tokenized_lines = Tokenizer(lines).tokenize()
-        self.i = 0
+class Parser:
+    def __init__(self, base_dir: Optional[str] = None, _import_chain: tuple = ()):
+        self.in_function = False
+        self.loop_depth = 0
+        self.base_dir = base_dir  # where 'import' looks for modules; the working directory if None
+        self._import_chain = _import_chain  # modules being loaded around this parse, to catch cycles
+        self.imported: List[str] = []  # resolved paths of the modules imported by the last parse
+
+    def parse(self, lines: Iterable[str]) -> Program:
         program = Program()
+        for item in self.iter_parse(lines):
+            if isinstance(item, Function):
+                program.add_function(item)
+            else:
+                program.add_instruction(item)
+        return program
 
-        while self.i < len(self.tokenized_lines):
-            tokens, line_num = self.tokenized_lines[self.i]
+    def iter_parse(self, lines: Iterable[str]) -> Iterator[Union[Instruction, Function]]:
+        """Yield top-level instructions and functions as soon as each is complete.
 
-            if not tokens:
-                self.i += 1
-                continue
+        Lines are read lazily (an open file or any other iterator works), so only the
+        block being parsed is held in memory.
+        """
+        self._lines = Tokenizer(lines).iter_tokens()
+        self.imported = []
+        self.in_function = False
+        self.loop_depth = 0
 
+        for tokens, line_num in self._lines:
             try:
-                if tokens[0] == "function":
-                    func = self._parse_function(tokens, line_num)
-                    program.add_function(func)
+                if tokens[0] == "import":
+                    items = self._parse_import(tokens, line_num)
+                elif tokens[0] in ("function", "memo"):
+                    items = (self._parse_function(tokens, line_num),)
                 else:
                     instr = self._parse_line(tokens, line_num)
-                    if instr:
-                        program.add_instruction(instr)
+                    items = (instr,) if instr else ()
             except CLUError:
                 raise
             except Exception as e:
                 raise CLUError(f"Parse error: {e}", line_num)
-
-            self.i += 1
-
-        return program
+            yield from items
 
     def _parse_line(self, tokens: List[str], line_num: int) -> Optional[Instruction]:
         """Parse a single line of code efficiently with boolean logic support"""
@@ -109,7 +762,12 @@ class Parser:
             "otherwise": self._parse_otherwise,
             "repeat": self._parse_repeat,
             "foreach": self._parse_foreach,
-            "end": self._parse_end
+            "parallel": self._parse_parallel,
+            "end": self._parse_end,
+            "return": self._parse_return,
+            "break": self._parse_loop_exit,
+            "continue": self._parse_loop_exit,
+            "import": self._parse_nested_import
         }
 
         # Call specific parser function if available
@@ -117,8 +775,7 @@ class Parser:
             return parser_functions[first_token](tokens, line_num)
 
         # Default case: function calls
-        instr = Instruction("call", tuple(tokens))
-        instr.line_number = line_num
+        instr = Instruction("call", tuple(tokens), line_num)
         return instr
 
     def _parse_var_assignment(self, tokens: List[str], line_num: int) -> Instruction:
@@ -134,197 +791,442 @@ class Parser:
         name = tokens[1]
         expr = tokens[idx + 1:]
 
-        instr = Instruction("assign", (name, expr))
-        instr.line_number = line_num
+        # Element assignment: var counts[word] is 1
+        match = re.fullmatch(r'(\w+)\[(.+)\]', name)
+        if match:
+            instr = Instruction("assign_index", (match.group(1), match.group(2), expr), line_num)
+            return instr
+
+        # Self-append of chars: var s is s + a + b
+        if self._is_self_append(name, expr):
+            instr = Instruction("append", (name, expr), line_num)
+            return instr
+
+        # Binary operation on plain operands: var total is total add i
+        binop = self._simple_binop(expr)
+        if binop:
+            instr = Instruction("assign_binop", (name, expr) + binop, line_num)
+            instr.inline_cache = InlineCache(binop[1])
+            return instr
+
+        instr = Instruction("assign", (name, expr), line_num)
         return instr
 
+    def _simple_binop(self, expr: List[str]) -> Optional[tuple]:
+        """(left, op, right) for 'A op B' where A and B are variables or literals"""
+        if len(expr) != 3 or expr[1] not in OPERATOR_NAMES:
+            return None
+        left = self._simple_operand(expr[0])
+        right = self._simple_operand(expr[2])
+        if left is None or right is None:
+            return None
+        return left, OPERATOR_NAMES[expr[1]], right
+
+    def _simple_operand(self, token: str) -> Optional[tuple]:
+        """(True, value) for a literal, (False, name) for a variable, None otherwise"""
+        if re.fullmatch(r'\d+', token):
+            return True, int(token)
+        if re.fullmatch(r'\d+\.\d+', token):
+            return True, float(token)
+        if len(token) >= 2 and token[0] == token[-1] and token[0] in "'\"":
+            return True, token[1:-1]
+        if token in ("True", "False"):
+            return True, token == "True"
+        if re.fullmatch(r'[A-Za-z_]\w*', token) and token not in ("null", "none"):
+            return False, token
+        return None
+
+    def _is_self_append(self, name: str, expr: List[str]) -> bool:
+        """'NAME + ...' where every operator is '+' / 'add', so a char value only ever grows"""
+        if len(expr) < 3 or expr[0] != name or expr[1] != "+":
+            return False
+        return not any(t in ("-", "subtract", "*", "multiply", "/", "divide", ",", "{", "}") for t in expr[2:])
+
     def _parse_output(self, tokens: List[str], line_num: int) -> Instruction:
         """Parse output statement"""
         if len(tokens) <= 1:
             raise CLUError("Output statement requires an expression", line_num)
 
-        instr = Instruction("output", (" ".join(tokens[1:]),))
-        instr.line_number = line_num
+        instr = Instruction("output", (sys.intern(" ".join(tokens[1:])),), line_num)
         return instr
 
     def _parse_if(self, tokens: List[str], line_num: int) -> Instruction:
         """Parse if statement with enhanced boolean logic support"""
         # Simple case: if x op y
-        if len(tokens) == 4 and tokens[2] in ["greater", "less", "equal", "greater_equal", "less_equal", "not_equal"]:
-            instr = Instruction("if", (tokens[1], tokens[2], tokens[3]))
-            instr.line_number = line_num
+        if len(tokens) == 4 and tokens[2] in COMPARISON_OPERATORS:
+            instr = Instruction("if", (tokens[1], tokens[2], tokens[3]), line_num)
             return instr
 
-        # Complex boolean expressions case
-        elif "and" in tokens[1:] or "or" in tokens[1:] or "not" in tokens[1:] or len(tokens) > 1 and tokens[1] in [
-            "True", "False"]:
-            # Get the entire condition as a string
-            condition = " ".join(tokens[1:])
-            instr = Instruction("if_complex", (condition,))
-            instr.line_number = line_num
+        # Boolean variable case: "if is_valid"
+        elif len(tokens) == 2 and tokens[1] not in ("(", ")"):
+            instr = Instruction("if_bool", (tokens[1],), line_num)
             return instr
 
-        # Boolean variable case: "if is_valid"
-        elif len(tokens) == 2:
-            instr = Instruction("if_bool", (tokens[1],))
-            instr.line_number = line_num
+        # Everything else is compiled once into a boolean expression tree
+        elif len(tokens) > 2:
+            condition = " ".join(tokens[1:])
+            try:
+                tree = ConditionParser().parse(tokens[1:])
+            except CLUError as e:
+                raise CLUError(e.message, line_num)
+            instr = Instruction("if_complex", (condition, tree), line_num)
             return instr
 
         # Invalid if statement
         else:
             raise CLUError("Invalid if statement syntax", line_num)
 
+    def _parse_function(self, tokens: List[str], line_num: int) -> Function:
+        """Parse 'function NAME -> p1/p2' (optionally prefixed by 'memo' or 'memo SIZE')"""
+        memoized = False
+        memo_size = None
+        if tokens[0] == "memo":
+            memoized = True
+            tokens = tokens[1:]
+            if tokens and tokens[0].isdigit():
+                memo_size = int(tokens[0])
+                tokens = tokens[1:]
+            if not tokens or tokens[0] != "function":
+                raise CLUError("'memo' must be followed by a function definition", line_num)
+
+        if len(tokens) < 2:
+            raise CLUError("Function definition requires a name", line_num)
+
+        name = tokens[1]
+        params = []
+        if len(tokens) > 2:
+            if tokens[2] != "->" or len(tokens) != 4:
+                raise CLUError(f"Invalid parameter list for function '{name}', expected 'function {name} -> a/b'",
+                               line_num)
+            params = tokens[3].split("/")
+
+        func = Function(name, params, memoized=memoized, memo_size=memo_size)
+        func.line_number = line_num
+
+        self.in_function = True
+        saved_loop_depth, self.loop_depth = self.loop_depth, 0
+        try:
+            func.body = self._parse_block()
+        finally:
+            self.in_function = False
+            self.loop_depth = saved_loop_depth
+        return func
+
+    def _parse_import(self, tokens: List[str], line_num: int) -> List[Function]:
+        """'import helpers', 'import lib/helpers' or 'import "path/to/file.clu"': a copy of the module's functions"""
+        if len(tokens) != 2:
+            raise CLUError("Invalid import statement, expected 'import NAME' or 'import \"path.clu\"'", line_num)
+        path = resolve_module(tokens[1], self.base_dir)
+        try:
+            module = load_module(path, self._import_chain)
+        except CLUError as e:
+            raise CLUError(e.message, line_num)
+        self.imported.append(path)
+        return [_copy_function(func) for func in module.functions.values()]
+
+    def _parse_nested_import(self, tokens: List[str], line_num: int):
+        raise CLUError("'import' is only allowed at the top level", line_num)
+
+    def _parse_return(self, tokens: List[str], line_num: int) -> Instruction:
+        """Parse return statement, with or without a value"""
+        if not self.in_function:
+            raise CLUError("'return' outside of a function", line_num)
+
+        instr = Instruction("return", (tokens[1:],), line_num)
+        return instr
+
+    def _parse_loop_exit(self, tokens: List[str], line_num: int) -> Instruction:
+        """Parse break / continue"""
+        if len(tokens) != 1:
+            raise CLUError(f"'{tokens[0]}' takes no arguments", line_num)
+        if not self.loop_depth:
+            raise CLUError(f"'{tokens[0]}' outside of a loop", line_num)
+
+        instr = Instruction(tokens[0], (), line_num)
+        return instr
+
+    def _parse_loop_body(self) -> List[Instruction]:
+        self.loop_depth += 1
+        try:
+            return self._parse_block()
+        finally:
+            self.loop_depth -= 1
+
     def _parse_otherwise(self, tokens: List[str], line_num: int) -> Instruction:
         """Parse otherwise statement"""
-        instr = Instruction("otherwise", ())
-        instr.line_number = line_num
+        instr = Instruction("otherwise", (), line_num)
         return instr
 
     def _parse_end(self, tokens: List[str], line_num: int) -> Instruction:
         """Parse end statement"""
-        instr = Instruction("end", ())
-        instr.line_number = line_num
+        instr = Instruction("end", (), line_num)
         return instr
 
-    def _parse_repeat(self, tokens: List[str], line_num: int) -> Instruction:
-        if len(tokens) < 4:
-            raise CLUError("Invalid repeat statement", line_num)
-
-        var, op, value = tokens[1], tokens[2], tokens[3]
+    def _parse_block(self) -> List[Instruction]:
+        """Parse instructions up to the 'end' that closes the current block"""
         body = []
-
-        self.i += 1
         nested = 1
 
-        while self.i < len(self.tokenized_lines):
-            curr_tokens, curr_line = self.tokenized_lines[self.i]
-
-            if curr_tokens and curr_tokens[0] == "end":
+        # Shares the line iterator with the caller, so nested blocks consume their own lines
+        for curr_tokens, curr_line in self._lines:
+            if curr_tokens[0] == "end":
                 nested -= 1
                 if nested == 0:
                     break
-            elif curr_tokens and curr_tokens[0] in ("repeat", "if", "function", "foreach"):
+            elif curr_tokens[0] == "if":
+                # if/otherwise/end stay flat in the body; nested loops consume their own 'end'
                 nested += 1
 
             instr = self._parse_line(curr_tokens, curr_line)
             if instr:
                 body.append(instr)
-            self.i += 1
 
-        instr = Instruction("repeat_block", (var, op, value, body))
-        instr.line_number = line_num
+        return body
+
+    def _parse_repeat(self, tokens: List[str], line_num: int) -> Instruction:
+        if len(tokens) < 4:
+            raise CLUError("Invalid repeat statement", line_num)
+
+        var, op, value = tokens[1], tokens[2], tokens[3]
+        body = self._parse_loop_body()
+
+        # Counter loops (repeat i less_equal n ... var i is i add 1) get a native integer loop
+        plan = self._counted_loop_plan(var, op, value, body)
+        if plan:
+            instr = Instruction("repeat_counted", (var, op, value, body) + plan, line_num)
+            return instr
+
+        instr = Instruction("repeat_block", (var, op, value, body), line_num)
         return instr
 
+    def _counted_loop_plan(self, var: str, op: str, value: str, body: List[Instruction]) -> Optional[tuple]:
+        """Return (increment_index, step) if the loop only moves var by a constant step toward value"""
+        if op not in ("less", "less_equal", "greater", "greater_equal"):
+            return None
+        if not re.fullmatch(r'[A-Za-z_]\w*', var) or value == var:
+            return None
+        if not (value.isdigit() or re.fullmatch(r'[A-Za-z_]\w*', value)):
+            return None
+
+        increment = None
+        depth = 0
+        for index, instr in enumerate(body):
+            if instr.action in ("if", "if_complex", "if_bool"):
+                depth += 1
+            elif instr.action == "end":
+                depth -= 1
+            elif instr.action in ("assign", "append", "assign_binop") and instr.args[0] == var:
+                expr = instr.args[1]
+                # Only one unconditional 'var i is i add STEP' is allowed
+                if increment is not None or depth != 0 or len(expr) != 3 or expr[0] != var or not expr[2].isdigit():
+                    return None
+                if expr[1] in ("add", "+"):
+                    increment = (index, int(expr[2]))
+                elif expr[1] in ("subtract", "-"):
+                    increment = (index, -int(expr[2]))
+                else:
+                    return None
+
+        if increment is None or increment[1] == 0:
+            return None
+        # 'continue' before the increment would skip it, which the native loop cannot express
+        if any(instr.action == "continue" for instr in body[:increment[0]]):
+            return None
+        # The step must move toward the bound, otherwise keep the guarded generic loop
+        if (op in ("less", "less_equal")) != (increment[1] > 0):
+            return None
+        # Neither the counter nor the bound may be written anywhere else in the body
+        written = self._written_names(body, skip=body[increment[0]])
+        if var in written or value in written:
+            return None
+        return increment
+
+    def _written_names(self, body: List[Instruction], skip: Optional[Instruction] = None) -> Set[str]:
+        """Names assigned anywhere in a block, including nested loops"""
+        names = set()
+        for instr in body:
+            if instr is skip:
+                continue
+            if instr.action in ("assign", "append", "assign_binop", "assign_index"):
+                names.add(instr.args[0])
+            elif instr.action in ("foreach", "parallel_foreach"):
+                names.add(instr.args[0])
+                names |= self._written_names(instr.args[2])
+            elif instr.action in ("repeat_block", "repeat_counted"):
+                names |= self._written_names(instr.args[3])
+        return names
+
     def _parse_foreach(self, tokens: List[str], line_num: int) -> Instruction:
+        if len(tokens) < 4 or tokens[2] != "in":
+            raise CLUError("Invalid foreach statement", line_num)
+
         var_name = tokens[1]
-        list_name = tokens[3]
-        body = []
+        # Either a list variable or an expression such as 'range of 1 to 10'
+        iterable_expr = tokens[3:]
+        body = self._parse_loop_body()
 
-        self.i += 1
-        while self.i < len(self.tokenized_lines):
-            curr_tokens, curr_line = self.tokenized_lines[self.i]
-            if curr_tokens and curr_tokens[0] == "end":
-                break
-            instr = self._parse_line(curr_tokens, curr_line)
-            if instr:
-                body.append(instr)
-            self.i += 1
+        instr = Instruction("foreach", (var_name, iterable_expr, body), line_num)
+        return instr
 
-        instr = Instruction("foreach", (var_name, list_name, body))
-        instr.line_number = line_num
+    def _parse_parallel(self, tokens: List[str], line_num: int) -> Instruction:
+        """'parallel foreach VAR in LIST': a foreach whose iterations may run in worker processes"""
+        if len(tokens) < 2 or tokens[1] != "foreach":
+            raise CLUError("'parallel' must be followed by a foreach loop", line_num)
+        instr = self._parse_foreach(tokens[1:], line_num)
+        instr.action = "parallel_foreach"
         return instr
 
 
-class Interpreter:
-    def __init__(self):
-        self.variables: Dict[str, Any] = {}
-        self.execution_stack: List[str] = []
-        self.functions: Dict[str, Function] = {}
-        self.program: Optional[Program] = None
+@dataclass
+class Module:
+    """A parsed .clu file's functions, with the modification time of every file it was built from"""
+    path: str
+    functions: Dict[str, Function]
+    mtimes: Dict[str, int]  # the module and everything it imports -> st_mtime_ns
 
-        # Built-in functions registry
-        self.builtin_functions = {
-            "sum": lambda x: sum(x) if isinstance(x, list) and all(
-                isinstance(i, (int, float)) for i in x) else self._type_error("sum", x),
-            "max": lambda x: max(x) if isinstance(x, list) and x and all(
-                isinstance(i, (int, float)) for i in x) else self._type_error("max", x),
-            "min": lambda x: min(x) if isinstance(x, list) and x and all(
-                isinstance(i, (int, float)) for i in x) else self._type_error("min", x),
-            "len": lambda x: len(x) if isinstance(x, (list, str)) else self._type_error("len", x),
-            "sorted": lambda x: sorted(x) if isinstance(x, list) else self._type_error("sorted", x),
-            "reversed": lambda x: list(reversed(x)) if isinstance(x, list) else self._type_error("reversed", x),
-            "average": lambda x: sum(x) / len(x) if isinstance(x, list) and x and all(
-                isinstance(i, (int, float)) for i in x) else self._type_error("average", x),
-            "first": lambda x: x[0] if isinstance(x, list) and x else self._type_error("first", x),
-            "last": lambda x: x[-1] if isinstance(x, list) and x else self._type_error("last", x),
-
-            # New conversion functions
-            "str": self._to_string,
-            "int": self._to_int,
-            "float": self._to_float,
-            "bool": self._to_bool,
-
-            # BOOL
-            "all": lambda x: all(x) if isinstance(x, list) else self._type_error("all", x),
-            "any": lambda x: any(x) if isinstance(x, list) else self._type_error("any", x),
-            "is_bool": lambda x: isinstance(x, bool),
-
-            # New utility functions
-            "type": lambda x: type(x).__name__,
-            "empty": lambda x: len(x) == 0 if isinstance(x, (list, str)) else False,
-            "contains": self._contains,
-        }
+    def is_current(self) -> bool:
+        try:
+            return all(os.stat(path).st_mtime_ns == mtime for path, mtime in self.mtimes.items())
+        except OSError:
+            return False
 
-    def _type_error(self, func_name: str, value: Any) -> None:
-        raise CLUTypeError(f"Function '{func_name}' cannot be applied to {type(value).__name__}: {value}")
-
-    def _to_string(self, value: Any) -> str:
-        """Convert any value to string"""
-        if isinstance(value, str):
-            return value
-        elif isinstance(value, (int, float)):
-            return str(value)
-        elif isinstance(value, list):
-            return "[" + ", ".join(self._to_string(item) for item in value) + "]"
-        else:
-            return str(value)
 
-    def _to_int(self, value: Any) -> int:
-        """Convert value to integer"""
-        if isinstance(value, int):
-            return value
-        elif isinstance(value, float):
-            return int(value)
-        elif isinstance(value, str):
-            try:
-                return int(value)
-            except ValueError:
-                raise CLUTypeError(f"Cannot convert '{value}' to integer")
-        else:
-            raise CLUTypeError(f"Cannot convert {type(value).__name__} to integer")
+# Process-wide: every Parser shares it, so a module is parsed once until one of its files changes
+_module_cache: Dict[str, Module] = {}
+
+
+def resolve_module(name: str, base_dir: Optional[str] = None) -> str:
+    """Path of the module named in an import: quoted names are file paths, bare ones get '.clu'"""
+    if name[0] in ("'", '"') and name[-1] == name[0] and len(name) > 1:
+        name = name[1:-1]
+    else:
+        name += ".clu"
+    return os.path.realpath(os.path.join(base_dir or os.getcwd(), name))
+
+
+def load_module(path: str, _import_chain: tuple = ()) -> Module:
+    """The module at `path` (already resolved), from the cache unless one of its files changed"""
+    module = _module_cache.get(path)
+    if module is not None and module.is_current():
+        return module
+    if path in _import_chain:
+        raise CLUError(f"Circular import of '{path}'")
+
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        with open(path) as f:
+            parser = Parser(os.path.dirname(path), _import_chain + (path,))
+            functions = {}
+            mtimes = {path: mtime}
+            for item in parser.iter_parse(f):
+                if not isinstance(item, Function):
+                    raise CLUError(f"Module '{path}' may only contain functions and imports "
+                                   f"(line {item.line_number})")
+                functions[item.name] = item
+    except OSError as e:
+        raise CLUError(f"Cannot import '{path}': {e.strerror}")
+    except CLUError as e:
+        if e.line_number:
+            raise CLUError(f"In module '{path}', line {e.line_number}: {e.message}")
+        raise
+
+    # The modules it imported are cached by now; their files count toward this one's freshness
+    for name in parser.imported:
+        mtimes.update(_module_cache[name].mtimes)
+    module = _module_cache[path] = Module(path, functions, mtimes)
+    return module
+
+
+def _copy_function(func: Function) -> Function:
+    """A private copy of a cached function: the interpreter's passes rewrite instructions in place"""
+    clone = Function(func.name, list(func.params), func.memoized, func.memo_size)
+    clone.line_number = func.line_number
+    clone.body = _copy_block(func.body)
+    return clone
+
+
+def _copy_block(body: List[Instruction]) -> List[Instruction]:
+    block = []
+    for instr in body:
+        clone = instr.copy()
+        if hasattr(instr, "inline_cache"):
+            # Each importing program warms up and specializes its own sites
+            clone.inline_cache = InlineCache(instr.inline_cache.op)
+        if any(type(arg) is list for arg in instr.args):
+            # Nested loop bodies are copied too; token lists are never modified and stay shared
+            clone.args = tuple(_copy_block(arg) if type(arg) is list and all(type(a) is Instruction for a in arg)
+                               else arg for arg in instr.args)
+        block.append(clone)
+    return block
 
-    def _to_float(self, value: Any) -> float:
-        """Convert value to float"""
-        if isinstance(value, (int, float)):
-            return float(value)
-        elif isinstance(value, str):
-            try:
-                return float(value)
-            except ValueError:
-                raise CLUTypeError(f"Cannot convert '{value}' to float")
-        else:
-            raise CLUTypeError(f"Cannot convert {type(value).__name__} to float")
 
-    def _contains(self, container: Any, item: Any) -> bool:
-        """Check if container contains item"""
-        if isinstance(container, (list, str)):
-            return item in container
-        else:
-            raise CLUTypeError(f"Contains operation not supported for {type(container).__name__}")
+class Interpreter:
+    def __init__(self, auto_memoize: bool = False, static_types: bool = False, optimize: bool = False,
+                 workers: Optional[int] = None):
+        self.auto_memoize = auto_memoize
+        self.static_types = static_types
+        self.optimize = optimize
+        self.workers = (os.cpu_count() or 1) if workers is None else workers  # processes for 'parallel foreach'
+        self.parallel_reports: Dict[Instruction, "ParallelReport"] = {}
+        self.type_report: Optional["TypeReport"] = None
+        self.optimization_report: Optional["OptimizationReport"] = None
+        self.debugger: Optional["Debugger"] = None
+        self.watcher: Optional["VariableWatcher"] = None
+        self.tracer: Optional["ExecutionTracer"] = None
+        self.purity: Dict[str, "PurityReport"] = {}
+        self.call_profiles: Dict[str, CallProfile] = {}
+        self.variables: Dict[str, Any] = {}
+        self.execution_stack: List[str] = []
+        self.functions: Dict[str, Function] = {}
+        self.program: Optional[Program] = None
+        self.memo_caches: Dict[str, MemoCache] = {}
+        self.return_value: Any = None
+        self._condition_cache: Dict[str, tuple] = {}
+        self._inline_caches: Set[InlineCache] = set()
+
+    # Value helpers shared with the builtins
+    _is_numeric_sequence = staticmethod(_is_numeric_sequence)
+    _type_error = staticmethod(_type_error)
+    _to_string = staticmethod(_to_string)
+    _to_int = staticmethod(_to_int)
+    _to_float = staticmethod(_to_float)
+    _to_bool = staticmethod(_to_bool)
+    _contains = staticmethod(_contains)
+    _check_key = staticmethod(_check_key)
+    _to_set = staticmethod(_to_set)
+    _map_get = staticmethod(_map_get)
+    _map_has = staticmethod(_map_has)
 
     def load_program(self, program: Program):
+        # Constant folding and dead-code elimination rewrite the program before the other passes
+        self.optimization_report = Optimizer(program).optimize() if self.optimize else None
+
         self.program = program
         self.functions = program.functions
+        self.memo_caches = {name: MemoCache(func.memo_size)
+                            for name, func in self.functions.items() if func.memoized}
+
+        # Auto-memoization: profile pure functions and cache the ones called with repeated arguments
+        self.call_profiles = {}
+        if self.auto_memoize:
+            analyzer = PurityAnalyzer(program)
+            self.purity = analyzer.analyze()
+            self.call_profiles = {name: CallProfile() for name in analyzer.cacheable_functions()
+                                  if name not in self.memo_caches}
+
+        # Static typing: reject ill-typed programs up front and unbox operations on proven types
+        self.type_report = None
+        if self.static_types:
+            inferencer = TypeInferencer(program)
+            self.type_report = inferencer.infer()
+            if self.type_report.errors:
+                raise self.type_report.errors[0]
+            # Proven sites never take the generic path, which is where the others are registered
+            self._inline_caches.update(inferencer.apply())
+
+    def memo_stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss counters for every memoized function, for profiling"""
+        return {name: cache.stats() for name, cache in self.memo_caches.items()}
 
     def should_execute(self) -> bool:
         return not self.execution_stack or self.execution_stack[-1] in ("if-True", "otherwise")
@@ -340,15 +1242,220 @@ class Interpreter:
             raise
         except Exception as e:
             raise CLUError(f"Runtime error: {e}")
+        finally:
+            # Leave plain chars behind for anyone inspecting the variables
+            self._materialize_strings()
+
+    def run_stream(self, items: Iterable[Union[Instruction, Function]]):
+        """Run instructions and functions as they arrive, e.g. from Parser.iter_parse.
+
+        Top-level statements execute before the rest of the source has been read, so a
+        function has to be defined above its first call. The whole-program passes
+        (optimize, static_types, auto_memoize) need the complete program and are skipped.
+        """
+        self.program = Program()
+        self.functions = self.program.functions
+        self.memo_caches = {}
+        self.call_profiles = {}
+
+        try:
+            for item in items:
+                if isinstance(item, Function):
+                    self.functions[item.name] = item
+                    if item.memoized:
+                        self.memo_caches[item.name] = MemoCache(item.memo_size)
+                else:
+                    self.execute_instruction(item)
+        except CLUError:
+            raise
+        except Exception as e:
+            raise CLUError(f"Runtime error: {e}")
+        finally:
+            self._materialize_strings()
+
+    MAX_REPEAT_ITERATIONS = 10000
+
+    def steps(self, budget: int = 1000) -> Iterator[int]:
+        """Run the loaded program as a generator that pauses every `budget` instructions,
+        yielding how many have run so far.
+
+        Loops and function calls made as statements are split across pauses; a function
+        called inside an expression runs to completion. run() is unaffected.
+        """
+        if not self.program:
+            raise CLUError("No program loaded")
+        if budget < 1:
+            raise ValueError("budget must be at least 1")
+
+        frames = [StepFrame("main", None, self.program.instructions, 0)]
+        execute = self.execute_instruction
+        compound = ("repeat_block", "repeat_counted", "foreach", "call")
+        executed = 0
+        left = budget
+        try:
+            while frames:
+                frame = frames[-1]
+                if frame.index >= len(frame.body):
+                    self._step_block_end(frames)
+                    continue
+
+                if not left:
+                    left = budget
+                    yield executed
+                left -= 1
+
+                instr = frame.body[frame.index]
+                frame.index += 1
+                executed += 1
+                if frame.index - 1 == frame.increment_index:
+                    self.variables[frame.var] = frame.next_counter
+                    continue
+
+                if instr.action in compound:
+                    if self.should_execute():
+                        self._step_enter(frames, instr)
+                    continue
+                signal = execute(instr)
+                if signal:
+                    self._step_signal(frames, signal)
+        except CLUError:
+            raise
+        except Exception as e:
+            raise CLUError(f"Runtime error: {e}")
+        finally:
+            self._materialize_strings()
+
+    async def run_async(self, budget: int = 1000):
+        """Run the loaded program, handing control back to the event loop every `budget` instructions"""
+        for _ in self.steps(budget):
+            await asyncio.sleep(0)
+
+    def _step_enter(self, frames: List[StepFrame], instr: Instruction):
+        """Open a frame for a loop or a statement call (memoized and profiled calls run at once)"""
+        args = instr.args
+        depth = len(self.execution_stack)
+        try:
+            if instr.action == "call":
+                name = args[0]
+                if name not in self.functions:
+                    raise CLUNameError(f"Function '{name}' not defined")
+                func = self.functions[name]
+                arg_values = [self.evaluate_expression(self._tokenize_expression(arg)) for arg in args[1:]]
+                if len(arg_values) != len(func.params) or name in self.memo_caches or name in self.call_profiles:
+                    self._call_function(func, arg_values)
+                    return
+                frame = StepFrame("call", instr, func.body, depth)
+                frame.saved_vars = self.variables.copy()
+                for param, value in zip(func.params, arg_values):
+                    self.variables[param] = value
+                frames.append(frame)
+                return
+
+            frame = StepFrame("iterate", instr, args[-1] if instr.action == "foreach" else args[3], depth)
+            if instr.action == "foreach":
+                frame.var = args[0]
+                frame.items = iter(self._foreach_items(args[1]))
+            elif instr.action == "repeat_counted":
+                var, op, val, body, increment_index, step = args
+                start = self.variables.get(var)
+                bound = int(val) if val.isdigit() else self.variables.get(val)
+                if type(start) is int and type(bound) is int:
+                    bound += 1 if op == "less_equal" else -1 if op == "greater_equal" else 0
+                    frame.var = var
+                    frame.items = iter(range(start, bound, step))
+                    frame.increment_index = increment_index
+                else:
+                    frame.kind = "repeat"
+            else:
+                frame.kind = "repeat"
+
+            if frame.kind == "repeat":
+                if self.evaluate_condition(*args[:3]):
+                    frames.append(frame)
+            elif self._step_next_item(frame):
+                frames.append(frame)
+        except CLUError:
+            raise
+        except Exception as e:
+            self._wrap_error(instr, e)
+
+    def _step_next_item(self, frame: StepFrame) -> bool:
+        item = next(frame.items, _MISSING)
+        if item is _MISSING:
+            return False
+        self.variables[frame.var] = item
+        if frame.increment_index >= 0:
+            frame.next_counter = item + frame.instr.args[5]
+        frame.index = 0
+        return True
+
+    def _step_block_end(self, frames: List[StepFrame]):
+        """The current frame ran off its body: start the next iteration or leave the block"""
+        frame = frames[-1]
+        if frame.kind == "main":
+            frames.pop()
+        elif frame.kind == "call":
+            self._step_return(frames)
+        elif frame.kind == "repeat":
+            frame.iterations += 1
+            try:
+                again = self.evaluate_condition(*frame.instr.args[:3])
+            except CLUError:
+                raise
+            except Exception as e:
+                self._wrap_error(frame.instr, e)
+            if not again:
+                frames.pop()
+            else:
+                self._check_iterations(frame.iterations)
+                frame.index = 0
+        elif not self._step_next_item(frame):
+            frames.pop()
+
+    def _step_signal(self, frames: List[StepFrame], signal: str):
+        if signal == SIGNAL_RETURN:
+            while frames[-1].kind != "call":
+                frames.pop()
+            self._step_return(frames)
+            return
+        # break / continue: close if-blocks left open by the jump, then leave or restart the loop
+        frame = frames[-1]
+        del self.execution_stack[frame.depth:]
+        if signal == SIGNAL_BREAK:
+            frames.pop()
+        else:
+            frame.index = len(frame.body)
+
+    def _step_return(self, frames: List[StepFrame]):
+        """Leave a function called as a statement, discarding its result"""
+        frame = frames.pop()
+        self.return_value = None
+        self.variables = frame.saved_vars
+        del self.execution_stack[frame.depth:]
 
-    def execute_instruction(self, instr: Instruction):
+    def _wrap_error(self, instr: Instruction, error: Exception):
+        line_info = f" (Line {instr.line_number})" if instr.line_number is not None else ""
+        raise CLUError(f"Error in {instr.action}: {error}{line_info}")
+
+    def execute_instruction(self, instr: Instruction) -> Optional[str]:
+        """Execute one instruction, returning a control-flow signal (or None) for the enclosing block"""
         action, args = instr.action, instr.args
+        if self.tracer is not None:
+            self.tracer.before(instr)
 
         try:
             if action == "output" and self.should_execute():
                 self._execute_output(args, instr)
             elif action == "assign" and self.should_execute():
                 self._execute_assign(args, instr)
+            elif action == "assign_binop" and self.should_execute():
+                self._execute_assign_binop(args, instr)
+            elif action == "assign_numeric" and self.should_execute():
+                self._execute_assign_numeric(args, instr)
+            elif action == "append" and self.should_execute():
+                self._execute_append(args, instr)
+            elif action == "assign_index" and self.should_execute():
+                self._execute_assign_index(args, instr)
             elif action == "if":
                 self._execute_if(args, instr)
             elif action == "otherwise":
@@ -356,20 +1463,36 @@ class Interpreter:
             elif action == "end":
                 self._execute_end(instr)
             elif action == "repeat_block" and self.should_execute():
-                self._execute_repeat(args, instr)
+                return self._execute_repeat(args, instr)
+            elif action == "repeat_counted" and self.should_execute():
+                return self._execute_counted_repeat(args, instr)
             elif action == "foreach" and self.should_execute():
-                self._execute_foreach(args, instr)
+                return self._execute_foreach(args, instr)
+            elif action == "parallel_foreach" and self.should_execute():
+                return self._execute_parallel_foreach(args, instr)
             elif action == "call" and self.should_execute():
                 self._execute_call(args, instr)
             elif action == "if_complex":
                 self._execute_complex_if(args, instr)
-            elif action == "if_bool" and self.should_execute():
+            elif action == "if_bool":
                 self._execute_if_bool(args, instr)
+            elif action == "return" and self.should_execute():
+                return self._execute_return(args, instr)
+            elif action == "break" and self.should_execute():
+                return SIGNAL_BREAK
+            elif action == "continue" and self.should_execute():
+                return SIGNAL_CONTINUE
+            elif action == "debug_trap":
+                return self.debugger.trap(instr)
+            if self.watcher is not None:
+                self.watcher.observe(instr)
+            if self.tracer is not None:
+                self.tracer.after(instr)
         except CLUError:
             raise
         except Exception as e:
-            line_info = f" (Line {instr.line_number})" if hasattr(instr, 'line_number') else ""
-            raise CLUError(f"Error in {action}: {e}{line_info}")
+            self._wrap_error(instr, e)
+        return None
 
     def _execute_output(self, args, instr):
         expr = args[0].strip()
@@ -381,6 +1504,10 @@ class Interpreter:
         """Execute a boolean variable if statement"""
         var_name = args[0]
 
+        if not self.should_execute():
+            self.execution_stack.append("skip")
+            return
+
         # Handle boolean literals directly
         if var_name == "True":
             self.execution_stack.append("if-True")
@@ -405,7 +1532,133 @@ class Interpreter:
         value = self.evaluate_expression(expr)
         self.variables[var] = value
 
+    def _execute_assign_binop(self, args, instr):
+        """var x is A op B, specialized on the operand types seen so far"""
+        var, expr, left, op, right = args
+        cache = instr.inline_cache
+        variables = self.variables
+        a = left[1] if left[0] else variables.get(left[1], _MISSING)
+        b = right[1] if right[0] else variables.get(right[1], _MISSING)
+
+        fast = cache.fast
+        if fast is not None:
+            if cache.proven or type(a) is cache.types[0] and type(b) is cache.types[1]:
+                cache.hits += 1
+                variables[var] = fast(a, b)
+                return
+            cache.deoptimize()
+
+        # Generic path, which also handles errors, function calls and pending string builders
+        self._execute_assign((var, expr), instr)
+        self._inline_caches.add(cache)
+        if a is _MISSING or b is _MISSING:
+            if (not left[0] and left[1] in self.functions) or (not right[0] and right[1] in self.functions):
+                cache.disable()
+            return
+        cache.observe(type(a), type(b))
+
+    def _execute_assign_numeric(self, args, instr):
+        """var x is sum/max/min/average of xs, where xs is statically a list of numbers"""
+        var, expr, func_name, arg_name = args
+        values = self.variables[arg_name]
+        if not values:
+            # Let the builtin report the empty list
+            self._execute_assign((var, expr), instr)
+            return
+        if func_name == "sum":
+            self.variables[var] = sum(values)
+        elif func_name == "max":
+            self.variables[var] = max(values)
+        elif func_name == "min":
+            self.variables[var] = min(values)
+        else:
+            self.variables[var] = sum(values) / len(values)
+
+    def specialization_stats(self) -> Dict[str, Any]:
+        """Hit rates of the adaptive operator specializations used by this interpreter"""
+        hits = sum(cache.hits for cache in self._inline_caches)
+        misses = sum(cache.misses for cache in self._inline_caches)
+        generic = sum(cache.generic for cache in self._inline_caches)
+        by_type: Dict[str, int] = {}
+        for cache in self._inline_caches:
+            for (left_type, right_type), count in cache.type_hits().items():
+                key = f"{left_type.__name__} {cache.op} {right_type.__name__}"
+                by_type[key] = by_type.get(key, 0) + count
+        total = hits + misses + generic
+        return {
+            "sites": len(self._inline_caches),
+            "specialized_sites": sum(1 for cache in self._inline_caches if cache.fast is not None),
+            "hits": hits,
+            "guard_misses": misses,
+            "generic": generic,
+            "hit_rate": hits / total if total else 0.0,
+            "by_type": by_type,
+        }
+
+    def _execute_append(self, args, instr):
+        """var s is s + a + b: extend a StringBuilder instead of copying the whole char"""
+        var, expr = args
+        if not isinstance(self.variables.get(var), (str, StringBuilder)):
+            # Numbers (or undefined names) take the ordinary path
+            self._execute_assign((var, expr), instr)
+            return
+
+        pieces = []
+        pos = 2
+        while pos < len(expr):
+            value, pos = self._parse_term(expr, pos)
+            pieces.append(self._to_string(value))
+            if pos < len(expr):
+                if expr[pos] not in ("+", "add"):
+                    raise CLUError(f"Unexpected '{expr[pos]}' in expression")
+                pos += 1
+
+        # Re-read: evaluating the pieces may have materialized the builder
+        current = self.variables[var]
+        if isinstance(current, str):
+            current = StringBuilder.from_string(current)
+        self.variables[var] = current.append(pieces)
+
+    def _read_variable(self, name: str) -> Any:
+        """Variable value for use in an expression, turning a pending StringBuilder into a char"""
+        value = self.variables[name]
+        if type(value) is StringBuilder:
+            value = str(value)
+            self.variables[name] = value
+        return value
+
+    def _materialize_strings(self):
+        for name, value in self.variables.items():
+            if type(value) is StringBuilder:
+                self.variables[name] = str(value)
+
+    def _execute_assign_index(self, args, instr):
+        name, index_expr, expr = args
+        if name not in self.variables:
+            raise CLUNameError(f"Variable '{name}' not defined")
+
+        index = self.evaluate_expression(self._tokenize_expression(index_expr))
+        value = self.evaluate_expression(expr)
+        self._store_index(name, index, value)
+
+    def _store_index(self, name: str, index: Any, value: Any):
+        container = self.variables[name]
+        if isinstance(container, dict):
+            container[self._check_key(index)] = value
+        elif isinstance(container, list):
+            if not isinstance(index, int) or not 1 <= index <= len(container):
+                raise CLUIndexError(f"Index {index} out of range for '{name}' (length {len(container)})")
+            container[index - 1] = value
+        else:
+            raise CLUTypeError(f"'{name}' is not a list or map")
+        if self.tracer is not None:
+            self.tracer.store(name, index, value)
+
     def _execute_if(self, args, instr):
+        if not self.should_execute():
+            # Inside a branch that is not taken: don't evaluate, just track the block
+            self.execution_stack.append("skip")
+            return
         result = self.evaluate_condition(*args)
         self.execution_stack.append("if-True" if result else "if-False")
 
@@ -419,80 +1672,236 @@ class Interpreter:
         if self.execution_stack:
             self.execution_stack.pop()
 
-    def _execute_repeat(self, args, instr):
+    def _check_iterations(self, iterations: int):
+        """The one iteration cap of every repeat loop that runs generically, here or stepwise.
+
+        Only counter loops over integer bounds, which run as a native range, go uncapped: a counter
+        compared with a float such as 'inf' may never reach its bound.
+        """
+        if iterations >= self.MAX_REPEAT_ITERATIONS:
+            raise CLUError(f"Infinite loop detected (over {self.MAX_REPEAT_ITERATIONS} iterations)")
+
+    def _execute_repeat(self, args, instr, capped: bool = True):
         var, op, val, body = args
-        max_iterations = 10000
         iterations = 0
 
+        depth = len(self.execution_stack)
+
         while self.evaluate_condition(var, op, val):
-            if iterations >= max_iterations:
-                raise CLUError(f"Infinite loop detected (over {max_iterations} iterations)")
+            if capped:
+                self._check_iterations(iterations)
             for sub_instr in body:
-                self.execute_instruction(sub_instr)
+                signal = self.execute_instruction(sub_instr)
+                if signal:
+                    # Close if-blocks left open by the jump, then leave or restart the loop
+                    del self.execution_stack[depth:]
+                    if signal != SIGNAL_CONTINUE:
+                        return None if signal == SIGNAL_BREAK else signal
+                    break
             iterations += 1
+        return None
+
+    def _execute_counted_repeat(self, args, instr):
+        """Native integer loop for a counter proven by the parser to move by a constant step"""
+        var, op, val, body, increment_index, step = args
+        start = self.variables.get(var)
+        bound = int(val) if val.isdigit() else self.variables.get(val)
+
+        # Not integers after all: fall back to the generic, capped loop
+        if type(start) is not int or type(bound) is not int:
+            return self._execute_repeat((var, op, val, body), instr)
+        # A debugger must be able to stop on the counter update the native loop never runs; the
+        # integer bounds still guarantee it ends, so it stays uncapped as in a normal run
+        if self.debugger is not None:
+            return self._execute_repeat((var, op, val, body), instr, capped=False)
+
+        if op == "less_equal":
+            bound += 1
+        elif op == "greater_equal":
+            bound -= 1
+
+        before = body[:increment_index]
+        after = body[increment_index + 1:]
+        execute = self.execute_instruction
+        depth = len(self.execution_stack)
+        tracer = self.tracer
+        watcher = self.watcher
+        increment = body[increment_index]
+
+        # The counter only moves toward the bound, so the loop always terminates
+        for counter in range(start, bound, step):
+            self.variables[var] = counter
+            for sub_instr in before:
+                signal = execute(sub_instr)
+                if signal:
+                    # The parser rules out 'continue' here, so this leaves the loop
+                    del self.execution_stack[depth:]
+                    return None if signal == SIGNAL_BREAK else signal
+            self.variables[var] = counter + step
+            if tracer is not None:
+                tracer.write(var, counter + step)
+            if watcher is not None:
+                watcher.observe(increment)
+            for sub_instr in after:
+                signal = execute(sub_instr)
+                if signal:
+                    del self.execution_stack[depth:]
+                    if signal != SIGNAL_CONTINUE:
+                        return None if signal == SIGNAL_BREAK else signal
+                    break
+        return None
 
      # complexIF
     def _execute_complex_if(self, args, instr):
         """Execute a complex if statement with boolean operators"""
-        condition = args[0]
-        result = self._evaluate_complex_condition(condition)
+        if not self.should_execute():
+            self.execution_stack.append("skip")
+            return
+        result = self._evaluate_condition_tree(args[1])
         self.execution_stack.append("if-True" if result else "if-False")
 
     def _evaluate_complex_condition(self, condition: str) -> bool:
-        """Evaluate a boolean expression with AND/OR operators"""
-        # Simple implementation - could be enhanced for more complex expressions
-        if " and " in condition:
-            parts = condition.split(" and ")
-            return all(self._evaluate_simple_condition(part.strip()) for part in parts)
-        elif " or " in condition:
-            parts = condition.split(" or ")
-            return any(self._evaluate_simple_condition(part.strip()) for part in parts)
-        else:
-            return self._evaluate_simple_condition(condition)
-
-    def _evaluate_simple_condition(self, condition: str) -> bool:
-        """Evaluate a simple boolean condition"""
-        if condition.strip() == "True":
+        """Evaluate a boolean expression given as text (compiled once, then cached)"""
+        tree = self._condition_cache.get(condition)
+        if tree is None:
+            tree = ConditionParser().parse(self._tokenize_expression(condition))
+            self._condition_cache[condition] = tree
+        return self._evaluate_condition_tree(tree)
+
+    def _evaluate_condition_tree(self, node: tuple) -> bool:
+        """Evaluate a ConditionParser tree, short-circuiting 'and' / 'or'"""
+        kind = node[0]
+        if kind == "compare":
+            left = self.evaluate_expression(node[1])
+            right = self.evaluate_expression(node[3])
+            return COMPARISON_OPERATORS[node[2]](left, right)
+        elif kind == "and":
+            for child in node[1]:
+                if not self._evaluate_condition_tree(child):
+                    return False
             return True
-        elif condition.strip() == "False":
+        elif kind == "or":
+            for child in node[1]:
+                if self._evaluate_condition_tree(child):
+                    return True
             return False
-
-        # Handle "not" operator
-        if condition.strip().startswith("not "):
-            inner = condition.strip()[4:].strip()
-            return not self._evaluate_simple_condition(inner)
-
-        # Parse and evaluate regular conditions
-        tokens = self._tokenize_expression(condition)
-        if len(tokens) == 1:
-            # Single token (variable or literal)
-            value = self.evaluate_expression(tokens)
-            return bool(value)
-        elif len(tokens) >= 3:
-            # Regular comparison
-            if tokens[1] in ["greater", "less", "equal", "greater_equal", "less_equal", "not_equal"]:
-                left = " ".join(tokens[:1])
-                op = tokens[1]
-                right = " ".join(tokens[2:])
-                return self.evaluate_condition(left, op, right)
-
-        raise CLUError(f"Invalid condition: {condition}")
+        elif kind == "not":
+            return not self._evaluate_condition_tree(node[1])
+        elif kind == "const":
+            return node[1]
+        return bool(self.evaluate_expression(node[1]))
 
 #Foreach
 
     def _execute_foreach(self, args, instr):
-        var, list_name, body = args
+        var, iterable_expr, body = args
+        return self._iterate(var, self._foreach_items(iterable_expr), body)
 
-        if list_name not in self.variables:
-            raise CLUNameError(f"Variable '{list_name}' not defined")
+    def _iterate(self, var: str, list_val: Any, body: List[Instruction]) -> Optional[str]:
+        if isinstance(list_val, range):
+            return self._execute_counted_loop(var, list_val, body)
 
-        list_val = self.variables[list_name]
-        if not isinstance(list_val, list):
-            raise CLUTypeError(f"'{list_name}' is not a list, it's a {type(list_val).__name__}")
+        depth = len(self.execution_stack)
+        tracer = self.tracer
         for item in list_val:
             self.variables[var] = item
+            if tracer is not None:
+                tracer.write(var, item)
+            for sub_instr in body:
+                signal = self.execute_instruction(sub_instr)
+                if signal:
+                    del self.execution_stack[depth:]
+                    if signal != SIGNAL_CONTINUE:
+                        return None if signal == SIGNAL_BREAK else signal
+                    break
+        return None
+
+    PARALLEL_MIN_ITEMS = 2
+    PARALLEL_CHUNKS_PER_WORKER = 4  # more chunks than workers, so uneven iterations still balance
+
+    def _execute_parallel_foreach(self, args, instr):
+        """Run the iterations in worker processes when the body allows it, otherwise as a plain foreach.
+
+        Chunks are merged in list order: their output is printed, the loop's variables take the
+        values of the last iteration that set them, and element writes to outer lists/maps are
+        replayed, so the result is the same as running sequentially.
+        """
+        var, iterable_expr, body = args
+        items = self._foreach_items(iterable_expr)
+        if self.workers < 2 or self.debugger is not None or self.watcher is not None or self.tracer is not None:
+            return self._iterate(var, items, body)
+
+        report = self.parallel_reports.get(instr)
+        if report is None:
+            report = self.parallel_reports[instr] = ParallelLoopAnalyzer(self.program).analyze(instr)
+        if not report.parallel or not report.merged.issubset(self.variables):
+            return self._iterate(var, items, body)
+
+        if not isinstance(items, (list, tuple, range)):
+            items = list(items)
+        if len(items) < self.PARALLEL_MIN_ITEMS:
+            return self._iterate(var, items, body)
+
+        count = min(len(items), self.workers * self.PARALLEL_CHUNKS_PER_WORKER)
+        bounds = [len(items) * k // count for k in range(count + 1)]
+        # Merge targets only need to exist in the workers; their writes come back and are replayed here
+        snapshot = {name: self.variables[name] for name in report.reads if name in self.variables}
+        snapshot.update(dict.fromkeys(report.merged))
+        tasks = [(var, body, self.functions, snapshot, items[bounds[k]:bounds[k + 1]], report.merged)
+                 for k in range(count)]
+
+        try:
+            for output, changed, writes, error in _process_pool(self.workers).map(_run_parallel_chunk, tasks):
+                if output:
+                    sys.stdout.write(output)
+                self.variables.update(changed)
+                for name, index, value in writes:
+                    self._store_index(name, index, value)
+                if error is not None:
+                    raise error
+        except BrokenProcessPool:
+            _discard_process_pool()
+            raise CLUError("A 'parallel foreach' worker process stopped unexpectedly", instr.line_number)
+        return None
+
+    def _foreach_items(self, iterable_expr: List[str]) -> Any:
+        """The value a foreach walks: a range, list, file stream or snapshot of a map's keys or a set's items"""
+        if len(iterable_expr) == 1:
+            list_name = iterable_expr[0]
+            if list_name not in self.variables:
+                raise CLUNameError(f"Variable '{list_name}' not defined")
+            list_val = self.variables[list_name]
+        else:
+            list_name = " ".join(iterable_expr)
+            list_val = self.evaluate_expression(iterable_expr)
+
+        if isinstance(list_val, dict):
+            # Iterate over a snapshot of the keys so the body may update the map
+            return tuple(list_val)
+        if isinstance(list_val, set):
+            # Same order _to_string prints, so runs do not depend on hash order
+            return sorted(list_val, key=_to_string)
+        if not isinstance(list_val, (list, FileStream, range)):
+            raise CLUTypeError(f"'{list_name}' is not a list, it's a {type(list_val).__name__}")
+        return list_val
+
+    def _execute_counted_loop(self, var: str, counter: range, body: List[Instruction]) -> Optional[str]:
+        """Run a foreach over a range: the counter is produced natively, nothing is materialized"""
+        execute = self.execute_instruction
+        depth = len(self.execution_stack)
+        tracer = self.tracer
+        for value in counter:
+            self.variables[var] = value
+            if tracer is not None:
+                tracer.write(var, value)
             for sub_instr in body:
-                self.execute_instruction(sub_instr)
+                signal = execute(sub_instr)
+                if signal:
+                    del self.execution_stack[depth:]
+                    if signal != SIGNAL_CONTINUE:
+                        return None if signal == SIGNAL_BREAK else signal
+                    break
+        return None
 
     def _execute_call(self, args, instr):
         name = args[0]
@@ -501,29 +1910,68 @@ class Interpreter:
         if name not in self.functions:
             raise CLUNameError(f"Function '{name}' not defined")
 
-        func = self.functions[name]
-        if len(call_args) != len(func.params):
-            raise CLUError(f"Function '{name}' expects {len(func.params)} arguments, got {len(call_args)}")
+        arg_values = [self.evaluate_expression(self._tokenize_expression(arg)) for arg in call_args]
+        self._call_function(self.functions[name], arg_values)
+
+    def _call_function(self, func: Function, arg_values: List[Any]) -> Any:
+        """Invoke a user function and return its result (None without an explicit return)"""
+        if len(arg_values) != len(func.params):
+            raise CLUError(f"Function '{func.name}' expects {len(func.params)} arguments, got {len(arg_values)}")
 
-        # Save current variable state
+        cache = self.memo_caches.get(func.name)
+        if cache is not None:
+            key = _memo_key(arg_values)
+            found, value = cache.get(key)
+            if found:
+                return value
+        elif self.call_profiles and func.name in self.call_profiles:
+            self._profile_call(func.name, _memo_key(arg_values))
+
+        # Save current variable and block state
         saved_vars = self.variables.copy()
+        saved_depth = len(self.execution_stack)
 
         # Set parameter values
-        for param, arg in zip(func.params, call_args):
-            tokens = self._tokenize_expression(arg)
-            self.variables[param] = self.evaluate_expression(tokens)
+        for param, value in zip(func.params, arg_values):
+            self.variables[param] = value
+        if self.tracer is not None:
+            self.tracer.call(func, saved_vars)
 
         # Execute function body
+        result = None
         for sub_instr in func.body:
-            self.execute_instruction(sub_instr)
+            if self.execute_instruction(sub_instr) == SIGNAL_RETURN:
+                result = self.return_value
+                self.return_value = None
+                break
 
-        # Restore variable state
+        # Restore variable and block state (a return may leave open if-blocks behind)
         self.variables = saved_vars
+        del self.execution_stack[saved_depth:]
+        if self.tracer is not None:
+            self.tracer.ret()
+
+        if cache is not None:
+            cache.put(key, result)
+        return result
+
+    def _profile_call(self, name: str, key: tuple):
+        """Sample a pure function's arguments and enable caching if they repeat"""
+        profile = self.call_profiles[name]
+        if profile.record(key):
+            del self.call_profiles[name]
+            if profile.shows_repeats():
+                self.memo_caches[name] = MemoCache()
+
+    def _execute_return(self, args, instr) -> str:
+        expr = args[0]
+        self.return_value = self.evaluate_expression(expr) if expr else None
+        return SIGNAL_RETURN
 
     def _tokenize_expression(self, expr: str) -> List[str]:
         """Tokenize an expression string using the same pattern as main tokenizer"""
         # Use the same pattern as the main tokenizer to ensure consistency
-        return re.findall(r'\w+\[[^\]]+\]|\'.*?\'|".*?"|\d+\.\d+|\d+|\w+|[^\s\w]', expr)
+        return EXPRESSION_TOKEN_RE.findall(expr)
 
     @property
     def token_pattern(self):
@@ -533,6 +1981,10 @@ class Interpreter:
         if not parts:
             raise CLUError("Empty expression")
 
+        # User function call used as a value, e.g. 'var p is wordInList w positives 4'
+        if parts[0] in self.functions:
+            return self._parse_expression(parts, 0)[0]
+
         #Boolean Support
         if len(parts) == 1:
             if parts[0] == "True":
@@ -563,7 +2015,10 @@ class Interpreter:
                 return part[1:-1]
             # Handle variable
             elif part in self.variables:
-                return self.variables[part]
+                return self._read_variable(part)
+            # Handle list indexing (e.g. nums[i])
+            elif part.endswith("]"):
+                return self._evaluate_single_value(part)
             else:
                 raise CLUNameError(f"Variable '{part}' not defined")
 
@@ -597,19 +2052,157 @@ class Interpreter:
         if pos + 2 < len(parts) and parts[pos + 1] == "of":
             func_name = parts[pos]
 
-            # Recursively parse the argument (could be another function call)
-            arg_value, new_pos = self._parse_term(parts, pos + 2)
-
-            if func_name in self.builtin_functions:
-                result = self.builtin_functions[func_name](arg_value)
-                return result, new_pos
+            if func_name == "range":
+                return self._parse_range(parts, pos + 2)
+
+            builtin = BUILTINS.get(func_name)
+            if builtin is not None:
+                arity = builtin.arity
+                if arity == 1 and pos + 3 < len(parts) and parts[pos + 3] == "of" \
+                        and (builtin.order_free or builtin.permutes or builtin.picks is not None):
+                    inner = BUILTINS.get(parts[pos + 2])
+                    if inner is not None and inner.permutes:
+                        return self._call_fused(parts, pos)
+
+                # Recursively parse the argument (could be another function call)
+                arg_value, new_pos = self._parse_term(parts, pos + 2)
+                if arity == 1:
+                    return builtin(arg_value), new_pos
+
+                # Further arguments are comma separated: 'has of counts, word'
+                call_args = [arg_value]
+                while len(call_args) < arity and new_pos < len(parts) and parts[new_pos] == ",":
+                    arg_value, new_pos = self._parse_term(parts, new_pos + 1)
+                    call_args.append(arg_value)
+                if len(call_args) != arity:
+                    raise CLUError(f"Function '{func_name}' expects {arity} arguments, got {len(call_args)}")
+                return builtin(*call_args), new_pos
             else:
                 raise CLUNameError(f"Unknown function '{func_name}'")
 
+        # Map literal: {'a': 1, 'b': 2}
+        if parts[pos] == "{":
+            return self._parse_map_literal(parts, pos)
+
+        # User function call: each parameter takes one term
+        if parts[pos] in self.functions:
+            func = self.functions[parts[pos]]
+            pos += 1
+            arg_values = []
+            for _ in func.params:
+                value, pos = self._parse_term(parts, pos)
+                arg_values.append(value)
+            return self._call_function(func, arg_values), pos
+
         # Regular value
         value = self._evaluate_single_value(parts[pos])
         return value, pos + 1
 
+    def _call_fused(self, parts: List[str], pos: int) -> tuple:
+        """'sum of sorted of x', 'first of reversed of x': evaluate a builtin over a chain of
+        sorts and reversals without building the intermediate lists"""
+        outer = BUILTINS[parts[pos]]
+        chain = []
+        pos += 2
+        while pos + 2 < len(parts) and parts[pos + 1] == "of" and parts[pos] in BUILTINS \
+                and BUILTINS[parts[pos]].permutes:
+            chain.append(BUILTINS[parts[pos]])
+            pos += 2
+        value, new_pos = self._parse_term(parts, pos)
+
+        innermost = chain[-1]
+        if innermost.arg_types and not isinstance(value, innermost.arg_types[0]):
+            _type_error(innermost.name, value)
+
+        # Net effect of the chain and of a reordering outer builtin, innermost first: unchanged,
+        # reversed, sorted or sorted descending. Sorts are stable, so equal elements such as 1 and 1.0
+        # keep the order they had before the last sort: either the value's order or its reverse
+        is_sorted = descending = ties_reversed = False
+        for step in reversed([outer] + chain if outer.permutes else chain):
+            if step.permutes == "sort":
+                ties_reversed = (is_sorted and ties_reversed) != descending
+                is_sorted, descending = True, False
+            else:
+                descending = not descending
+        if isinstance(value, set):
+            ties_reversed = False  # No two items of a set are equal
+
+        if is_sorted and not _is_orderable(value):
+            # Mixed types may not sort: run the chain as written so it fails exactly as unfused
+            return self._call_unfused(outer, chain, value), new_pos
+
+        if outer.permutes:
+            return self._ordered(value, is_sorted, descending, ties_reversed), new_pos
+
+        if outer.picks is not None:
+            if not value:
+                _type_error(outer.name, [])
+            pick_first = (outer.picks == 0) != descending
+            if not is_sorted:
+                return value[0 if pick_first else -1], new_pos
+            # min and max keep the first extreme element they meet, as a stable sort keeps ties
+            # (a set has no equal items, and cannot be walked backwards)
+            if pick_first:
+                return (min(reversed(value)) if ties_reversed else min(value)), new_pos
+            return (max(value) if ties_reversed or isinstance(value, set) else max(reversed(value))), new_pos
+
+        # Order-free builtins (len, sum, max, ...) see the elements as they are, unless the order
+        # could show in the result
+        try:
+            if outer.order_free is True or _is_uniform(value):
+                return outer(value if isinstance(value, (list, range)) else list(value)), new_pos
+            return outer(self._ordered(value, is_sorted, descending, ties_reversed)), new_pos
+        except CLUTypeError:
+            # Report the list the unfused call would have been given
+            return self._call_unfused(outer, chain, value), new_pos
+
+    @staticmethod
+    def _ordered(value: Any, is_sorted: bool, descending: bool, ties_reversed: bool) -> list:
+        """The value as a list in the order the chain leaves it"""
+        if not is_sorted:
+            return list(reversed(value)) if descending else list(value)
+        if ties_reversed:
+            # Ascending with ties in reverse order is the reverse of a stable descending sort
+            ordered = sorted(value, reverse=True)
+            return ordered if descending else ordered[::-1]
+        ordered = sorted(value)
+        return ordered[::-1] if descending else ordered
+
+    @staticmethod
+    def _call_unfused(outer: Builtin, chain: List[Builtin], value: Any) -> Any:
+        for step in reversed(chain):
+            value = step(value)
+        return outer(value)
+
+    def _parse_map_literal(self, parts: List[str], pos: int) -> tuple[Dict[Any, Any], int]:
+        """Parse '{key: value, ...}' into a map"""
+        result = {}
+        pos += 1
+        while pos < len(parts) and parts[pos] != "}":
+            key, pos = self._parse_term(parts, pos)
+            if pos >= len(parts) or parts[pos] != ":":
+                raise CLUError("Expected ':' between map key and value")
+            value, pos = self._parse_term(parts, pos + 1)
+            result[self._check_key(key)] = value
+            if pos < len(parts) and parts[pos] == ",":
+                pos += 1
+
+        if pos >= len(parts):
+            raise CLUError("Map literal is missing a closing '}'")
+        return result, pos + 1
+
+    def _parse_range(self, parts: List[str], pos: int) -> tuple[range, int]:
+        """Parse 'range of START to STOP' (inclusive) into a lazy range"""
+        start, pos = self._parse_term(parts, pos)
+        if pos >= len(parts) or parts[pos] != "to":
+            raise CLUError("Expected 'to' in range expression, e.g. 'range of 1 to 10'")
+        stop, pos = self._parse_term(parts, pos + 1)
+
+        if not isinstance(start, int) or not isinstance(stop, int) or isinstance(start, bool) or isinstance(stop, bool):
+            raise CLUTypeError(f"Range bounds must be integers, got {type(start).__name__} and {type(stop).__name__}")
+
+        return range(start, stop + 1), pos
+
     def _evaluate_mixed_binary_operations(self, parts: List) -> Any:
         """Handle binary operations with mixed types (some already evaluated)"""
         # Start with first part
@@ -650,20 +2243,23 @@ class Interpreter:
                     elements.append(part[1:-1])
                 # Handle variables
                 elif part in self.variables:
-                    elements.append(self.variables[part])
+                    elements.append(self._read_variable(part))
                 else:
                     raise CLUNameError(f"Variable '{part}' not defined")
         return elements
 
     def _evaluate_builtin_function(self, func_name: str, arg_name: str) -> Any:
         """Evaluate built-in function call"""
-        if func_name not in self.builtin_functions:
+        builtin = BUILTINS.get(func_name)
+        if builtin is None:
             raise CLUNameError(f"Unknown built-in function '{func_name}'")
 
         # IMPORTANT: Don't just evaluate as single token, use full expression evaluation
         arg_tokens = self._tokenize_expression(arg_name)
         arg_value = self.evaluate_expression(arg_tokens)
-        return self.builtin_functions[func_name](arg_value)
+        if builtin.arity != 1:
+            raise CLUError(f"Function '{func_name}' expects {builtin.arity} arguments, got 1")
+        return builtin(arg_value)
 
     def _evaluate_binary_operations(self, parts: List[str]) -> Any:
         """Evaluate binary operations left to right"""
@@ -706,7 +2302,7 @@ class Interpreter:
 
         # Variable lookup - must come AFTER checking for literals
         if token in self.variables:
-            return self.variables[token]
+            return self._read_variable(token)
 
         # Special case for null/none value
         if token.lower() in ["null", "none"]:
@@ -721,13 +2317,16 @@ class Interpreter:
             raise CLUNameError(f"Variable '{array_name}' not defined")
 
         array_value = self.variables[array_name]
-        if not isinstance(array_value, list):
-            raise CLUTypeError(f"'{array_name}' is not a list")
 
         # Evaluate index expression
         index_tokens = self._tokenize_expression(index_expr)
         index_value = self.evaluate_expression(index_tokens)
 
+        if isinstance(array_value, dict):
+            return self._map_get(array_value, index_value)
+        if not isinstance(array_value, (list, range)):
+            raise CLUTypeError(f"'{array_name}' is not a list")
+
         if not isinstance(index_value, int):
             raise CLUTypeError(f"Array index must be integer, got {type(index_value).__name__}")
 
@@ -763,18 +2362,6 @@ class Interpreter:
             return not value
         raise CLUTypeError(f"Cannot apply 'not' to {type(value).__name__}")
 
-    def _to_bool(self, value: Any) -> bool:
-        """Convert value to boolean"""
-        if isinstance(value, bool):
-            return value
-        elif isinstance(value, (int, float)):
-            return value != 0
-        elif isinstance(value, str):
-            return value != ""
-        elif isinstance(value, list):
-            return len(value) > 0
-        return bool(value)
-
     def evaluate_condition(self, left: str, op: str, right: str) -> bool:
         """Evaluate conditional expression"""
         # Handle special case for logical operators
@@ -792,16 +2379,2186 @@ class Interpreter:
         left_val = self.evaluate_expression(left_tokens)
         right_val = self.evaluate_expression(right_tokens)
 
-        operators = {
-            "greater": lambda a, b: a > b,
-            "less": lambda a, b: a < b,
-            "equal": lambda a, b: a == b,
-            "greater_equal": lambda a, b: a >= b,
-            "less_equal": lambda a, b: a <= b,
-            "not_equal": lambda a, b: a != b,
+        if op not in COMPARISON_OPERATORS:
+            raise CLUError(f"Unknown comparison operator '{op}'")
+
+        return COMPARISON_OPERATORS[op](left_val, right_val)
+
+
+class DebugStop(CLUError):
+    """Raised inside the interpreter when the debugger user stops the program"""
+
+
+@dataclass
+class DebugPause:
+    """Where and why a Debugger paused, handed to its on_pause callback"""
+    line: Optional[int]
+    reason: str  # 'breakpoint' or 'step'
+    call_stack: List[str]  # Names of the CLU functions being executed, outermost first
+    variables: Dict[str, Any]
+
+
+class Debugger:
+    """Breakpoint debugger for an Interpreter.
+
+    Only instructions on breakpoint lines are instrumented (their action becomes
+    'debug_trap'), so code without breakpoints runs at normal speed. Every instruction
+    is instrumented only while stepping. At each pause on_pause(pause) is called and
+    returns the next command: 'continue', 'step_into', 'step_over', 'step_out' or 'stop'.
+    """
+
+    COMMANDS = ("continue", "step_into", "step_over", "step_out", "stop")
+
+    def __init__(self, interpreter: Interpreter, on_pause: Callable[[DebugPause], str]):
+        self.interpreter = interpreter
+        self.on_pause = on_pause
+        self.breakpoints: Dict[int, Optional[tuple]] = {}  # line -> compiled condition (or None)
+        self.call_stack: List[str] = []
+        self.mode = "continue"
+        self._target_depth = 0
+        self._instrumented: List[tuple] = []  # (instruction, its real action)
+
+    # Breakpoints
+
+    def add_breakpoint(self, line: int, condition: Optional[str] = None) -> int:
+        """Break before the first instruction at or after line, optionally only when condition holds.
+
+        Returns the line the breakpoint was placed on.
+        """
+        lines = sorted({instr.line_number for instr in self._instructions() if instr.line_number is not None})
+        placed = next((candidate for candidate in lines if candidate >= line), None)
+        if placed is None:
+            raise CLUError(f"No code at or after line {line}")
+        tree = None
+        if condition:
+            try:
+                tree = ConditionParser().parse(EXPRESSION_TOKEN_RE.findall(condition))
+            except CLUError as e:
+                raise CLUError(f"Invalid breakpoint condition: {e.message}", line)
+        self.breakpoints[placed] = tree
+        self._instrument()
+        return placed
+
+    def remove_breakpoint(self, line: int):
+        self.breakpoints.pop(line, None)
+        self._instrument()
+
+    def clear_breakpoints(self):
+        self.breakpoints.clear()
+        self._instrument()
+
+    # Running
+
+    def run(self):
+        """Run the interpreter's loaded program under the debugger"""
+        interpreter = self.interpreter
+        if not interpreter.program:
+            raise CLUError("No program loaded")
+        self.call_stack = []
+        self.mode = "continue"
+        interpreter.debugger = self
+        interpreter._call_function = self._traced_call
+        self._instrument()
+        try:
+            interpreter.run()
+        except DebugStop:
+            pass
+        finally:
+            self._uninstrument()
+            del interpreter._call_function
+            interpreter.debugger = None
+
+    def variables(self) -> Dict[str, Any]:
+        """Variables visible at the pause (callers' variables included, as CLU scoping is dynamic)"""
+        self.interpreter._materialize_strings()
+        return dict(self.interpreter.variables)
+
+    def evaluate(self, expression: str) -> Any:
+        """Evaluate a CLU expression in the paused program's context"""
+        return self.interpreter.evaluate_expression(EXPRESSION_TOKEN_RE.findall(expression))
+
+    def trap(self, instr: Instruction) -> Optional[str]:
+        """Called by the interpreter for an instrumented instruction, before running it"""
+        original = instr.debug_original
+        interpreter = self.interpreter
+        if original.action not in ("otherwise", "end") and interpreter.should_execute():
+            reason = self._pause_reason(original)
+            if reason:
+                self._pause(original, reason)
+        return interpreter.execute_instruction(original)
+
+    def _pause_reason(self, instr: Instruction) -> Optional[str]:
+        line = getattr(instr, "line_number", None)
+        if line in self.breakpoints:
+            condition = self.breakpoints[line]
+            try:
+                if condition is None or self.interpreter._evaluate_condition_tree(condition):
+                    return "breakpoint"
+            except CLUError as e:
+                raise CLUError(f"Breakpoint condition failed: {e.message}", line)
+
+        depth = len(self.call_stack)
+        if self.mode == "step_into" or self.mode == "step_over" and depth <= self._target_depth \
+                or self.mode == "step_out" and depth < self._target_depth:
+            return "step"
+        return None
+
+    def _pause(self, instr: Instruction, reason: str):
+        pause = DebugPause(getattr(instr, "line_number", None), reason, list(self.call_stack), self.variables())
+        command = self.on_pause(pause)
+        if command not in self.COMMANDS:
+            raise CLUError(f"Unknown debugger command {command!r}")
+        if command == "stop":
+            raise DebugStop("Stopped by the debugger")
+
+        previous = self.mode
+        self.mode = command
+        self._target_depth = len(self.call_stack)
+        if (previous == "continue") != (command == "continue"):
+            self._instrument()
+
+    def _traced_call(self, func: Function, arg_values: List[Any]) -> Any:
+        self.call_stack.append(func.name)
+        try:
+            return Interpreter._call_function(self.interpreter, func, arg_values)
+        finally:
+            self.call_stack.pop()
+
+    # Instrumentation
+
+    def _instructions(self) -> List[Instruction]:
+        """Every instruction of the program, loop bodies and functions included"""
+        program = self.interpreter.program
+        if not program:
+            return []
+        found = []
+
+        def visit(body: List[Instruction]):
+            for instr in body:
+                found.append(instr)
+                action = getattr(instr, "debug_original", instr).action
+                if action in ("repeat_block", "repeat_counted"):
+                    visit(instr.args[3])
+                elif action in ("foreach", "parallel_foreach"):
+                    visit(instr.args[2])
+
+        visit(program.instructions)
+        for func in program.functions.values():
+            visit(func.body)
+        return found
+
+    def _instrument(self):
+        """Trap breakpoint lines, or every instruction while stepping"""
+        if self.interpreter.debugger is not self:
+            return
+        self._uninstrument()
+        stepping = self.mode != "continue"
+        for instr in self._instructions():
+            if stepping or instr.line_number in self.breakpoints:
+                instr.debug_original = instr.copy()
+                self._instrumented.append((instr, instr.action))
+                instr.action = "debug_trap"
+
+    def _uninstrument(self):
+        for instr, action in self._instrumented:
+            instr.action = action
+            del instr.debug_original
+        self._instrumented = []
+
+
+@dataclass
+class VariableChange:
+    """One variable update published by a VariableWatcher"""
+    name: str
+    summary: Optional[str]  # None when the variable no longer exists (e.g. a function's local after it returns)
+    line: Optional[int]
+    type_name: str = ""
+
+
+SUMMARY_ITEMS = 5  # elements shown per container by _summarize
+
+
+def _summarize(value: Any, limit: int = 80, depth: int = 3) -> str:
+    """Short display text for a value, looking at no more of it than needed.
+
+    Containers show their first SUMMARY_ITEMS elements, nested up to `depth` levels; deeper
+    ones only give their size.
+    """
+    if type(value) is StringBuilder:
+        head, size = [], 0
+        for chunk in islice(value.chunks, value.count):
+            head.append(chunk)
+            size += len(chunk)
+            if size > limit:
+                break
+        value = "".join(head)
+    if isinstance(value, (list, set, dict)):
+        if not depth:
+            text = f"{len(value)} items" if value else ""
+        elif isinstance(value, dict):
+            text = ", ".join(f"{_summarize(k, 20, depth - 1)}: {_summarize(v, 20, depth - 1)}"
+                             for k, v in islice(value.items(), SUMMARY_ITEMS))
+        else:
+            text = ", ".join(_summarize(item, 20, depth - 1) for item in islice(value, SUMMARY_ITEMS))
+        if depth and len(value) > SUMMARY_ITEMS:
+            text += f", ... ({len(value)} items)"
+        text = f"[{text}]" if isinstance(value, list) else f"{{{text}}}"
+    elif isinstance(value, str):
+        text = repr(value[:limit])
+    else:
+        text = _to_string(value)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _type_name(value: Any) -> str:
+    if type(value) is StringBuilder:
+        return "str"
+    return TypeInferencer.TYPE_NAMES.get(type(value), type(value).__name__)
+
+
+class VariableWatcher:
+    """Publishes variable changes of a running Interpreter, at most once per interval.
+
+    Changes between two publications are coalesced, so on_change(changes) gets one
+    VariableChange per variable with its latest value. It is called on the interpreter's
+    thread; a UI should hand the list over to its own thread. Without a watcher the
+    interpreter only pays a None check per instruction.
+    """
+
+    WRITES = ("assign", "assign_binop", "assign_numeric", "append", "assign_index")
+    CHECK_EVERY = 256  # instructions between clock reads
+
+    def __init__(self, interpreter: Interpreter, on_change: Callable[[List[VariableChange]], None],
+                 interval: float = 0.1):
+        self.interpreter = interpreter
+        self.on_change = on_change
+        self.interval = interval
+        self._pending: Dict[str, Optional[int]] = {}  # written variable -> line of the last write
+        self._published: Dict[str, Any] = {}  # variable -> value as last published
+        self._countdown = self.CHECK_EVERY
+        self._last_flush = 0.0
+
+    def attach(self):
+        self.interpreter.watcher = self
+        self._last_flush = time.monotonic()
+
+    def detach(self):
+        if self.interpreter.watcher is self:
+            self.interpreter.watcher = None
+
+    def run(self):
+        """Run the interpreter's loaded program, publishing changes as it goes"""
+        self.attach()
+        try:
+            self.interpreter.run()
+        finally:
+            self.detach()
+            self.flush()
+
+    def observe(self, instr: Instruction):
+        """Called by the interpreter after each instruction"""
+        if instr.action in self.WRITES and self.interpreter.should_execute():
+            self._pending[instr.args[0]] = getattr(instr, "line_number", None)
+        self._countdown -= 1
+        if not self._countdown:
+            self._countdown = self.CHECK_EVERY
+            if time.monotonic() - self._last_flush >= self.interval:
+                self.flush(getattr(instr, "line_number", None))
+
+    def flush(self, line: Optional[int] = None):
+        """Publish everything that changed since the last call.
+
+        Written variables are always published (lists may be updated in place); others,
+        such as loop variables or values restored after a function call, are found by
+        comparing against what was last published.
+        """
+        variables = self.interpreter.variables
+        published = self._published
+        pending = self._pending
+        changes = []
+        for name, value in variables.items():
+            if name in pending or published.get(name, _MISSING) is not value:
+                published[name] = value
+                changes.append(VariableChange(name, _summarize(value), pending.get(name, line), _type_name(value)))
+        for name in [name for name in published if name not in variables]:
+            del published[name]
+            changes.append(VariableChange(name, None, line))
+        pending.clear()
+        self._last_flush = time.monotonic()
+        if changes:
+            self.on_change(changes)
+
+
+@dataclass
+class TraceEvent:
+    """One decoded record of an ExecutionTracer"""
+    kind: str  # 'line', 'write', 'index', 'call' or 'return'
+    line: Optional[int] = None
+    step: Optional[int] = None  # for 'line': the step it starts
+    name: Optional[str] = None  # variable written or function called
+    value: Any = None  # for 'index': (index, value)
+    # id() of every list/map/set recorded in value -> its copy there, so replay can keep aliases shared
+    identities: Optional[Dict[int, Any]] = None
+
+
+def _deep_copy(value: Any, copies: Dict[int, Any]) -> Any:
+    """Lists, maps and sets are copied all the way down; `copies` (id() -> copy) keeps shared ones shared"""
+    value_type = type(value)
+    if value_type is not list and value_type is not dict and value_type is not set:
+        return value
+    clone = copies.get(id(value))
+    if clone is not None:
+        return clone
+    if value_type is list:
+        clone = copies[id(value)] = []
+        clone.extend([_deep_copy(item, copies) for item in value])
+    elif value_type is dict:
+        clone = copies[id(value)] = {}
+        clone.update([(key, _deep_copy(item, copies)) for key, item in value.items()])
+    else:
+        clone = copies[id(value)] = set(value)  # set items are hashable, so never containers
+    return clone
+
+
+def _replay_copy(value: Any, identities: Dict[int, Any], live: Dict[int, Any]) -> Any:
+    """A recorded value as a fresh object of the replay, reusing the replay's container for any
+    recorded identity that is still live with the same contents"""
+    origins = {id(clone): identity for identity, clone in identities.items()}
+    made: Dict[int, Any] = {}
+
+    def build(item: Any) -> Any:
+        item_type = type(item)
+        if item_type is not list and item_type is not dict and item_type is not set:
+            return item
+        done = made.get(id(item))
+        if done is not None:
+            return done
+        identity = origins.get(id(item))
+        current = live.get(identity) if identity is not None else None
+        if current is not None:
+            try:
+                # An id can be reused once its list is gone, so the contents must match too
+                if current == item:
+                    made[id(item)] = current
+                    return current
+            except RecursionError:
+                pass
+        if item_type is list:
+            clone = made[id(item)] = []
+            clone.extend([build(element) for element in item])
+        elif item_type is dict:
+            clone = made[id(item)] = {}
+            clone.update([(key, build(element)) for key, element in item.items()])
+        else:
+            clone = made[id(item)] = set(item)
+        if identity is not None:
+            live[identity] = clone
+        return clone
+
+    return build(value)
+
+
+class ExecutionTracer:
+    """Records executed lines and variable writes of a running Interpreter for later replay.
+
+    Every event is a 16-byte record (kind, value tag, name id, line, 8-byte payload) packed
+    into a preallocated bytearray used as a ring buffer, so memory stays fixed however long
+    the program runs. Numbers, booleans and none are stored in the record itself; other
+    values go to a parallel object slot, lists, maps and sets as deep copies. A keyframe of all
+    variables is taken a few times per buffer length, so state_at(step) can rebuild the
+    variables at any step still in the buffer even after older records were overwritten.
+    """
+
+    RECORD = struct.Struct("<BBHIq")  # 16 bytes
+    FLOAT_RECORD = struct.Struct("<BBHId")
+    LINE, WRITE, INDEX, CALL, RETURN = range(5)
+    KINDS = ("line", "write", "index", "call", "return")
+    NONE, FALSE, TRUE, INT, FLOAT, OBJECT, CONTAINER = range(7)
+    WRITES = ("assign", "assign_binop", "assign_numeric", "append")
+    KEYFRAMES = 4  # per buffer length
+
+    def __init__(self, interpreter: Optional[Interpreter], capacity: int = 1 << 16):
+        if capacity < self.KEYFRAMES:
+            raise ValueError(f"capacity must be at least {self.KEYFRAMES}")
+        self.interpreter = interpreter
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * self.RECORD.size)
+        self.objects: List[Any] = [None] * capacity
+        self.names: List[str] = []  # name id -> variable or function name
+        self.count = 0  # records written, including overwritten ones
+        self.steps = 0  # lines executed
+        self.keyframes: List[tuple] = []  # (record index, step, variables, caller scopes)
+        self._name_ids: Dict[str, int] = {}
+        self._scopes: List[Dict[str, Any]] = []  # callers' variables during calls, as saved by the interpreter
+        self._next_keyframe = 0
+
+    def attach(self):
+        self.interpreter.tracer = self
+
+    def detach(self):
+        if self.interpreter.tracer is self:
+            self.interpreter.tracer = None
+
+    def run(self):
+        """Run the interpreter's loaded program while tracing; the trace is kept if it fails"""
+        self.attach()
+        try:
+            self.interpreter.run()
+        finally:
+            self.detach()
+
+    # Recording, called by the interpreter
+
+    def before(self, instr: Instruction):
+        interpreter = self.interpreter
+        if not interpreter.should_execute():
+            # Skipped lines are not steps, but the 'otherwise'/'end' closing a taken branch are
+            if instr.action not in ("otherwise", "end") or interpreter.execution_stack[-1] == "skip":
+                return
+        if self.count >= self._next_keyframe:
+            self._keyframe()
+        pos = self.count % self.capacity
+        self.RECORD.pack_into(self.buffer, pos * 16, self.LINE, 0, 0, instr.line_number or 0, self.steps)
+        self.objects[pos] = None
+        self.count += 1
+        self.steps += 1
+
+    def after(self, instr: Instruction):
+        if instr.action in self.WRITES and self.interpreter.should_execute():
+            name = instr.args[0]
+            self.write(name, self.interpreter.variables[name])
+
+    def write(self, name: str, value: Any):
+        self._record(self.WRITE, name, value)
+
+    def store(self, name: str, index: Any, value: Any):
+        identities = {}
+        self._record(self.INDEX, name, (index, _deep_copy(value, identities)), identities)
+
+    def call(self, func: Function, saved: Dict[str, Any]):
+        self._scopes.append(saved)
+        self._record(self.CALL, func.name, None)
+        variables = self.interpreter.variables
+        for param in func.params:
+            self._record(self.WRITE, param, variables[param])
+
+    def ret(self):
+        if self._scopes:
+            self._scopes.pop()
+        self._record(self.RETURN, None, None)
+
+    def _record(self, kind: int, name: Optional[str], value: Any, identities: Optional[Dict[int, Any]] = None):
+        name_id = 0
+        if name is not None:
+            name_id = self._name_ids.get(name)
+            if name_id is None:
+                if len(self.names) > 0xFFFF:
+                    raise CLUError("Too many distinct names to trace")
+                name_id = self._name_ids[name] = len(self.names)
+                self.names.append(name)
+        pos = self.count % self.capacity
+        offset = pos * 16
+        value_type = type(value)
+        obj = None
+        if value is None:
+            self.RECORD.pack_into(self.buffer, offset, kind, self.NONE, name_id, 0, 0)
+        elif value_type is bool:
+            self.RECORD.pack_into(self.buffer, offset, kind, self.TRUE if value else self.FALSE, name_id, 0, 0)
+        elif value_type is int and -(1 << 63) <= value < (1 << 63):
+            self.RECORD.pack_into(self.buffer, offset, kind, self.INT, name_id, 0, value)
+        elif value_type is float:
+            self.FLOAT_RECORD.pack_into(self.buffer, offset, kind, self.FLOAT, name_id, 0, value)
+        elif value_type is list or value_type is dict or value_type is set:
+            identities = {}
+            obj = (_deep_copy(value, identities), identities)
+            self.RECORD.pack_into(self.buffer, offset, kind, self.CONTAINER, name_id, 0, 0)
+        elif identities:
+            obj = (value, identities)
+            self.RECORD.pack_into(self.buffer, offset, kind, self.CONTAINER, name_id, 0, 0)
+        else:
+            # Builders are snapshots already: later appends are invisible to this one
+            obj = value
+            self.RECORD.pack_into(self.buffer, offset, kind, self.OBJECT, name_id, 0, 0)
+        self.objects[pos] = obj
+        self.count += 1
+
+    def _keyframe(self):
+        copies = {}
+        variables = {name: _deep_copy(value, copies) for name, value in self.interpreter.variables.items()}
+        scopes = [{name: _deep_copy(value, copies) for name, value in scope.items()} for scope in self._scopes]
+        self.keyframes.append((self.count, self.steps, variables, scopes, copies))
+        oldest = self.count - self.capacity
+        while len(self.keyframes) > 1 and self.keyframes[1][0] <= oldest:
+            del self.keyframes[0]
+        self._next_keyframe = self.count + self.capacity // self.KEYFRAMES
+
+    # Replay
+
+    @property
+    def first_step(self) -> int:
+        """The earliest step whose state can still be rebuilt"""
+        oldest = self.count - self.capacity
+        for index, step, *_ in self.keyframes:
+            if index >= oldest:
+                return step
+        return self.steps
+
+    def events(self, start: int = 0) -> Iterator[TraceEvent]:
+        """Decode the records still in the buffer, oldest first, from record index `start`"""
+        for index in range(max(start, self.count - self.capacity, 0), self.count):
+            yield self._decode(index)
+
+    def line_at(self, step: int) -> Optional[int]:
+        """The line executed at `step`"""
+        self._check_step(step)
+        for event in self.events(self._keyframe_for(step)[0]):
+            if event.kind == "line" and event.step == step:
+                return event.line
+        return None
+
+    def state_at(self, step: int) -> Dict[str, Any]:
+        """The variables just before `step` ran (steps count executed lines from 0)"""
+        self._check_step(step)
+        index, _, keyframe_vars, keyframe_scopes, keyframe_copies = self._keyframe_for(step)
+        # The replay works on its own copies, so it can update containers in place
+        copies = {}
+        variables = {name: _deep_copy(value, copies) for name, value in keyframe_vars.items()}
+        scopes = [{name: _deep_copy(value, copies) for name, value in scope.items()} for scope in keyframe_scopes]
+        # Recorded container identity -> its container in the replay, so that aliases stay shared
+        live = {identity: copies[id(clone)] for identity, clone in keyframe_copies.items() if id(clone) in copies}
+
+        for event in self.events(index):
+            kind = event.kind
+            if kind == "line":
+                if event.step == step:
+                    break
+            elif kind == "write":
+                value = event.value
+                if event.identities:
+                    value = _replay_copy(value, event.identities, live)
+                variables[event.name] = value
+            elif kind == "index":
+                container = variables[event.name]
+                key, value = event.value
+                if event.identities:
+                    value = _replay_copy(value, event.identities, live)
+                if type(container) is list:
+                    container[key - 1] = value
+                else:
+                    container[key] = value
+            elif kind == "call":
+                scopes.append(variables)
+                variables = dict(variables)
+            elif kind == "return" and scopes:
+                variables = scopes.pop()
+
+        for name, value in variables.items():
+            if type(value) is StringBuilder:
+                variables[name] = str(value)
+        return variables
+
+    def _check_step(self, step: int):
+        if not self.first_step <= step < self.steps:
+            raise ValueError(f"Step {step} is not in the trace (steps {self.first_step} to {self.steps - 1} are)")
+
+    def _keyframe_for(self, step: int) -> tuple:
+        oldest = self.count - self.capacity
+        found = None
+        for keyframe in self.keyframes:
+            if keyframe[0] >= oldest and keyframe[1] <= step:
+                found = keyframe
+        return found
+
+    def _decode(self, index: int) -> TraceEvent:
+        pos = index % self.capacity
+        kind, tag, name_id, line, payload = self.RECORD.unpack_from(self.buffer, pos * 16)
+        if kind == self.LINE:
+            return TraceEvent("line", line, payload)
+        if tag == self.FLOAT:
+            value = self.FLOAT_RECORD.unpack_from(self.buffer, pos * 16)[4]
+        elif tag == self.INT:
+            value = payload
+        elif tag == self.OBJECT:
+            value = self.objects[pos]
+        elif tag == self.CONTAINER:
+            value, identities = self.objects[pos]
+            return TraceEvent(self.KINDS[kind], name=self.names[name_id], value=value, identities=identities)
+        else:
+            value = (None, False, True)[tag]
+        name = self.names[name_id] if kind != self.RETURN else None
+        return TraceEvent(self.KINDS[kind], name=name, value=value)
+
+    # Files
+
+    def save(self, path: str):
+        """Write the trace to a file, for replay in another process with load()"""
+        state = {name: getattr(self, name) for name in
+                 ("capacity", "buffer", "objects", "names", "count", "steps", "keyframes")}
+        with open(path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> "ExecutionTracer":
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        tracer = cls(None, state["capacity"])
+        for name, value in state.items():
+            setattr(tracer, name, value)
+        return tracer
+
+
+@dataclass
+class PurityReport:
+    """Purity classification of one function"""
+    name: str
+    pure: bool = True
+    reasons: List[str] = field(default_factory=list)
+    callees: Set[str] = field(default_factory=set)
+
+
+class PurityAnalyzer:
+    """Static pass classifying each function in a Program as pure or impure.
+
+    A function is pure when it has no 'output', reads no variables other than its
+    parameters and its own locals, reads no files and only calls pure functions.
+    """
+
+    NON_NAME_TOKENS = {
+        "of", "to", "in", "is", "add", "subtract", "multiply", "divide", "and", "or", "not",
+        "True", "False", "greater", "less", "equal", "greater_equal", "less_equal", "not_equal",
+        "null", "none",
+    }
+    NAME_RE = re.compile(r'^[A-Za-z_]\w*$')
+
+    def __init__(self, program: Program):
+        self.program = program
+        self.reports: Dict[str, PurityReport] = {}
+
+    def analyze(self) -> Dict[str, PurityReport]:
+        functions = self.program.functions
+        self.reports = {name: self._analyze_function(func) for name, func in functions.items()}
+
+        # Propagate impurity through the call graph until nothing changes (recursion stays pure)
+        changed = True
+        while changed:
+            changed = False
+            for report in self.reports.values():
+                if not report.pure:
+                    continue
+                for callee in sorted(report.callees):
+                    if callee not in self.reports or not self.reports[callee].pure:
+                        report.pure = False
+                        report.reasons.append(f"calls impure function '{callee}'")
+                        changed = True
+                        break
+
+        return self.reports
+
+    def is_pure(self, name: str) -> bool:
+        if not self.reports:
+            self.analyze()
+        return name in self.reports and self.reports[name].pure
+
+    def cacheable_functions(self) -> List[str]:
+        """Names of pure functions that take arguments, i.e. whose results can be cached"""
+        if not self.reports:
+            self.analyze()
+        return [name for name, report in self.reports.items()
+                if report.pure and self.program.functions[name].params]
+
+    def _analyze_function(self, func: Function) -> PurityReport:
+        report = PurityReport(func.name)
+        defined = set(func.params)
+        assignments: Dict[str, bool] = {}
+        self._collect_assignments(func.body, assignments)
+        built = {name for name, fresh in assignments.items() if fresh and name not in defined}
+        self._analyze_block(func.body, defined, built, report)
+        report.pure = not report.reasons
+        return report
+
+    def _collect_assignments(self, body: List[Instruction], assignments: Dict[str, bool]):
+        """name -> whether every assignment to it builds a new list or map from a literal"""
+        for instr in body:
+            action, args = instr.action, instr.args
+            if action in ("assign", "append", "assign_binop", "assign_numeric"):
+                expr = args[1]
+                fresh = action == "assign" and bool(expr) and (
+                    expr[0] == "{" or "," in expr and "of" not in expr)
+                assignments[args[0]] = assignments.get(args[0], True) and fresh
+            elif action in ("foreach", "parallel_foreach"):
+                assignments[args[0]] = False
+                self._collect_assignments(args[2], assignments)
+            elif action in ("repeat_block", "repeat_counted"):
+                self._collect_assignments(args[3], assignments)
+
+    def _analyze_block(self, body: List[Instruction], defined: Set[str], built: Set[str], report: PurityReport):
+        for instr in body:
+            action, args = instr.action, instr.args
+            line = getattr(instr, "line_number", None)
+
+            if action == "output":
+                report.reasons.append(f"line {line}: produces output")
+            elif action in ("assign", "append", "assign_binop", "assign_numeric"):
+                name, expr = args[:2]
+                self._check_reads(expr, defined, report, line)
+                defined.add(name)
+            elif action == "assign_index":
+                name, index_expr, expr = args
+                self._check_reads(EXPRESSION_TOKEN_RE.findall(index_expr) + list(expr), defined, report, line)
+                if name not in built:
+                    # Anything but a list or map built here may be the caller's, or share its elements
+                    report.reasons.append(f"line {line}: modifies '{name}' in place")
+            elif action == "if":
+                self._check_reads([args[0], args[2]], defined, report, line)
+            elif action in ("if_complex", "if_bool"):
+                self._check_reads(EXPRESSION_TOKEN_RE.findall(args[0]), defined, report, line)
+            elif action in ("repeat_block", "repeat_counted"):
+                var, op, value, loop_body = args[:4]
+                self._check_reads([var, value], defined, report, line)
+                self._analyze_block(loop_body, defined, built, report)
+            elif action in ("foreach", "parallel_foreach"):
+                var, iterable_expr, loop_body = args
+                self._check_reads(iterable_expr, defined, report, line)
+                defined.add(var)
+                self._analyze_block(loop_body, defined, built, report)
+            elif action == "call":
+                report.callees.add(args[0])
+                for arg in args[1:]:
+                    self._check_reads(EXPRESSION_TOKEN_RE.findall(arg), defined, report, line)
+            elif action == "return":
+                self._check_reads(args[0], defined, report, line)
+
+    def _check_reads(self, tokens: List[str], defined: Set[str], report: PurityReport, line: Optional[int]):
+        """Record outer-variable reads, impure builtins and callees in an expression"""
+        for i, token in enumerate(tokens):
+            if token.endswith("]") and "[" in token:
+                name, index_expr = token[:-1].split("[", 1)
+                self._check_reads([name] + EXPRESSION_TOKEN_RE.findall(index_expr), defined, report, line)
+                continue
+            if token in self.NON_NAME_TOKENS or not self.NAME_RE.match(token):
+                continue
+
+            if i + 1 < len(tokens) and tokens[i + 1] == "of":
+                if token in BUILTINS and not BUILTINS[token].pure:
+                    report.reasons.append(f"line {line}: calls impure builtin '{token}'")
+            elif token in self.program.functions:
+                report.callees.add(token)
+            elif token not in defined:
+                report.reasons.append(f"line {line}: reads outer variable '{token}'")
+
+
+@dataclass
+class ParallelReport:
+    """Whether a 'parallel foreach' body can run in worker processes, and what crosses over"""
+    line: Optional[int]
+    parallel: bool = True
+    reasons: List[str] = field(default_factory=list)
+    reads: Set[str] = field(default_factory=set)  # outer variables the body reads, sent to the workers
+    merged: Set[str] = field(default_factory=set)  # outer lists/maps whose elements the body sets
+
+
+class ParallelLoopAnalyzer:
+    """Static check that the iterations of a 'parallel foreach' cannot observe each other.
+
+    That holds when every variable the body assigns is assigned before it is read in the
+    same iteration, the only writes to outer values are element writes to lists/maps the
+    body never reads, every function called is pure and the body neither returns nor breaks
+    out of the loop. Assignments inside an if-branch are not counted after its 'end'.
+    """
+
+    def __init__(self, program: Program):
+        self.program = program
+        self.purity = PurityAnalyzer(program)
+
+    def analyze(self, instr: Instruction) -> ParallelReport:
+        var, iterable_expr, body = instr.args
+        report = ParallelReport(instr.line_number)
+        written = {var} | self._assigned(body)
+        self._walk(body, {var}, written, report, 0)
+        for name in sorted(report.merged & report.reads):
+            report.reasons.append(f"reads '{name}' while setting its elements")
+        report.parallel = not report.reasons
+        return report
+
+    def _assigned(self, body: List[Instruction]) -> Set[str]:
+        names = set()
+        for instr in body:
+            action, args = instr.action, instr.args
+            if action in ("assign", "append", "assign_binop", "assign_numeric"):
+                names.add(args[0])
+            elif action in ("foreach", "parallel_foreach"):
+                names.add(args[0])
+                names |= self._assigned(args[2])
+            elif action in ("repeat_block", "repeat_counted"):
+                names |= self._assigned(args[3])
+        return names
+
+    def _walk(self, body: List[Instruction], assigned: Set[str], written: Set[str], report: ParallelReport,
+              loops: int):
+        branches = []  # what was assigned before each open if-block
+        for instr in body:
+            action, args = instr.action, instr.args
+            line = instr.line_number
+
+            def reads(tokens):
+                self._check_reads(tokens, assigned, written, report, line)
+
+            if action == "output":
+                reads(EXPRESSION_TOKEN_RE.findall(args[0]))
+            elif action in ("assign", "append", "assign_binop", "assign_numeric"):
+                reads(args[1])
+                assigned.add(args[0])
+            elif action == "assign_index":
+                name, index_expr, expr = args
+                reads(EXPRESSION_TOKEN_RE.findall(index_expr) + list(expr))
+                if name in written:
+                    report.reasons.append(f"line {line}: sets elements of loop variable '{name}'")
+                else:
+                    report.merged.add(name)
+            elif action in ("if", "if_complex", "if_bool"):
+                reads([args[0], args[2]] if action == "if" else EXPRESSION_TOKEN_RE.findall(args[0]))
+                branches.append(set(assigned))
+            elif action in ("otherwise", "end") and branches:
+                before = branches.pop() if action == "end" else branches[-1]
+                assigned.intersection_update(before)
+            elif action in ("repeat_block", "repeat_counted"):
+                reads([args[0], args[2]])
+                self._walk(args[3], set(assigned), written, report, loops + 1)
+            elif action in ("foreach", "parallel_foreach"):
+                reads(args[1])
+                self._walk(args[2], assigned | {args[0]}, written, report, loops + 1)
+            elif action == "call":
+                if not self.purity.is_pure(args[0]):
+                    report.reasons.append(f"line {line}: calls impure function '{args[0]}'")
+                for arg in args[1:]:
+                    reads(EXPRESSION_TOKEN_RE.findall(arg))
+            elif action == "return":
+                report.reasons.append(f"line {line}: returns from inside the loop")
+            elif action == "break" and not loops:
+                report.reasons.append(f"line {line}: uses 'break'")
+
+    def _check_reads(self, tokens: List[str], assigned: Set[str], written: Set[str], report: ParallelReport,
+                     line: Optional[int]):
+        for i, token in enumerate(tokens):
+            if token.endswith("]") and "[" in token:
+                name, index_expr = token[:-1].split("[", 1)
+                self._check_reads([name] + EXPRESSION_TOKEN_RE.findall(index_expr), assigned, written, report, line)
+                continue
+            if token in PurityAnalyzer.NON_NAME_TOKENS or not PurityAnalyzer.NAME_RE.match(token):
+                continue
+
+            if i + 1 < len(tokens) and tokens[i + 1] == "of":
+                if token in BUILTINS and not BUILTINS[token].pure:
+                    report.reasons.append(f"line {line}: calls impure builtin '{token}'")
+                elif token in BUILTINS and token not in STANDARD_BUILTINS:
+                    report.reasons.append(f"line {line}: calls builtin '{token}', which worker processes lack")
+            elif token in self.program.functions:
+                if not self.purity.is_pure(token):
+                    report.reasons.append(f"line {line}: calls impure function '{token}'")
+            elif token in written:
+                if token not in assigned:
+                    report.reasons.append(f"line {line}: reads '{token}' before assigning it, "
+                                          f"so each iteration depends on the previous one")
+            else:
+                report.reads.add(token)
+
+
+class _ParallelWorker(Interpreter):
+    """Runs one chunk of a 'parallel foreach' in a pool process, recording element writes to outer containers"""
+
+    def __init__(self, functions: Dict[str, Function], variables: Dict[str, Any], merged: Set[str]):
+        super().__init__(workers=1)
+        self.functions = functions
+        self.memo_caches = {name: MemoCache(func.memo_size) for name, func in functions.items() if func.memoized}
+        self.variables = variables
+        self.merged = merged
+        self.writes: List[tuple] = []
+
+    def _store_index(self, name: str, index: Any, value: Any):
+        if name in self.merged:
+            self.writes.append((name, index, value))
+        else:
+            super()._store_index(name, index, value)
+
+
+def _run_parallel_chunk(task: tuple) -> tuple:
+    """(output, changed variables, element writes, error) of running a chunk of iterations"""
+    var, body, functions, variables, items, merged = task
+    worker = _ParallelWorker(functions, dict(variables), merged)
+    output = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(output):
+        try:
+            worker._iterate(var, items, body)
+        except CLUError as e:
+            error = e
+        except Exception as e:
+            error = CLUError(f"Runtime error: {e}")
+    worker._materialize_strings()
+    changed = {name: value for name, value in worker.variables.items()
+               if name not in merged and variables.get(name, _MISSING) is not value}
+    return output.getvalue(), changed, worker.writes, error
+
+
+# One pool per process, started on the first parallel loop and reused by every interpreter
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(workers)
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+@dataclass
+class TypeReport:
+    """Result of static type inference over a Program"""
+    errors: List[CLUTypeError] = field(default_factory=list)
+    variables: Dict[str, Dict[str, str]] = field(default_factory=dict)  # scope -> variable -> type
+
+
+class TypeInferencer:
+    """Flow-based static type inference over a parsed Program.
+
+    Types are names: 'int', 'float', 'number' (int or float), 'str', 'bool', 'none',
+    'list[T]' / 'list', 'map', 'set', 'range', 'file' and 'any' when nothing is proven.
+    Branches are joined at 'end' and loops are iterated to a fixpoint, so a proven type
+    holds on every path. Besides reporting type errors before execution, apply() lets
+    the interpreter drop runtime type checks where operand types are proven.
+    """
+
+    NUMERIC = ("int", "float", "number")
+    NOT_ITERABLE = ("int", "float", "number", "bool", "str", "none")
+    ORDERING = ("greater", "less", "greater_equal", "less_equal")
+    UNCHECKED_BUILTINS = ("sum", "max", "min", "average")
+    TYPE_NAMES = {int: "int", float: "float", str: "str", bool: "bool", list: "list", dict: "map",
+                  set: "set", range: "range", FileStream: "file"}
+    MAX_PASSES = 10
+
+    def __init__(self, program: Program):
+        self.program = program
+        self.report = TypeReport()
+        self.lists_mutable = self._has_element_writes(program.instructions) or any(
+            self._has_element_writes(func.body) for func in program.functions.values())
+        self._parser = Parser()
+        self._quiet = 0
+        self._loops: List[Dict[str, list]] = []
+        self._scope_types: Dict[str, str] = {}
+        self._proven_binops: List[tuple] = []
+        self._numeric_calls: List[tuple] = []
+
+    def infer(self) -> TypeReport:
+        self.report = TypeReport()
+        self._proven_binops = []
+        self._numeric_calls = []
+
+        scopes = [("<main>", self.program.instructions, {})]
+        scopes += [(name, func.body, {param: "any" for param in func.params})
+                   for name, func in self.program.functions.items()]
+        for scope, body, env in scopes:
+            self._scope_types = {}
+            self._walk(body, env)
+            self.report.variables[scope] = self._scope_types
+
+        self.report.errors.sort(key=lambda e: e.line_number or 0)
+        return self.report
+
+    def apply(self) -> List[InlineCache]:
+        """Specialize instructions whose operand types were proven, returning their inline caches.
+
+        Like Optimizer.optimize(), this rewrites the Program's instructions in place rather than
+        copying them. It is idempotent: applying twice, or inferring and applying again on a
+        program that was already specialized, leaves the instructions as they are.
+        """
+        caches = []
+        for instr, binop, left_type, right_type in self._proven_binops:
+            if instr.action == "append":
+                instr.action = "assign_binop"
+                instr.args = instr.args[:2] + binop
+                instr.inline_cache = InlineCache(binop[1])
+            cache = instr.inline_cache
+            cache.fast = SPECIALIZED_OPERATORS[(cache.op, left_type, right_type)]
+            cache.types = (left_type, right_type)
+            cache.proven = True
+            caches.append(cache)
+        for instr, func_name, arg_name in self._numeric_calls:
+            if instr.action == "assign_numeric":
+                continue
+            name, expr = instr.args
+            instr.action = "assign_numeric"
+            instr.args = (name, expr, func_name, arg_name)
+        return caches
+
+    # Type lattice
+
+    def _join(self, a: str, b: str) -> str:
+        if a == b:
+            return a
+        if a in self.NUMERIC and b in self.NUMERIC:
+            return "number"
+        if a.startswith("list") and b.startswith("list"):
+            element = self._join(self._element(a), self._element(b))
+            return f"list[{element}]" if element != "any" else "list"
+        return "any"
+
+    def _join_env(self, a: Dict[str, str], b: Dict[str, str]) -> Dict[str, str]:
+        # A name missing on one path may be undefined there
+        return {name: self._join(a[name], b[name]) if name in a and name in b else "any"
+                for name in a.keys() | b.keys()}
+
+    def _element(self, list_type: str) -> str:
+        if list_type.startswith("list[") and not self.lists_mutable:
+            return list_type[5:-1]
+        if list_type == "range":
+            return "int"
+        return "any"
+
+    def _list_of(self, element: str) -> str:
+        return f"list[{element}]" if element != "any" and not self.lists_mutable else "list"
+
+    def _error(self, message: str, line: Optional[int]):
+        if not self._quiet:
+            self.report.errors.append(CLUTypeError(message, line))
+
+    def _has_element_writes(self, body: List[Instruction]) -> bool:
+        for instr in body:
+            if instr.action == "assign_index":
+                return True
+            if instr.action in ("foreach", "parallel_foreach") and self._has_element_writes(instr.args[2]):
+                return True
+            if instr.action in ("repeat_block", "repeat_counted") and self._has_element_writes(instr.args[3]):
+                return True
+        return False
+
+    # Statements
+
+    def _assign(self, env: Dict[str, str], name: str, value_type: str):
+        env[name] = value_type
+        if not self._quiet:
+            previous = self._scope_types.get(name)
+            self._scope_types[name] = value_type if previous is None else self._join(previous, value_type)
+
+    def _walk(self, body: List[Instruction], env: Dict[str, str]) -> Dict[str, str]:
+        branches = []  # [env before the if, env at the end of its first branch]
+        for instr in body:
+            action, args = instr.action, instr.args
+            line = getattr(instr, "line_number", None)
+
+            if action == "append" and env.get(args[0]) in ("int", "float"):
+                # A numeric self-append never builds a char: run it as a proven operator
+                binop = self._parser._simple_binop(args[1])
+                if binop:
+                    self._binop(instr, env, args[0], *binop, line)
+                    continue
+            if action in ("assign", "append", "assign_numeric"):
+                expr = args[1]
+                if action == "assign" and not self._quiet and len(expr) == 3 and expr[0] in self.UNCHECKED_BUILTINS \
+                        and expr[1] == "of" and env.get(expr[2], "any").startswith("list") \
+                        and self._element(env[expr[2]]) in self.NUMERIC:
+                    self._numeric_calls.append((instr, expr[0], expr[2]))
+                self._assign(env, args[0], self._expr_type(expr, env, line))
+            elif action == "assign_binop":
+                self._binop(instr, env, args[0], *args[2:], line)
+            elif action == "assign_index":
+                name, index_expr, expr = args
+                self._expr_type(EXPRESSION_TOKEN_RE.findall(index_expr), env, line)
+                self._expr_type(expr, env, line)
+                if env.get(name, "any") not in ("any", "map") and not env.get(name, "").startswith("list"):
+                    self._error(f"'{name}' is not a list or map, it's a {env[name]}", line)
+            elif action == "output":
+                self._expr_type(EXPRESSION_TOKEN_RE.findall(args[0]), env, line)
+            elif action == "if":
+                self._compare(args[0], args[1], args[2], env, line)
+                branches.append([dict(env), None])
+            elif action == "if_complex":
+                self._condition(args[1], env, line)
+                branches.append([dict(env), None])
+            elif action == "if_bool":
+                self._expr_type(EXPRESSION_TOKEN_RE.findall(args[0]), env, line)
+                branches.append([dict(env), None])
+            elif action == "otherwise" and branches:
+                branches[-1][1] = env
+                env = dict(branches[-1][0])
+            elif action == "end" and branches:
+                before, first_branch = branches.pop()
+                env = self._join_env(first_branch if first_branch is not None else before, env)
+            elif action in ("repeat_block", "repeat_counted"):
+                env = self._loop(args[3], env, None, None, args[:3], line)
+            elif action in ("foreach", "parallel_foreach"):
+                var, iterable_expr, loop_body = args
+                iterable = self._expr_type(iterable_expr, env, line)
+                if iterable in self.NOT_ITERABLE:
+                    self._error(f"Cannot loop over {iterable} '{' '.join(iterable_expr)}'", line)
+                env = self._loop(loop_body, env, var, self._element(iterable), None, line)
+            elif action == "call":
+                if args[0] in self.program.functions and len(args) - 1 != len(self.program.functions[args[0]].params):
+                    self._error(f"Function '{args[0]}' expects {len(self.program.functions[args[0]].params)} "
+                                f"arguments, got {len(args) - 1}", line)
+                for arg in args[1:]:
+                    self._expr_type(EXPRESSION_TOKEN_RE.findall(arg), env, line)
+            elif action == "return" and args[0]:
+                self._expr_type(args[0], env, line)
+            elif action == "break" and self._loops:
+                self._loops[-1]["exits"].append(dict(env))
+            elif action == "continue" and self._loops:
+                self._loops[-1]["continues"].append(dict(env))
+        return env
+
+    def _binop(self, instr: Instruction, env: Dict[str, str], name: str, left: tuple, op: str, right: tuple,
+               line: Optional[int]):
+        left_type = self._operand_type(left, env)
+        right_type = self._operand_type(right, env)
+        if not self._quiet and left_type in ("int", "float") and right_type in ("int", "float"):
+            self._proven_binops.append((instr, (left, op, right), int if left_type == "int" else float,
+                                        int if right_type == "int" else float))
+        self._assign(env, name, self._operator_type(left_type, op, right_type, line))
+
+    def _loop(self, body, env, var, var_type, condition, line) -> Dict[str, str]:
+        """Iterate a loop body quietly to a fixpoint, then walk it once more recording errors"""
+        head = dict(env)
+        self._quiet += 1
+        for _ in range(self.MAX_PASSES):
+            end, edges = self._loop_pass(body, head, var, var_type, condition, line)
+            new_head = self._join_env(env, end)
+            for continue_env in edges["continues"]:
+                new_head = self._join_env(new_head, continue_env)
+            if new_head == head:
+                break
+            head = new_head
+        else:
+            # No fixpoint: forget everything the body writes
+            head = {name: head[name] if env.get(name) == head[name] else "any" for name in head}
+        self._quiet -= 1
+
+        _, edges = self._loop_pass(body, head, var, var_type, condition, line)
+        for exit_env in edges["exits"]:
+            head = self._join_env(head, exit_env)
+        return head
+
+    def _loop_pass(self, body, head, var, var_type, condition, line) -> tuple:
+        if condition:
+            self._compare(condition[0], condition[1], condition[2], head, line)
+        entry = dict(head)
+        if var:
+            self._assign(entry, var, var_type)
+        self._loops.append({"exits": [], "continues": []})
+        end = self._walk(body, entry)
+        return end, self._loops.pop()
+
+    # Conditions
+
+    def _condition(self, node: tuple, env: Dict[str, str], line: Optional[int]):
+        kind = node[0]
+        if kind == "compare":
+            self._compare_types(node[1], node[2], node[3], env, line)
+        elif kind in ("and", "or"):
+            for child in node[1]:
+                self._condition(child, env, line)
+        elif kind == "not":
+            self._condition(node[1], env, line)
+        elif kind == "value":
+            self._expr_type(node[1], env, line)
+
+    def _compare(self, left: str, op: str, right: str, env: Dict[str, str], line: Optional[int]):
+        self._compare_types(EXPRESSION_TOKEN_RE.findall(left), op, EXPRESSION_TOKEN_RE.findall(right), env, line)
+
+    def _compare_types(self, left: List[str], op: str, right: List[str], env: Dict[str, str], line: Optional[int]):
+        left_type = self._expr_type(left, env, line)
+        right_type = self._expr_type(right, env, line)
+        if op in self.ORDERING and {left_type, right_type} & {"str"} and {left_type, right_type} & set(self.NUMERIC):
+            self._error(f"Cannot compare {left_type} with {right_type} using '{op}'", line)
+
+    # Expressions (mirrors Interpreter.evaluate_expression / _parse_term)
+
+    def _operand_type(self, operand: tuple, env: Dict[str, str]) -> str:
+        is_literal, value = operand
+        if not is_literal:
+            return "any" if value in self.program.functions else env.get(value, "any")
+        if isinstance(value, bool):
+            return "bool"
+        return type(value).__name__
+
+    def _expr_type(self, tokens: List[str], env: Dict[str, str], line: Optional[int]) -> str:
+        if not tokens:
+            return "any"
+
+        if tokens[0] not in self.program.functions and len(tokens) >= 3 and len(tokens) % 2 == 1 \
+                and all(tokens[i] == "," for i in range(1, len(tokens), 2)):
+            element = None
+            for token in tokens[0::2]:
+                value_type = self._value_type(token, env)
+                element = value_type if element is None else self._join(element, value_type)
+            return self._list_of(element)
+
+        result, pos = self._term_type(tokens, 0, env, line)
+        while pos < len(tokens) - 1 and tokens[pos] in OPERATOR_NAMES:
+            right, next_pos = self._term_type(tokens, pos + 1, env, line)
+            result = self._operator_type(result, OPERATOR_NAMES[tokens[pos]], right, line)
+            pos = next_pos
+        return result
+
+    def _term_type(self, tokens: List[str], pos: int, env: Dict[str, str], line: Optional[int]) -> tuple:
+        if pos >= len(tokens):
+            return "any", pos
+        token = tokens[pos]
+
+        if pos + 2 < len(tokens) and tokens[pos + 1] == "of":
+            if token == "range":
+                start, pos = self._term_type(tokens, pos + 2, env, line)
+                stop, pos = self._term_type(tokens, pos + 1, env, line) if pos < len(tokens) else ("any", pos)
+                for bound in (start, stop):
+                    if bound not in ("int", "any"):
+                        self._error(f"Range bounds must be integers, got {bound}", line)
+                return "range", pos
+
+            arg_types = []
+            arg, pos = self._term_type(tokens, pos + 2, env, line)
+            arg_types.append(arg)
+            arity = BUILTINS[token].arity if token in BUILTINS else 1
+            while len(arg_types) < arity and pos < len(tokens) and tokens[pos] == ",":
+                arg, pos = self._term_type(tokens, pos + 1, env, line)
+                arg_types.append(arg)
+            return self._builtin_type(token, arg_types, line), pos
+
+        if token == "{":
+            depth = 0
+            while pos < len(tokens):
+                depth += {"{": 1, "}": -1}.get(tokens[pos], 0)
+                pos += 1
+                if depth == 0:
+                    break
+            return "map", pos
+
+        if token in self.program.functions:
+            pos += 1
+            for _ in self.program.functions[token].params:
+                _, pos = self._term_type(tokens, pos, env, line)
+            return "any", pos
+
+        return self._value_type(token, env), pos + 1
+
+    def _value_type(self, token: str, env: Dict[str, str]) -> str:
+        if token in ("True", "False"):
+            return "bool"
+        if re.fullmatch(r'\d+\.\d+', token):
+            return "float"
+        match = re.fullmatch(r'(\w+)\[(.+)\]', token)
+        if match:
+            container = env.get(match.group(1), "any")
+            return self._element(container) if container.startswith("list") or container == "range" else "any"
+        if len(token) >= 2 and token[0] == token[-1] and token[0] in "'\"":
+            return "str"
+        if re.fullmatch(r'\d+', token):
+            return "int"
+        if token in env:
+            return env[token]
+        if token.lower() in ("null", "none"):
+            return "none"
+        return "any"
+
+    def _operator_type(self, left: str, op: str, right: str, line: Optional[int]) -> str:
+        if left in self.NUMERIC and right in self.NUMERIC:
+            if left == right == "int":
+                return "int"
+            return "float" if "float" in (left, right) else "number"
+        if "any" in (left, right):
+            return "str" if op == "add" and "str" in (left, right) else "any"
+
+        if op == "add" and "str" in (left, right):
+            return "str"  # '+' turns the other side into chars
+        if op == "add" and left.startswith("list") and right.startswith("list"):
+            return self._join(left, right)
+        if op == "multiply" and "int" in (left, right) and ({left, right} - {"int"} <= {"str"}
+                                                           or left.startswith("list") or right.startswith("list")):
+            return right if left == "int" else left
+        if op == "subtract" and left == right == "set":
+            return "set"
+        if "bool" in (left, right) and {left, right} <= {"bool"} | set(self.NUMERIC):
+            return "any"  # bools count as 0/1 at runtime
+
+        self._error(f"Operator '{op}' cannot be applied to {left} and {right}", line)
+        return "any"
+
+    def _builtin_type(self, name: str, args: List[str], line: Optional[int]) -> str:
+        arg = args[0]
+        is_list = arg.startswith("list") or arg in ("range", "any")
+
+        def expect(ok: bool):
+            if not ok:
+                self._error(f"Function '{name}' cannot be applied to {arg}", line)
+
+        if name in ("sum", "max", "min", "average"):
+            element = self._element(arg)
+            expect((is_list or arg == "file" and name != "average") and element in self.NUMERIC + ("bool", "any"))
+            if name == "average":
+                return "float"
+            return element if element in self.NUMERIC and arg != "any" else "any"
+        if name == "len":
+            expect(is_list or arg in ("str", "map", "set"))
+            return "int"
+        if name in ("first", "last"):
+            expect(is_list)
+            return self._element(arg)
+        if name in ("sorted", "reversed"):
+            expect(is_list or arg == "set" and name == "sorted")
+            return self._list_of(self._element(arg))
+        if name in ("all", "any"):
+            expect(is_list)
+            return "bool"
+        if name in ("keys", "values"):
+            expect(arg in ("map", "any"))
+            return "list"
+        if name in ("lines", "numbers", "rows"):
+            expect(arg in ("str", "any"))
+            return "file"
+        if name in ("int", "float"):
+            expect(arg not in ("list", "map", "set", "range", "file", "none") and not arg.startswith("list"))
+            return name if arg in ("int", "float", "str") else "any"
+        if name in ("str", "type"):
+            return "str"
+        if name in ("bool", "is_bool", "empty", "contains", "has"):
+            return "bool"
+        if name in BUILTINS:
+            # Registered builtins declare the Python types they accept
+            builtin = BUILTINS[name]
+            for value_type, accepted in zip(args, builtin.arg_types):
+                if accepted is not None and not self._accepts(accepted, value_type):
+                    self._error(f"Function '{name}' cannot be applied to {value_type}", line)
+            return builtin.result
+        return "any"
+
+    def _accepts(self, accepted, value_type: str) -> bool:
+        """Whether a value of value_type may pass an isinstance check against accepted"""
+        names = {self.TYPE_NAMES.get(t, "any") for t in (accepted if isinstance(accepted, tuple) else (accepted,))}
+        if "int" in names:
+            names.add("bool")
+        if names & {"int", "float"}:
+            names.add("number")
+        return "any" in names or value_type == "any" or value_type.split("[")[0] in names
+
+
+@dataclass
+class OptimizationReport:
+    """What an Optimizer run changed"""
+    folded: int = 0  # Constant expressions and conditions evaluated ahead of time
+    branches_removed: int = 0  # if-blocks whose condition was constant
+    unreachable_removed: int = 0  # Instructions after a return, break or continue
+    assignments_removed: int = 0  # Constant assignments to variables that are never read
+
+
+class Optimizer:
+    """Constant folding and dead-code elimination over a parsed Program, in place.
+
+    Literal-only expressions (including pure builtin calls) are evaluated once, if-blocks
+    with a constant condition are replaced by the branch that runs, code after a
+    return/break/continue is dropped, and constant assignments to variables that no
+    expression anywhere reads are removed. Expressions that would fail are left for the
+    interpreter to report at runtime.
+    """
+
+    IF_ACTIONS = ("if", "if_bool", "if_complex")
+    MAX_FOLDED_STRING = 256
+    LITERAL_RE = re.compile(r'\d+|\d+\.\d+|".*?"|\'.*?\'|True|False')
+    NAME_RE = re.compile(r'[A-Za-z_]\w*')
+
+    def __init__(self, program: Program):
+        self.program = program
+        self.report = OptimizationReport()
+        self._evaluator = Interpreter()
+
+    def optimize(self) -> OptimizationReport:
+        self.report = OptimizationReport()
+        self.program.instructions = self._optimize_block(self.program.instructions)
+        for func in self.program.functions.values():
+            func.body = self._optimize_block(func.body)
+
+        read = self._read_names()
+        self.program.instructions = self._drop_unused(self.program.instructions, read)
+        for func in self.program.functions.values():
+            func.body = self._drop_unused(func.body, read)
+        return self.report
+
+    def dump(self) -> str:
+        return format_program(self.program)
+
+    # Constants
+
+    def _is_constant(self, tokens: List[str]) -> bool:
+        """Only literals, arithmetic and pure builtins: the value cannot depend on program state"""
+        for i, token in enumerate(tokens):
+            if self.LITERAL_RE.fullmatch(token) or token in OPERATOR_NAMES or token in (",", "of"):
+                continue
+            if i + 1 < len(tokens) and tokens[i + 1] == "of" and token in BUILTINS and BUILTINS[token].pure:
+                continue
+            return False
+        return bool(tokens)
+
+    def _constant_value(self, tokens: List[str]) -> Any:
+        if not self._is_constant(tokens):
+            return _MISSING
+        try:
+            return self._evaluator.evaluate_expression(list(tokens))
+        except Exception:
+            return _MISSING  # Reported when (and if) the interpreter reaches it
+
+    def _literal_tokens(self, value: Any) -> Optional[List[str]]:
+        """Tokens that evaluate back to value, or None when it has no literal form"""
+        if isinstance(value, bool):
+            return ["True" if value else "False"]
+        if isinstance(value, int):
+            return [str(value)] if value >= 0 else ["0", "-", str(-value)]
+        if isinstance(value, float):
+            text = repr(abs(value))
+            if not re.fullmatch(r'\d+\.\d+', text) or str(value) == "-0.0":
+                return None
+            return [text] if value >= 0 else ["0.0", "-", text]
+        if isinstance(value, str) and len(value) <= self.MAX_FOLDED_STRING:
+            for quote in ("'", '"'):
+                if quote not in value:
+                    return [quote + value + quote]
+        return None
+
+    def _fold(self, tokens: List[str]) -> List[str]:
+        """Fold a whole constant expression, or else its leading run of literal arithmetic"""
+        if len(tokens) < 2:
+            return tokens
+        value = self._constant_value(tokens)
+        literal = self._literal_tokens(value) if value is not _MISSING else None
+        if literal is not None:
+            if literal != list(tokens):
+                self.report.folded += 1
+            return literal
+
+        # Evaluation is left to right, so '2 multiply 3 add x' starts with the value 6
+        if "," in tokens or not self.LITERAL_RE.fullmatch(tokens[0]):
+            return tokens
+        end = 1
+        while end + 1 < len(tokens) and tokens[end] in OPERATOR_NAMES and self.LITERAL_RE.fullmatch(tokens[end + 1]):
+            end += 2
+        if end == 1 or end >= len(tokens) or tokens[end] not in OPERATOR_NAMES:
+            return tokens
+        literal = self._literal_tokens(self._constant_value(tokens[:end]))
+        if literal is None or len(literal) > 1:
+            return tokens
+        self.report.folded += 1
+        return literal + list(tokens[end:])
+
+    def _fold_condition(self, node: tuple) -> tuple:
+        """Simplify a ConditionParser tree; constant parts become ('const', value)"""
+        kind = node[0]
+        if kind == "compare":
+            left, right = self._fold(node[1]), self._fold(node[3])
+            left_value, right_value = self._constant_value(left), self._constant_value(right)
+            if left_value is not _MISSING and right_value is not _MISSING:
+                try:
+                    result = bool(COMPARISON_OPERATORS[node[2]](left_value, right_value))
+                except TypeError:
+                    return ("compare", left, node[2], right)
+                self.report.folded += 1
+                return ("const", result)
+            return ("compare", left, node[2], right)
+        if kind == "value":
+            tokens = self._fold(node[1])
+            value = self._constant_value(tokens)
+            if value is not _MISSING:
+                self.report.folded += 1
+                return ("const", bool(value))
+            return ("value", tokens)
+        if kind == "not":
+            child = self._fold_condition(node[1])
+            return ("const", not child[1]) if child[0] == "const" else ("not", child)
+        if kind in ("and", "or"):
+            # 'and' skips True operands and stops at False ('or' the reverse); earlier operands still run
+            neutral = kind == "and"
+            children = []
+            for child in node[1]:
+                child = self._fold_condition(child)
+                if child[0] == "const":
+                    if child[1] == neutral:
+                        continue
+                    if not children:
+                        return child
+                    children.append(child)
+                    break
+                children.append(child)
+            if not children:
+                return ("const", neutral)
+            return children[0] if len(children) == 1 else (kind, tuple(children))
+        return node
+
+    def _condition_value(self, instr: Instruction) -> Any:
+        """Fold the condition of an if-instruction, returning its value when it is constant"""
+        if instr.action == "if":
+            left, op, right = instr.args
+            node = self._fold_condition(("compare", EXPRESSION_TOKEN_RE.findall(left), op,
+                                         EXPRESSION_TOKEN_RE.findall(right)))
+        elif instr.action == "if_bool":
+            node = self._fold_condition(("value", EXPRESSION_TOKEN_RE.findall(instr.args[0])))
+        else:
+            node = self._fold_condition(instr.args[1])
+            if node != instr.args[1]:
+                instr.args = (format_condition(node), node)
+        return node[1] if node[0] == "const" else _MISSING
+
+    # Blocks
+
+    def _optimize_block(self, body: List[Instruction]) -> List[Instruction]:
+        body = list(body)
+        i = 0
+        while i < len(body):
+            instr = body[i]
+            action = instr.action
+
+            if action in self.IF_ACTIONS:
+                value = self._condition_value(instr)
+                if value is not _MISSING:
+                    # Keep only the branch that runs, without its if/otherwise/end
+                    otherwise, end = self._branch_bounds(body, i)
+                    if value:
+                        kept = body[i + 1:otherwise if otherwise is not None else end]
+                    else:
+                        kept = body[otherwise + 1:end] if otherwise is not None else []
+                    body[i:end + 1] = kept
+                    self.report.branches_removed += 1
+                    continue
+            elif action in ("return", "break", "continue"):
+                if action == "return" and instr.args[0]:
+                    instr.args = (self._fold(instr.args[0]),)
+                # Nothing after a jump runs before the enclosing block ends
+                _, end = self._branch_bounds(body, i, stop_at_otherwise=True)
+                self.report.unreachable_removed += end - i - 1
+                del body[i + 1:end]
+            else:
+                self._optimize_instruction(instr)
+            i += 1
+        return body
+
+    def _optimize_instruction(self, instr: Instruction):
+        action, args = instr.action, instr.args
+        if action == "assign":
+            instr.args = (args[0], self._fold(args[1]))
+        elif action == "assign_binop":
+            value = self._constant_value(args[1])
+            literal = self._literal_tokens(value) if value is not _MISSING else None
+            if literal is not None:
+                instr.action = "assign"
+                instr.args = (args[0], literal)
+                self.report.folded += 1
+        elif action == "assign_index":
+            instr.args = (args[0], args[1], self._fold(args[2]))
+        elif action == "output":
+            instr.args = (" ".join(self._fold(EXPRESSION_TOKEN_RE.findall(args[0]))),)
+        elif action in ("foreach", "parallel_foreach"):
+            instr.args = (args[0], self._fold(args[1]), self._optimize_block(args[2]))
+        elif action in ("repeat_block", "repeat_counted"):
+            body = self._optimize_block(args[3])
+            if action == "repeat_counted":
+                increment = args[3][args[4]]
+                if increment in body:
+                    instr.args = args[:3] + (body, body.index(increment)) + args[5:]
+                else:
+                    # The counter update turned out to be unreachable
+                    instr.action = "repeat_block"
+                    instr.args = args[:3] + (body,)
+            else:
+                instr.args = args[:3] + (body,)
+
+    def _branch_bounds(self, body: List[Instruction], start: int, stop_at_otherwise: bool = False) -> tuple:
+        """Indexes of the 'otherwise' (or None) and the 'end' closing the if-block at start.
+
+        With stop_at_otherwise, start is inside a block and the first closing
+        'otherwise'/'end' (or the end of the body) is returned instead.
+        """
+        depth = 0
+        otherwise = None
+        for j in range(start + 1, len(body)):
+            action = body[j].action
+            if action in self.IF_ACTIONS:
+                depth += 1
+            elif action == "otherwise" and depth == 0:
+                if stop_at_otherwise:
+                    return None, j
+                otherwise = j
+            elif action == "end":
+                if depth == 0:
+                    return otherwise, j
+                depth -= 1
+        if stop_at_otherwise:
+            return None, len(body)
+        raise CLUError("'if' without matching 'end'", getattr(body[start], "line_number", None))
+
+    # Unused assignments
+
+    def _read_names(self) -> Set[str]:
+        """Every name any expression in the program mentions (functions share variables dynamically)"""
+        names: Set[str] = set()
+
+        def visit(body: List[Instruction]):
+            for instr in body:
+                action, args = instr.action, instr.args
+                if action in ("assign", "append", "assign_binop", "assign_numeric"):
+                    texts = list(args[1])
+                elif action == "assign_index":
+                    texts = [args[0], args[1]] + list(args[2])
+                elif action == "if_complex":
+                    texts = [args[0]]
+                elif action in ("repeat_block", "repeat_counted"):
+                    texts = list(args[:3])
+                    visit(args[3])
+                elif action in ("foreach", "parallel_foreach"):
+                    texts = list(args[1])
+                    visit(args[2])
+                elif action == "return":
+                    texts = list(args[0])
+                else:
+                    texts = [arg for arg in args if isinstance(arg, str)]
+                for text in texts:
+                    names.update(self.NAME_RE.findall(text))
+
+        visit(self.program.instructions)
+        for func in self.program.functions.values():
+            visit(func.body)
+        return names
+
+    def _drop_unused(self, body: List[Instruction], read: Set[str]) -> List[Instruction]:
+        kept = []
+        for instr in body:
+            if instr.action == "assign" and instr.args[0] not in read \
+                    and self._constant_value(instr.args[1]) is not _MISSING:
+                self.report.assignments_removed += 1
+                continue
+            if instr.action in ("foreach", "parallel_foreach"):
+                instr.args = instr.args[:2] + (self._drop_unused(instr.args[2], read),)
+            elif instr.action in ("repeat_block", "repeat_counted"):
+                body_before = instr.args[3]
+                new_body = self._drop_unused(body_before, read)
+                if instr.action == "repeat_counted":
+                    # Unused assignments are never the counter, which the condition reads
+                    increment = body_before[instr.args[4]]
+                    instr.args = instr.args[:3] + (new_body, new_body.index(increment)) + instr.args[5:]
+                else:
+                    instr.args = instr.args[:3] + (new_body,)
+            kept.append(instr)
+        return kept
+
+
+def format_condition(node: tuple) -> str:
+    """Source text of a ConditionParser tree"""
+    kind = node[0]
+    if kind == "compare":
+        return f"{' '.join(node[1])} {node[2]} {' '.join(node[3])}"
+    if kind in ("and", "or"):
+        return f" {kind} ".join(format_condition(child) if child[0] not in ("and", "or")
+                                else f"({format_condition(child)})" for child in node[1])
+    if kind == "not":
+        child = format_condition(node[1])
+        return f"not {child}" if node[1][0] in ("value", "const") else f"not ({child})"
+    if kind == "const":
+        return "True" if node[1] else "False"
+    return " ".join(node[1])
+
+
+def format_program(program: Program) -> str:
+    """CLU source for a parsed (for example optimized) Program, for inspection"""
+    lines: List[str] = []
+
+    def emit(body: List[Instruction], depth: int):
+        for instr in body:
+            action, args = instr.action, instr.args
+            if action in ("otherwise", "end"):
+                depth -= 1
+            indent = "    " * depth
+            if action in ("assign", "append", "assign_binop", "assign_numeric"):
+                lines.append(f"{indent}var {args[0]} is {' '.join(args[1])}")
+            elif action == "assign_index":
+                lines.append(f"{indent}var {args[0]}[{args[1]}] is {' '.join(args[2])}")
+            elif action == "output":
+                lines.append(f"{indent}output {args[0]}")
+            elif action == "if":
+                lines.append(f"{indent}if {' '.join(args)}")
+            elif action == "if_bool":
+                lines.append(f"{indent}if {args[0]}")
+            elif action == "if_complex":
+                lines.append(f"{indent}if {args[0]}")
+            elif action in ("repeat_block", "repeat_counted"):
+                lines.append(f"{indent}repeat {' '.join(args[:3])}")
+                emit(args[3], depth + 1)
+                lines.append(f"{indent}end")
+            elif action in ("foreach", "parallel_foreach"):
+                keyword = "parallel foreach" if action == "parallel_foreach" else "foreach"
+                lines.append(f"{indent}{keyword} {args[0]} in {' '.join(args[1])}")
+                emit(args[2], depth + 1)
+                lines.append(f"{indent}end")
+            elif action == "return":
+                lines.append(f"{indent}return {' '.join(args[0])}".rstrip())
+            elif action == "call":
+                lines.append(f"{indent}{' '.join(args)}")
+            else:
+                lines.append(f"{indent}{action}")
+            if action in ("if", "if_bool", "if_complex", "otherwise"):
+                depth += 1
+
+    for func in program.functions.values():
+        header = f"function {func.name}" + (f" -> {'/'.join(func.params)}" if func.params else "")
+        if func.memoized:
+            header = "memo " + (f"{func.memo_size} " if func.memo_size else "") + header
+        lines.append(header)
+        emit(func.body, 1)
+        lines.append("end")
+        lines.append("")
+    emit(program.instructions, 0)
+    return "\n".join(lines)
+
+
+@dataclass
+class Diagnostic:
+    """A problem found by the Validator; line and column are 1-based"""
+    line: int
+    column: int
+    message: str
+    severity: str = "error"  # 'error' or 'warning'
+
+
+class _Token(str):
+    """A token that remembers its 1-based column (ConditionParser and slicing keep it)"""
+    col = 1
+
+
+class _LineFacts:
+    """What one source line means on its own: the problems it has, the names it
+    assigns and reads and the user functions it calls. Cached by line text."""
+
+    def __init__(self, kind: Optional[str] = None, col: int = 1):
+        self.kind = kind  # first token, e.g. 'var', 'if', 'end', 'function'; None for blank lines
+        self.col = col
+        self.problems: List[tuple] = []  # (column, message, severity)
+        self.defines: List[str] = []
+        self.reads: List[tuple] = []  # (name, column)
+        self.calls: List[tuple] = []  # (function name, argument count, column), for call statements
+
+    def error(self, col: int, message: str):
+        self.problems.append((col, message, "error"))
+
+    def warning(self, col: int, message: str):
+        self.problems.append((col, message, "warning"))
+
+
+class Validator:
+    """Non-executing checker reporting every problem in a program, with line and column.
+
+    Besides what the Parser rejects it finds unmatched 'end'/'otherwise', blocks that are
+    never closed, variables that are never assigned, unknown builtins and calls with the
+    wrong number of arguments. Each line is checked on its own and cached by its text, so
+    re-validating after an edit only looks again at the changed lines; only block
+    structure, calls and names are checked across lines.
+    """
+
+    TOKEN_RE = re.compile(Tokenizer([]).token_pattern)
+    NAME_RE = re.compile(r'[A-Za-z_]\w*')
+    INDEX_RE = re.compile(r'(\w+)\[(.+)\]')
+    LITERAL_RE = re.compile(r'\d+\.\d+|\d+|\'.*\'|".*"')
+    OPENERS = {"if": "if", "repeat": "loop", "foreach": "loop", "function": "function", "memo": "function"}
+    STRUCTURAL = frozenset(OPENERS) | {"end", "otherwise", "return", "break", "continue", "import"}
+
+    def __init__(self, base_dir: Optional[str] = None):
+        self.base_dir = base_dir  # where imported modules are looked up, as for Parser
+        self._tokens: Dict[str, List[_Token]] = {}
+        self._facts: Dict[str, _LineFacts] = {}
+        self._signatures: Dict[str, int] = {}  # user function -> parameter count, which line facts depend on
+
+    def validate(self, source: Union[str, List[str]]) -> List[Diagnostic]:
+        lines = source.splitlines() if isinstance(source, str) else list(source)
+
+        signatures = {}
+        diagnostics = []
+        for line_num, line in enumerate(lines, 1):
+            if "function" not in line and "import" not in line:
+                continue
+            tokens = self._tokens.get(line)
+            if tokens is None:
+                tokens = self._tokens[line] = self._tokenize(line)
+            if not tokens:
+                continue
+            if tokens[0] in ("function", "memo"):
+                signature = self._signature(tokens)
+                if signature:
+                    signatures[signature[0]] = len(signature[1])
+            elif tokens[0] == "import" and len(tokens) == 2:
+                # Modules come from the shared cache, so this costs a stat per file once loaded
+                try:
+                    module = load_module(resolve_module(tokens[1], self.base_dir))
+                except CLUError as e:
+                    diagnostics.append(Diagnostic(line_num, tokens[1].col, e.message))
+                    continue
+                for name, func in module.functions.items():
+                    signatures[name] = len(func.params)
+        if signatures != self._signatures:
+            self._signatures = signatures
+            self._facts.clear()
+
+        defined = set()
+        reads = []
+        stack = []  # open blocks: (kind, line, column, first token, enclosing loop depth)
+        loops = 0
+        facts_cache = self._facts
+        structural = self.STRUCTURAL
+        for line_num, line in enumerate(lines, 1):
+            facts = facts_cache.get(line)
+            if facts is None:
+                facts = facts_cache[line] = self._line_facts(line)
+            if facts.problems:
+                for col, message, severity in facts.problems:
+                    diagnostics.append(Diagnostic(line_num, col, message, severity))
+            if facts.defines:
+                defined.update(facts.defines)
+            if facts.reads:
+                reads.append((line_num, facts.reads))
+            if facts.calls:
+                for name, count, col in facts.calls:
+                    if name not in signatures:
+                        diagnostics.append(Diagnostic(line_num, col, f"Function '{name}' not defined"))
+                    elif count != signatures[name]:
+                        diagnostics.append(Diagnostic(
+                            line_num, col, f"Function '{name}' expects {signatures[name]} arguments, got {count}"))
+
+            kind = facts.kind
+            if kind not in structural:
+                continue
+            opens = self.OPENERS.get(kind)
+            if opens == "function":
+                if any(block[0] == "function" for block in stack):
+                    diagnostics.append(Diagnostic(line_num, facts.col, "Functions cannot be defined inside a function"))
+                stack.append((opens, line_num, facts.col, kind, loops))
+                loops = 0
+            elif opens:
+                stack.append((opens, line_num, facts.col, kind, loops))
+                if opens == "loop":
+                    loops += 1
+            elif kind == "end":
+                if stack:
+                    loops = stack.pop()[4]
+                else:
+                    diagnostics.append(Diagnostic(line_num, facts.col, "'end' without an open block"))
+            elif kind == "otherwise":
+                if not stack or stack[-1][0] != "if":
+                    diagnostics.append(Diagnostic(line_num, facts.col, "'otherwise' without matching 'if'"))
+            elif kind == "return":
+                if not any(block[0] == "function" for block in stack):
+                    diagnostics.append(Diagnostic(line_num, facts.col, "'return' outside of a function"))
+            elif kind == "import":
+                if stack:
+                    diagnostics.append(Diagnostic(line_num, facts.col, "'import' is only allowed at the top level"))
+            elif not loops:
+                diagnostics.append(Diagnostic(line_num, facts.col, f"'{kind}' outside of a loop"))
+
+        for _, line_num, col, first, _ in stack:
+            diagnostics.append(Diagnostic(line_num, col, f"'{first}' block is missing its 'end'"))
+
+        # CLU scoping is dynamic, so a name assigned anywhere may be visible anywhere
+        for line_num, names in reads:
+            for name, col in names:
+                if name not in defined:
+                    diagnostics.append(Diagnostic(line_num, col, f"Variable '{name}' is not defined"))
+
+        # Forget lines that were edited away
+        if len(self._facts) > 2 * len(lines) + 1024:
+            self._facts = {line: facts_cache[line] for line in lines if line in facts_cache}
+            self._tokens = {line: self._tokens[line] for line in lines if line in self._tokens}
+
+        diagnostics.sort(key=lambda d: (d.line, d.column))
+        return diagnostics
+
+    def validate_response(self, source: Union[str, List[str]]) -> Dict[str, Any]:
+        """The JSON body for /api/validate: valid, the first error's text and every diagnostic"""
+        diagnostics = self.validate(source)
+        errors = [d for d in diagnostics if d.severity == "error"]
+        return {
+            "valid": not errors,
+            "error": f"Line {errors[0].line}: {errors[0].message}" if errors else None,
+            "diagnostics": [vars(d) for d in diagnostics],
         }
 
-        if op not in operators:
-            raise CLUError(f"Unknown comparison operator '{op}'")
+    # Lines
+
+    def _tokenize(self, line: str) -> List[_Token]:
+        """The Tokenizer's tokens for one line, with columns"""
+        return self._split(line.split("#", 1)[0], 1, self.TOKEN_RE)
+
+    @staticmethod
+    def _split(text: str, col: int, pattern: re.Pattern = EXPRESSION_TOKEN_RE) -> List[_Token]:
+        tokens = []
+        for match in pattern.finditer(text):
+            token = _Token(match.group())
+            token.col = col + match.start()
+            tokens.append(token)
+        return tokens
+
+    def _resplit(self, token: _Token) -> List[_Token]:
+        """Tokens of an argument the interpreter tokenizes again before evaluating it"""
+        return self._split(token, token.col)
+
+    def _signature(self, tokens: List[str]) -> Optional[tuple]:
+        """(name, params) of a function definition line, None if it is malformed"""
+        if tokens[0] == "memo":
+            tokens = tokens[1:]
+            if tokens and tokens[0].isdigit():
+                tokens = tokens[1:]
+            if not tokens or tokens[0] != "function":
+                return None
+        if len(tokens) < 2 or (len(tokens) > 2 and (tokens[2] != "->" or len(tokens) != 4)):
+            return None
+        return tokens[1], tokens[3].split("/") if len(tokens) > 2 else []
+
+    def _line_facts(self, line: str) -> _LineFacts:
+        tokens = self._tokens.get(line)
+        if tokens is None:
+            tokens = self._tokens[line] = self._tokenize(line)
+        if not tokens:
+            return _LineFacts()
+
+        head = tokens[0]
+        if head == "parallel":
+            if len(tokens) < 2 or tokens[1] != "foreach":
+                facts = _LineFacts(head, head.col)
+                facts.error(head.col, "'parallel' must be followed by a foreach loop")
+                return facts
+            tokens = tokens[1:]
+            head = tokens[0]
+        facts = _LineFacts(head, head.col)
+        if head == "var":
+            self._var_facts(tokens, facts)
+        elif head == "output":
+            if len(tokens) <= 1:
+                facts.error(head.col, "Output statement requires an expression")
+            else:
+                code = line.split("#", 1)[0]
+                self._expression(self._split(code[tokens[1].col - 1:], tokens[1].col), facts, head.col)
+        elif head == "if":
+            self._if_facts(tokens, facts)
+        elif head == "repeat":
+            if len(tokens) < 4:
+                facts.error(head.col, "Invalid repeat statement")
+            else:
+                if tokens[2] not in COMPARISON_OPERATORS:
+                    facts.error(tokens[2].col, f"Unknown comparison operator '{tokens[2]}'")
+                self._expression(self._resplit(tokens[1]), facts, tokens[1].col)
+                self._expression(self._resplit(tokens[3]), facts, tokens[3].col)
+        elif head == "foreach":
+            if len(tokens) < 4 or tokens[2] != "in":
+                facts.error(head.col, "Invalid foreach statement")
+            else:
+                facts.defines.append(tokens[1])
+                if len(tokens) == 4:
+                    if self.NAME_RE.fullmatch(tokens[3]):
+                        facts.reads.append((tokens[3], tokens[3].col))
+                    else:
+                        facts.error(tokens[3].col, f"Variable '{tokens[3]}' not defined")
+                else:
+                    self._expression(tokens[3:], facts, tokens[3].col)
+        elif head in ("function", "memo"):
+            self._function_facts(tokens, facts)
+        elif head == "return":
+            if len(tokens) > 1:
+                self._expression(tokens[1:], facts, tokens[1].col)
+        elif head in ("break", "continue"):
+            if len(tokens) != 1:
+                facts.error(tokens[1].col, f"'{head}' takes no arguments")
+        elif head == "import":
+            if len(tokens) != 2:
+                facts.error(head.col, "Invalid import statement, expected 'import NAME' or 'import \"path.clu\"'")
+        elif head not in ("otherwise", "end"):
+            facts.kind = "call"
+            facts.calls.append((head, len(tokens) - 1, head.col))
+            for arg in tokens[1:]:
+                self._expression(self._resplit(arg), facts, arg.col)
+        return facts
+
+    def _var_facts(self, tokens: List[_Token], facts: _LineFacts):
+        if "is" not in tokens:
+            facts.error(tokens[0].col, "Missing 'is' in variable assignment")
+            return
+        idx = tokens.index("is")
+        if len(tokens) < idx + 2:
+            name = tokens[1] if len(tokens) > 1 else "unknown"
+            facts.error(tokens[idx].col, f"Variable '{name}' assignment is incomplete")
+            return
+
+        name = tokens[1]
+        match = self.INDEX_RE.fullmatch(name)
+        if match:
+            facts.reads.append((match.group(1), name.col))
+            self._expression(self._split(match.group(2), name.col + len(match.group(1)) + 1), facts, name.col)
+        else:
+            facts.defines.append(name)
+        self._expression(tokens[idx + 1:], facts, tokens[idx].col)
+
+    def _if_facts(self, tokens: List[_Token], facts: _LineFacts):
+        if len(tokens) == 4 and tokens[2] in COMPARISON_OPERATORS:
+            self._expression(self._resplit(tokens[1]), facts, tokens[1].col)
+            self._expression(self._resplit(tokens[3]), facts, tokens[3].col)
+        elif len(tokens) == 2 and tokens[1] not in ("(", ")"):
+            if tokens[1] not in ("True", "False"):
+                self._expression(self._resplit(tokens[1]), facts, tokens[1].col)
+        elif len(tokens) > 2:
+            try:
+                tree = ConditionParser().parse(tokens[1:])
+            except CLUError as e:
+                facts.error(tokens[1].col, e.message)
+                return
+            self._condition(tree, facts)
+        else:
+            facts.error(tokens[0].col, "Invalid if statement syntax")
+
+    def _condition(self, node: tuple, facts: _LineFacts):
+        kind = node[0]
+        if kind == "compare":
+            self._expression(node[1], facts, node[1][0].col)
+            self._expression(node[3], facts, node[3][0].col)
+        elif kind in ("and", "or"):
+            for child in node[1]:
+                self._condition(child, facts)
+        elif kind == "not":
+            self._condition(node[1], facts)
+        elif kind == "value":
+            self._expression(node[1], facts, node[1][0].col)
+
+    def _function_facts(self, tokens: List[_Token], facts: _LineFacts):
+        signature = self._signature(tokens)
+        if signature:
+            facts.defines.extend(signature[1])
+            return
+        # Malformed: report it the way the Parser does
+        if tokens[0] == "memo":
+            rest = tokens[2:] if len(tokens) > 1 and tokens[1].isdigit() else tokens[1:]
+            if not rest or rest[0] != "function":
+                facts.error(tokens[0].col, "'memo' must be followed by a function definition")
+                return
+            tokens = rest
+        if len(tokens) < 2:
+            facts.error(tokens[0].col, "Function definition requires a name")
+        else:
+            facts.error(tokens[1].col, f"Invalid parameter list for function '{tokens[1]}', "
+                                       f"expected 'function {tokens[1]} -> a/b'")
 
-        return operators[op](left_val, right_val)
\ No newline at end of file
+    # Expressions, mirroring Interpreter.evaluate_expression / _parse_expression / _parse_term
+
+    def _expression(self, tokens: List[_Token], facts: _LineFacts, col: int):
+        if not tokens:
+            facts.error(col, "Empty expression")
+            return
+        first = tokens[0]
+        if first in self._signatures:
+            pass
+        elif len(tokens) == 1 and first in ("True", "False"):
+            return
+        elif len(tokens) >= 3 and len(tokens) % 2 == 1 and all(t == "," for t in tokens[1::2]):
+            # List literal: only literals and plain variable names
+            for token in tokens[0::2]:
+                if self.NAME_RE.fullmatch(token):
+                    facts.reads.append((token, token.col))
+                elif not self.LITERAL_RE.fullmatch(token):
+                    facts.error(token.col, f"Variable '{token}' not defined")
+            return
+        elif len(tokens) == 3 and tokens[1] == "of":
+            builtin = BUILTINS.get(first)
+            if builtin is None:
+                facts.error(first.col, f"Unknown built-in function '{first}'")
+            elif builtin.arity != 1:
+                facts.error(first.col, f"Function '{first}' expects {builtin.arity} arguments, got 1")
+            self._expression(self._resplit(tokens[2]), facts, tokens[2].col)
+            return
+        elif len(tokens) == 1:
+            self._value(first, facts)
+            return
+
+        pos = self._term(tokens, 0, facts)
+        while pos < len(tokens) - 1 and tokens[pos] in OPERATOR_NAMES:
+            pos = self._term(tokens, pos + 1, facts)
+        if pos < len(tokens):
+            facts.warning(tokens[pos].col, f"Unexpected '{tokens[pos]}': the rest of the expression is ignored")
+
+    def _term(self, tokens: List[_Token], pos: int, facts: _LineFacts) -> int:
+        """Check one term and return the position after it (the end, after an error it can't skip)"""
+        if pos >= len(tokens):
+            facts.error(tokens[-1].col, "Unexpected end of expression")
+            return pos
+        token = tokens[pos]
+
+        if pos + 2 < len(tokens) and tokens[pos + 1] == "of":
+            if token == "range":
+                pos = self._term(tokens, pos + 2, facts)
+                if pos >= len(tokens) or tokens[pos] != "to":
+                    facts.error(token.col, "Expected 'to' in range expression, e.g. 'range of 1 to 10'")
+                    return len(tokens)
+                return self._term(tokens, pos + 1, facts)
+
+            builtin = BUILTINS.get(token)
+            if builtin is None:
+                facts.error(token.col, f"Unknown function '{token}'")
+                return len(tokens)
+            pos = self._term(tokens, pos + 2, facts)
+            count = 1
+            while count < builtin.arity and pos < len(tokens) and tokens[pos] == ",":
+                pos = self._term(tokens, pos + 1, facts)
+                count += 1
+            if count != builtin.arity:
+                facts.error(token.col, f"Function '{token}' expects {builtin.arity} arguments, got {count}")
+            return pos
+
+        if token in BUILTINS and pos + 1 < len(tokens) and tokens[pos + 1] == "of":
+            facts.error(token.col, f"Function '{token}' is missing its argument")
+            return len(tokens)
+
+        if token == "{":
+            pos += 1
+            while pos < len(tokens) and tokens[pos] != "}":
+                pos = self._term(tokens, pos, facts)
+                if pos >= len(tokens) or tokens[pos] != ":":
+                    facts.error(token.col, "Expected ':' between map key and value")
+                    return len(tokens)
+                pos = self._term(tokens, pos + 1, facts)
+                if pos < len(tokens) and tokens[pos] == ",":
+                    pos += 1
+            if pos >= len(tokens):
+                facts.error(token.col, "Map literal is missing a closing '}'")
+                return pos
+            return pos + 1
+
+        if token in self._signatures:
+            pos += 1
+            for _ in range(self._signatures[token]):
+                pos = self._term(tokens, pos, facts)
+            return pos
+
+        self._value(token, facts)
+        return pos + 1
+
+    def _value(self, token: _Token, facts: _LineFacts):
+        if token in ("True", "False") or token.lower() in ("null", "none") or self.LITERAL_RE.fullmatch(token):
+            return
+        match = self.INDEX_RE.fullmatch(token)
+        if match:
+            facts.reads.append((match.group(1), token.col))
+            index_col = token.col + len(match.group(1)) + 1
+            self._expression(self._split(match.group(2), index_col), facts, index_col)
+        elif self.NAME_RE.fullmatch(token):
+            facts.reads.append((token, token.col))
+        elif token in ("'", '"'):
+            facts.error(token.col, "Unterminated string")
+        else:
+            facts.error(token.col, f"Unexpected '{token}'")
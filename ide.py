@@ -3,36 +3,42 @@
 # UOFG STUDENT
 
 
-import sys, os, subprocess, io, contextlib
+import sys, os, subprocess, io, contextlib, queue
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QPlainTextEdit, QTabWidget, QWidget,
     QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QTextEdit, QMenuBar,
     QMenu, QLabel, QSplitter, QListWidget, QSizePolicy, QStatusBar,
     QToolBar, QMessageBox, QDialog, QFormLayout, QLineEdit, QSpinBox,
-    QCheckBox, QDialogButtonBox, QTreeWidget, QTreeWidgetItem, QFrame
+    QCheckBox, QDialogButtonBox, QTreeView, QFrame, QInputDialog
 )
 from PySide6.QtGui import (
     QFont, QTextCursor, QSyntaxHighlighter, QTextCharFormat, QColor, QIcon,
     QAction, QPalette, QPixmap, QShortcut, QKeySequence,QTextFormat
 )
-from PySide6.QtCore import Qt, QTimer, QSize, QThread, QObject, Signal
+from PySide6.QtCore import (
+    Qt, QTimer, QSize, QThread, QObject, Signal, QPoint, QAbstractItemModel, QModelIndex
+)
 import traceback
 
+from clucore import _summarize, _type_name  # the same text VariableWatcher publishes while running
+
 
 # Enhanced keyword definitions with new features
 KEYWORDS = {
-    "control": ["function", "if", "otherwise", "end", "repeat", "foreach"],
+    "control": ["function", "if", "otherwise", "end", "repeat", "foreach", "return", "memo",
+                "break", "continue"],
 
     "logic": ["greater", "less", "equal", "greater_equal", "less_equal", "not_equal",
               "and", "or", "not", "true", "false"],  # Added boolean literals to logic
 
     "math": ["add", "subtract", "multiply", "divide"],
 
-    "core": ["var", "is", "output", "of", "in"],
+    "core": ["var", "is", "output", "of", "in", "to"],
 
-    "builtin": ["sum", "max", "min", "len", "sorted", "reversed", "average",
+    "builtin": ["keys", "values", "get", "has", "set", "union", "intersection", "difference", "sum", "max", "min", "len", "sorted", "reversed", "average",
                 "first", "last", "str", "int", "float", "bool", "type",  # Added bool
-                "empty", "contains", "all", "any", "is_bool"]  # Added boolean functions
+                "empty", "contains", "all", "any", "is_bool", "range",
+                "lines", "numbers", "rows"]  # Added boolean functions
 }
 
 
@@ -123,7 +129,7 @@ class CluHighlighterAdvanced(QSyntaxHighlighter):
 
         # Step 6: Built-in functions with "of" syntax
         builtin_pattern = QtCore.QRegularExpression(
-            r"\b(sum|max|min|len|sorted|reversed|average|first|last|str|int|float|type|empty|contains)\s+of\b")
+            r"\b(sum|max|min|len|sorted|reversed|average|first|last|str|int|float|type|empty|contains|range|lines|numbers|rows|keys|values|get|has|set|union|intersection|difference)\s+of\b")
         builtin_iter = builtin_pattern.globalMatch(text)
         while builtin_iter.hasNext():
             match = builtin_iter.next()
@@ -140,15 +146,19 @@ class CluHighlighterAdvanced(QSyntaxHighlighter):
 
 
 class CodeRunner(QObject):
-    finished = Signal(str, str, dict)  # Add dict for variables
+    finished = Signal(str, str, object)  # object, so the variables are passed by reference rather than converted
+    variables_changed = Signal(object)  # VariableChange lists, at most one per WATCH_INTERVAL
+
+    WATCH_INTERVAL = 0.1
 
-    def __init__(self, code):
+    def __init__(self, code, base_dir=None):
         super().__init__()
         self.code = code
+        self.base_dir = base_dir  # imports resolve next to the saved file
 
     def run(self):
         try:
-            from clucore import Parser, Interpreter, CLUError
+            from clucore import Parser, Interpreter, VariableWatcher, CLUError
 
             stdout_capture = io.StringIO()
             stderr_capture = io.StringIO()
@@ -157,15 +167,15 @@ class CodeRunner(QObject):
             with contextlib.redirect_stdout(stdout_capture), contextlib.redirect_stderr(stderr_capture):
                 try:
                     lines = self.code.split('\n')
-                    parser = Parser()
+                    parser = Parser(self.base_dir)
                     program = parser.parse(lines)
 
                     interpreter = Interpreter()
                     interpreter.load_program(program)
-                    interpreter.run()
+                    VariableWatcher(interpreter, self.variables_changed.emit, self.WATCH_INTERVAL).run()
 
-                    # CAPTURE VARIABLES - Add this line
-                    variables = interpreter.variables.copy()
+                    # The interpreter is discarded after the run, so its variables can be handed over as-is
+                    variables = interpreter.variables
 
                 except CLUError as e:
                     print(f"CLU Error: {e}")
@@ -176,12 +186,320 @@ class CodeRunner(QObject):
             stdout_text = stdout_capture.getvalue()
             stderr_text = stderr_capture.getvalue()
 
-            # EMIT VARIABLES - Change this line
             self.finished.emit(stdout_text, stderr_text, variables)
 
         except Exception as e:
             self.finished.emit("", f"Failed to run code: {e}", {})  # Add empty dict
 
+
+class DebugRunner(QObject):
+    """Runs a program under the Debugger on a worker thread; each pause is handed to the GUI thread
+    through 'paused' and the worker waits until resume() passes back the next command"""
+    paused = Signal(str, object)  # output printed since the last pause, DebugPause
+    finished = Signal(str, str, object)  # remaining output, error message, variables
+
+    def __init__(self, code, breakpoints, base_dir=None):
+        super().__init__()
+        self.code = code
+        self.breakpoints = breakpoints  # (line, condition) pairs, copied from the editor
+        self.base_dir = base_dir
+        self.debugger = None
+        self.commands = queue.Queue()
+        self.stdout_capture = io.StringIO()
+
+    def take_output(self):
+        text = self.stdout_capture.getvalue()
+        self.stdout_capture.seek(0)
+        self.stdout_capture.truncate()
+        return text
+
+    def on_pause(self, pause):
+        # Called on the worker thread: block it until the GUI chooses a command
+        self.paused.emit(self.take_output(), pause)
+        return self.commands.get()
+
+    def resume(self, command):
+        self.commands.put(command)
+
+    def run(self):
+        from clucore import Parser, Interpreter, Debugger, CLUError
+
+        error = ""
+        variables = {}
+        with contextlib.redirect_stdout(self.stdout_capture):
+            try:
+                program = Parser(self.base_dir).parse(self.code.split('\n'))
+                interpreter = Interpreter()
+                interpreter.load_program(program)
+                self.debugger = Debugger(interpreter, self.on_pause)
+                for line, condition in self.breakpoints:
+                    self.debugger.add_breakpoint(line, condition)
+                self.debugger.run()
+                variables = interpreter.variables
+            except CLUError as e:
+                error = f"CLU Error: {e}"
+            except Exception as e:
+                error = f"Runtime Error: {e}"
+
+        self.finished.emit(self.take_output(), error, variables)
+
+
+class VariableNode:
+    """One row of the variable tree; container rows load their children on demand"""
+
+    def __init__(self, name, value, parent=None, row=0):
+        self.name = name
+        self.value = value
+        self.parent = parent
+        self.row = row
+        self.children = []
+        self.entries = None  # indexable view of the container, built on first expand
+        self.length = self.size()  # size when the snapshot was taken
+        self.changed = False
+        self.live = None  # (type, summary) published while the program is still running
+
+    def is_container(self):
+        return isinstance(self.value, (list, set, dict))
+
+    def size(self):
+        return len(self.value) if self.is_container() else 0
+
+    def entry(self, i):
+        """Name and value of the i-th child"""
+        if self.entries is None:
+            if isinstance(self.value, dict):
+                self.entries = list(self.value.items())
+            elif isinstance(self.value, set):
+                self.entries = sorted(self.value, key=str)
+            else:
+                self.entries = self.value
+        if isinstance(self.value, dict):
+            key, value = self.entries[i]
+            return repr(key), value
+        if isinstance(self.value, set):
+            return "", self.entries[i]
+        return f"[{i}]", self.entries[i]
+
+    def reset_children(self):
+        self.children = []
+        self.entries = None
+
+
+class VariableModel(QAbstractItemModel):
+    """Tree model over the program variables.
+
+    Only the rows the view asks for are formatted, container children are
+    fetched in chunks as they are expanded, and update_variables() diffs
+    against the previous snapshot instead of rebuilding the tree.
+    """
+
+    HEADERS = ["Variable", "Type", "Value"]
+    FETCH_CHUNK = 256
+    DIFF_LIMIT = 1000  # largest container compared element by element between snapshots
+    CHANGED_COLOR = QColor("#f0a30a")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = VariableNode("", None)
+        self.fetching = False  # views may ask to fetch again while rows are being inserted
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+        if 0 <= row < len(node.children) and 0 <= column < len(self.HEADERS):
+            return self.createIndex(row, column, node.children[row])
+        return QModelIndex()
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return False
+        node = self.node(parent)
+        return node is self.root or node.size() > 0
+
+    def canFetchMore(self, parent):
+        if parent.column() > 0:
+            return False
+        node = self.node(parent)
+        return not self.fetching and node is not self.root and len(node.children) < node.size()
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        first = len(node.children)
+        last = min(node.size(), first + self.FETCH_CHUNK) - 1
+        if last < first:
+            return
+        self.fetching = True
+        self.beginInsertRows(parent, first, last)
+        for i in range(first, last + 1):
+            name, value = node.entry(i)
+            node.children.append(VariableNode(name, value, node, i))
+        self.endInsertRows()
+        self.fetching = False
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            if index.column() == 0:
+                return node.name
+            if node.live is not None:
+                return node.live[index.column() - 1]
+            if index.column() == 1:
+                return _type_name(node.value)
+            return _summarize(node.value)
+        if role == Qt.ForegroundRole and node.changed:
+            return self.CHANGED_COLOR
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def update_variables(self, variables):
+        """Apply a new snapshot, touching only the rows that changed"""
+        root = self.root
+
+        # Drop variables that no longer exist
+        for row in reversed(range(len(root.children))):
+            if root.children[row].name not in variables:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del root.children[row]
+                self.endRemoveRows()
+        for row, node in enumerate(root.children):
+            node.row = row
+
+        existing = {node.name: node for node in root.children}
+        for name, value in variables.items():
+            node = existing.get(name)
+            if node is None:
+                row = len(root.children)
+                self.beginInsertRows(QModelIndex(), row, row)
+                node = VariableNode(name, value, root, row)
+                node.changed = True
+                root.children.append(node)
+                self.endInsertRows()
+                continue
+
+            if node.live is not None:
+                # Keep the highlight from the last live update
+                node.live = None
+                node.value = value
+                node.length = node.size()
+                self.refresh_row(node)
+                continue
+
+            old = node.value
+            if old is value and not node.is_container():
+                if node.changed:
+                    node.changed = False
+                    self.refresh_row(node)
+                continue
+
+            # A container mutated in place keeps its identity; compare lengths
+            # rather than contents so a huge list costs nothing to diff
+            if node.is_container() and old is value:
+                node.changed = node.length != node.size()
+                if node.changed or not isinstance(value, list):
+                    self.clear_children(node)
+                else:
+                    self.refresh_children(node)
+            elif node.is_container() or isinstance(value, (list, set, dict)):
+                # Distinct containers: only compare contents when that is cheap
+                node.changed = (type(old) is not type(value) or len(old) != len(value)
+                                or len(value) > self.DIFF_LIMIT or old != value)
+                node.value = value
+                self.clear_children(node)
+            else:
+                node.changed = type(old) is not type(value) or old != value
+                node.value = value
+                self.clear_children(node)
+            node.length = node.size()
+            self.refresh_row(node)
+
+    def apply_changes(self, changes):
+        """Show VariableChange events from a running program (summaries only; values can't be expanded yet)"""
+        root = self.root
+        existing = {node.name: node for node in root.children}
+        for node in root.children:
+            if node.changed:
+                node.changed = False
+                self.refresh_row(node)
+        for change in changes:
+            node = existing.get(change.name)
+            if change.summary is None:
+                if node is not None:
+                    self.beginRemoveRows(QModelIndex(), node.row, node.row)
+                    del root.children[node.row]
+                    self.endRemoveRows()
+                    for row, other in enumerate(root.children):
+                        other.row = row
+                    del existing[change.name]
+                continue
+            if node is None:
+                row = len(root.children)
+                self.beginInsertRows(QModelIndex(), row, row)
+                node = VariableNode(change.name, None, root, row)
+                root.children.append(node)
+                self.endInsertRows()
+                existing[change.name] = node
+            else:
+                self.clear_children(node)
+                node.value = None
+                node.length = 0
+            node.live = (change.type_name, change.summary)
+            node.changed = True
+            self.refresh_row(node)
+
+    def refresh_row(self, node):
+        self.dataChanged.emit(
+            self.createIndex(node.row, 0, node),
+            self.createIndex(node.row, len(self.HEADERS) - 1, node),
+        )
+
+    def refresh_children(self, node):
+        if node.children:
+            parent = self.createIndex(node.row, 0, node)
+            for child in node.children:
+                value = node.value[child.row]
+                if value is not child.value:
+                    child.value = value
+                    child.length = child.size()
+                    self.clear_children(child)
+            self.dataChanged.emit(
+                self.index(0, 0, parent),
+                self.index(len(node.children) - 1, len(self.HEADERS) - 1, parent),
+            )
+
+    def clear_children(self, node):
+        if node.children:
+            parent = self.createIndex(node.row, 0, node)
+            self.beginRemoveRows(parent, 0, len(node.children) - 1)
+            node.reset_children()
+            self.endRemoveRows()
+        else:
+            node.reset_children()
+
+
 class VariableInspector(QWidget):
     """Panel to show current variables and their values"""
 
@@ -196,35 +514,22 @@ class VariableInspector(QWidget):
         label.setFont(QFont("Menlo", 10, QFont.Bold))
         layout.addWidget(label)
 
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabels(["Variable", "Type", "Value"])
+        self.model = VariableModel(self)
+        self.tree = QTreeView()
+        self.tree.setModel(self.model)
         self.tree.setAlternatingRowColors(True)
+        self.tree.setUniformRowHeights(True)  # lets the view skip measuring off-screen rows
         layout.addWidget(self.tree)
 
         self.setLayout(layout)
 
     def update_variables(self, variables):
         """Update the variable display"""
-        self.tree.clear()
-
-        for name, value in variables.items():
-            item = QTreeWidgetItem()
-            item.setText(0, name)
-            item.setText(1, type(value).__name__)
-
-            # Format value display
-            if isinstance(value, list):
-                if len(value) > 5:
-                    display_value = f"[{', '.join(map(str, value[:3]))}, ...] (length: {len(value)})"
-                else:
-                    display_value = str(value)
-            elif isinstance(value, str):
-                display_value = f"'{value}'"
-            else:
-                display_value = str(value)
+        self.model.update_variables(variables)
 
-            item.setText(2, display_value)
-            self.tree.addTopLevelItem(item)
+    def apply_changes(self, changes):
+        """Show variable changes published while a program runs"""
+        self.model.apply_changes(changes)
 
 
 class TabEditor(QWidget):
@@ -302,9 +607,71 @@ class PreferencesDialog(QDialog):
         self.setLayout(main_layout)
 
 
+class DebugPauseDialog(QDialog):
+    """Shown while the debugger is paused; the chosen button becomes the next debugger command"""
+
+    def __init__(self, debugger, pause, parent=None):
+        super().__init__(parent)
+        self.debugger = debugger
+        self.command = "stop"
+        self.setWindowTitle("Debugger")
+        self.setModal(True)
+        self.init_ui(pause)
+
+    def init_ui(self, pause):
+        layout = QVBoxLayout()
+
+        where = " > ".join(["main"] + pause.call_stack)
+        layout.addWidget(QLabel(f"Paused at line {pause.line} ({pause.reason}) in {where}"))
+
+        # Evaluate an expression in the paused program
+        watch_layout = QHBoxLayout()
+        self.expression = QLineEdit()
+        self.expression.setPlaceholderText("Expression, e.g. len of items")
+        self.expression.returnPressed.connect(self.evaluate)
+        self.result = QLabel("")
+        watch_layout.addWidget(self.expression)
+        watch_layout.addWidget(self.result)
+        layout.addLayout(watch_layout)
+
+        buttons = QHBoxLayout()
+        for label, command in (("Continue (F5)", "continue"), ("Step Into (F11)", "step_into"),
+                               ("Step Over (F10)", "step_over"), ("Step Out (Shift+F11)", "step_out"),
+                               ("Stop", "stop")):
+            button = QPushButton(label)
+            button.clicked.connect(lambda _=False, c=command: self.choose(c))
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
+        QShortcut(QKeySequence("F5"), self, lambda: self.choose("continue"))
+        QShortcut(QKeySequence("F11"), self, lambda: self.choose("step_into"))
+        QShortcut(QKeySequence("F10"), self, lambda: self.choose("step_over"))
+        QShortcut(QKeySequence("Shift+F11"), self, lambda: self.choose("step_out"))
+
+        self.setLayout(layout)
+
+    def evaluate(self):
+        try:
+            self.result.setText(repr(self.debugger.evaluate(self.expression.text())))
+        except Exception as e:
+            self.result.setText(f"Error: {e}")
+
+    def choose(self, command):
+        self.command = command
+        self.accept()
+
+    def reject(self):
+        # Closing the dialog stops the program
+        self.command = "stop"
+        super().reject()
+
+
 class CluIde(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.runner_thread = None
+        self.debug_thread = None
+        self.run_triggers = []  # Every button and action that starts a run or a debug session
         self.init_ui()
         self.setup_shortcuts()
         self.apply_dark_theme()  # Default to dark theme
@@ -362,6 +729,8 @@ class CluIde(QMainWindow):
         self.debug_btn = QPushButton("🐛 Debug")
         self.debug_btn.clicked.connect(self.debug_code)
 
+        self.run_triggers += [self.run_btn, self.debug_btn]
+
         controls_layout.addWidget(self.run_btn)
         controls_layout.addWidget(self.clear_btn)
         controls_layout.addWidget(self.debug_btn)
@@ -471,6 +840,12 @@ class CluIde(QMainWindow):
         debug_action.setShortcut(QKeySequence("F9"))
         debug_action.triggered.connect(self.debug_code)
         run_menu.addAction(debug_action)
+        self.run_triggers += [run_action, debug_action]
+
+        breakpoint_action = QAction("Toggle &Breakpoint", self)
+        breakpoint_action.setShortcut(QKeySequence("Ctrl+B"))
+        breakpoint_action.triggered.connect(self.toggle_breakpoint)
+        run_menu.addAction(breakpoint_action)
 
         # View menu
         view_menu = menubar.addMenu("&View")
@@ -505,8 +880,8 @@ class CluIde(QMainWindow):
         toolbar.addAction("Open", self.open_file)
         toolbar.addAction("Save", self.save_file)
         toolbar.addSeparator()
-        toolbar.addAction("Run", self.run_code)
-        toolbar.addAction("Debug", self.debug_code)
+        self.run_triggers.append(toolbar.addAction("Run", self.run_code))
+        self.run_triggers.append(toolbar.addAction("Debug", self.debug_code))
 
     def create_status_bar(self):
         self.status_bar = QStatusBar()
@@ -617,9 +992,17 @@ class CluIde(QMainWindow):
         if editor:
             editor.editor.redo()
 
+    def is_running(self):
+        """True while a run or a debug session still owns its thread"""
+        return any(thread is not None and thread.isRunning() for thread in (self.runner_thread, self.debug_thread))
+
+    def set_running(self, running):
+        for trigger in self.run_triggers:
+            trigger.setEnabled(not running)
+
     def run_code(self):
         editor = self.get_current_editor()
-        if not editor:
+        if not editor or self.is_running():
             return
 
         code = editor.get_content().strip()
@@ -628,18 +1011,24 @@ class CluIde(QMainWindow):
             return
 
         self.status_bar.showMessage("Running code...")
-        self.run_btn.setEnabled(False)
+        self.set_running(True)
 
         # Clear previous output
         self.output.clear()
         self.output.append("=== Running CLU Code ===")
 
-        # Run code in separate thread
-        self.runner = CodeRunner(code)
+        # Run code in separate thread, watching its variables as it goes
+        self.variable_inspector.update_variables({})
+        self.runner = CodeRunner(code, self.module_dir(editor))
+        self.runner_thread = QThread()
+        self.runner.moveToThread(self.runner_thread)
+        self.runner_thread.started.connect(self.runner.run)
+        self.runner.variables_changed.connect(self.variable_inspector.apply_changes)
         self.runner.finished.connect(self.on_code_finished)
+        self.runner.finished.connect(self.runner_thread.quit)
 
         # Start execution
-        QTimer.singleShot(0, self.runner.run)
+        self.runner_thread.start()
 
     def on_code_finished(self, stdout, stderr, variables):  # Add variables parameter
         if stdout:
@@ -660,15 +1049,73 @@ class CluIde(QMainWindow):
         # UPDATE VARIABLES - Add these lines
         self.variable_inspector.update_variables(variables)
 
-        self.run_btn.setEnabled(True)
+        self.set_running(False)
         self.status_bar.showMessage("Code execution finished")
 
+    @staticmethod
+    def module_dir(editor):
+        """Directory that 'import' resolves against: the tab's file, or the working directory if unsaved"""
+        return os.path.dirname(editor.file_path) if editor.file_path else None
+
     def debug_code(self):
-        # Placeholder for debug functionality
-        QMessageBox.information(
-            self, "Debug Mode",
-            "Debug mode would show step-by-step execution,\nvariable states, and execution flow.\n\nThis feature is coming soon!"
-        )
+        """Run the current tab under the debugger, pausing at the breakpoints set in the gutter"""
+        editor = self.get_current_editor()
+        if not editor or self.is_running():
+            return
+
+        code = editor.get_content()
+        if not code.strip():
+            self.output.append("No code to debug.")
+            return
+
+        self.output.clear()
+        self.output.append("=== Debugging CLU Code ===")
+        self.status_bar.showMessage("Debugging...")
+        self.set_running(True)
+
+        # Debug in a separate thread so the window keeps repainting; pauses come back through signals
+        self.debug_editor = editor
+        self.debug_runner = DebugRunner(code, sorted(editor.editor.breakpoints.items()), self.module_dir(editor))
+        self.debug_thread = QThread()
+        self.debug_runner.moveToThread(self.debug_thread)
+        self.debug_thread.started.connect(self.debug_runner.run)
+        self.debug_runner.paused.connect(self.on_debug_paused)
+        self.debug_runner.finished.connect(self.on_debug_finished)
+        self.debug_runner.finished.connect(self.debug_thread.quit)
+
+        self.debug_thread.start()
+
+    def append_debug_output(self, text):
+        if text:
+            self.output.append(text.rstrip("\n"))
+
+    def on_debug_paused(self, text, pause):
+        self.append_debug_output(text)
+        self.debug_editor.editor.show_line(pause.line)
+        self.variable_inspector.update_variables(pause.variables)
+        self.status_bar.showMessage(f"Paused at line {pause.line}")
+        dialog = DebugPauseDialog(self.debug_runner.debugger, pause, self)
+        dialog.exec()
+        self.status_bar.showMessage("Debugging...")
+        self.debug_runner.resume(dialog.command)
+
+    def on_debug_finished(self, text, error, variables):
+        self.append_debug_output(text)
+        if error:
+            self.output.setTextColor(QColor("red"))
+            self.output.append(error)
+            self.output.setTextColor(QColor("white"))
+        else:
+            self.variable_inspector.update_variables(variables)
+            self.output.append("=== Debugging Complete ===")
+
+        self.set_running(False)
+        self.status_bar.showMessage("Debugging finished")
+
+    def toggle_breakpoint(self):
+        editor = self.get_current_editor()
+        if editor:
+            editor.editor.toggle_breakpoint(editor.editor.textCursor().blockNumber() + 1)
 
     def clear_output(self):
         self.output.clear()
@@ -779,9 +1226,29 @@ class CodeEditor(QPlainTextEdit):
         self.blockCountChanged.connect(self.update_line_area_width)
         self.updateRequest.connect(self.update_line_area)
         self.cursorPositionChanged.connect(self.highlight_current_line)
+        self.breakpoints = {}  # line -> condition (None for an unconditional breakpoint)
         self.update_line_area_width(0)
         self.highlight_current_line()
 
+    def toggle_breakpoint(self, line, condition=None):
+        if line in self.breakpoints and condition is None:
+            del self.breakpoints[line]
+        else:
+            self.breakpoints[line] = condition
+        self.line_number_area.update()
+
+    def line_at(self, y):
+        return self.cursorForPosition(QPoint(0, int(y))).blockNumber() + 1
+
+    def show_line(self, line):
+        """Move the cursor to a line, e.g. where the debugger paused"""
+        if line is None:
+            return
+        block = self.document().findBlockByNumber(line - 1)
+        if block.isValid():
+            self.setTextCursor(QTextCursor(block))
+            self.ensureCursorVisible()
+
     def update_line_area_width(self, _):
         self.setViewportMargins(self.line_number_area_width(), 0, 0, 0)
 
@@ -831,6 +1298,13 @@ class CodeEditor(QPlainTextEdit):
         while block.isValid() and top <= event.rect().bottom():
             if block.isVisible() and bottom >= event.rect().top():
                 number = str(block_number + 1)
+                if block_number + 1 in self.breakpoints:
+                    # Red dot for a breakpoint, orange for a conditional one
+                    color = "#e51400" if self.breakpoints[block_number + 1] is None else "#f0a30a"
+                    painter.setBrush(QColor(color))
+                    painter.setPen(Qt.NoPen)
+                    size = min(height, 10)
+                    painter.drawEllipse(3, int(top) + (height - size) // 2, size, size)
                 painter.setPen(Qt.lightGray)
                 painter.drawText(
                     0, int(top), self.line_number_area.width() - 4, height,
@@ -854,6 +1328,18 @@ class LineNumberArea(QWidget):
     def paintEvent(self, event):
         self.code_editor.line_number_area_paint(event)
 
+    def mousePressEvent(self, event):
+        """Click toggles a breakpoint; right-click sets a conditional one"""
+        line = self.code_editor.line_at(event.position().y())
+        if event.button() == Qt.RightButton:
+            condition, ok = QInputDialog.getText(self, "Conditional Breakpoint",
+                                                 f"Break at line {line} when:",
+                                                 text=self.code_editor.breakpoints.get(line) or "")
+            if ok and condition.strip():
+                self.code_editor.toggle_breakpoint(line, condition.strip())
+        else:
+            self.code_editor.toggle_breakpoint(line)
+
 
 if __name__ == "__main__":
     from PySide6 import QtCore
@@ -1,13 +1,30 @@
 class Instruction:
-    def __init__(self, action, args):
+    # Slots keep large programs small; optional ones (inline_cache, debug_original) stay unset until used
+    __slots__ = ("action", "args", "line_number", "inline_cache", "debug_original")
+
+    def __init__(self, action, args, line_number=None):
         self.action = action
         self.args = args
+        self.line_number = line_number
+
+    def copy(self):
+        """A shallow copy, including whichever optional slots are set"""
+        clone = Instruction(self.action, self.args, self.line_number)
+        for name in ("inline_cache", "debug_original"):
+            if hasattr(self, name):
+                setattr(clone, name, getattr(self, name))
+        return clone
 
 class Function:
-    def __init__(self, name, params=None):
+    __slots__ = ("name", "params", "body", "memoized", "memo_size", "line_number")
+
+    def __init__(self, name, params=None, memoized=False, memo_size=None):
         self.name = name
         self.params = params if params else []
         self.body = []
+        self.memoized = memoized
+        self.memo_size = memo_size
+        self.line_number = None
 
     def add_instruction(self, instruction):
         self.body.append(instruction)
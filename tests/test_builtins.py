@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import (Parser, Interpreter, PurityAnalyzer, Optimizer, CLUError, CLUTypeError,  # noqa: E402
+                     BUILTINS, register_builtin)
+
+
+@pytest.fixture
+def registered():
+    """Names registered by the test, removed again afterwards"""
+    names = []
+    yield names
+    for name in names:
+        del BUILTINS[name]
+
+
+def run(source, capsys, **options):
+    interpreter = Interpreter(**options)
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.split()
+
+
+def test_registered_builtin_is_callable(capsys, registered):
+    @register_builtin("clamp", arity=3, arg_types=((int, float),) * 3, result="number", pure=True)
+    def clamp(x, low, high):
+        return max(low, min(high, x))
+    registered.append("clamp")
+
+    assert run("var score is 140\nvar c is clamp of score, 0, 100\noutput c", capsys) == ["100"]
+    with pytest.raises(CLUTypeError, match="Function 'clamp' cannot be applied to str"):
+        run("var c is clamp of 'a', 0, 100", capsys)
+    with pytest.raises(CLUError, match="Function 'clamp' expects 3 arguments, got 2"):
+        run("var c is clamp of 5, 0", capsys)
+
+
+def test_builtins_are_impure_unless_marked(registered):
+    register_builtin("shout", str.upper)
+    register_builtin("quiet", str.lower, pure=True)
+    registered += ["shout", "quiet"]
+
+    program = Parser().parse([
+        "function loud -> s", "    return shout of s", "end",
+        "function soft -> s", "    return quiet of s", "end",
+        "var a is shout of 'x'", "var b is quiet of 'Y'", "output a", "output b",
+    ])
+    reports = PurityAnalyzer(program).analyze()
+    assert not reports["loud"].pure and reports["soft"].pure
+    Optimizer(program).optimize()
+    assert [instr.args[1] for instr in program.instructions[:2]] == [["shout", "of", "'x'"], ["'y'"]]
+
+
+@pytest.mark.parametrize("name, options", [
+    ("range", {}),
+    ("two words", {}),
+    ("f", {"arity": 0}),
+    ("f", {"permutes": "shuffle"}),
+    ("f", {"order_free": "sometimes"}),
+    ("f", {"arity": 2, "picks": 0}),
+])
+def test_invalid_registrations(name, options):
+    with pytest.raises(ValueError):
+        register_builtin(name, len, **options)
+    assert name not in BUILTINS
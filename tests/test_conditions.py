@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, ConditionParser, CLUError  # noqa: E402
+
+
+def run(source, capsys, **options):
+    interpreter = Interpreter(**options)
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.split()
+
+
+def check(condition, capsys, **variables):
+    """'yes' or 'no' for the condition, with the given variables set"""
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse([f"if {condition}", "    output 'yes'", "otherwise", "    output 'no'", "end"]))
+    interpreter.variables.update(variables)
+    interpreter.run()
+    return capsys.readouterr().out.strip()
+
+
+def test_precedence_is_not_and_or():
+    parse = ConditionParser().parse
+    assert parse("a or b and c".split()) == ("or", (("value", ["a"]), ("and", (("value", ["b"]), ("value", ["c"])))))
+    assert parse("not a and b".split()) == ("and", (("not", ("value", ["a"])), ("value", ["b"])))
+    assert parse("( a or b ) and c".split())[0] == "and"
+
+
+@pytest.mark.parametrize("condition, expected", [
+    ("t or f and f", "yes"),
+    ("( t or f ) and f", "no"),
+    ("not f and f", "no"),
+    ("not ( f and f )", "yes"),
+    ("not not t", "yes"),
+    ("x greater 2 and x less 10", "yes"),
+    ("x less 0 or x greater 100", "no"),
+    ("( x less 0 or x greater 3 ) and not f", "yes"),
+])
+def test_condition_results(capsys, condition, expected):
+    assert check(condition, capsys, t=True, f=False, x=5) == expected
+
+
+def test_conditions_short_circuit(capsys):
+    # The right-hand sides would fail if they were evaluated
+    assert check("x equal 0 or missing greater 1", capsys, x=0) == "yes"
+    assert check("x not_equal 0 and missing greater 1", capsys, x=0) == "no"
+    assert check("x equal 0 or ( x greater 1 and missing )", capsys, x=0) == "yes"
+    with pytest.raises(CLUError, match="'missing' not defined"):
+        check("x equal 1 or missing", capsys, x=0)
+
+
+def test_compiled_condition_sees_current_values(capsys):
+    assert run("""\
+var hits is 0
+foreach x in range of 1 to 20
+    if ( x less 5 or x greater 15 ) and not x equal 18
+        var hits is hits add 1
+    end
+end
+output hits
+""", capsys) == ["8"]
+
+
+@pytest.mark.parametrize("condition, message", [
+    ("( x greater 1", "Missing '\\)'"),
+    ("x greater", "needs a value on both sides"),
+    ("x and", "Missing operand"),
+    ("x )", "Unexpected '\\)'"),
+])
+def test_malformed_conditions(condition, message):
+    with pytest.raises(CLUError, match=message):
+        ConditionParser().parse(condition.split())
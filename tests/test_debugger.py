@@ -0,0 +1,94 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, Debugger, CLUError  # noqa: E402
+
+PROGRAM = """\
+function square -> n
+    var s is n multiply n
+    return s
+end
+var total is 0
+foreach i in range of 1 to 3
+    var sq is square i
+    var total is total add sq
+end
+output total
+"""
+
+
+def debug(source, commands, breakpoints=()):
+    """Pauses as (line, reason, call stack, chosen variables), running commands in order"""
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    pauses = []
+    commands = iter(commands)
+
+    def on_pause(pause):
+        pauses.append((pause.line, pause.reason, pause.call_stack,
+                       {name: pause.variables[name] for name in ("i", "n", "total") if name in pause.variables}))
+        return next(commands, "continue")
+
+    debugger = Debugger(interpreter, on_pause)
+    for breakpoint in breakpoints:
+        debugger.add_breakpoint(*breakpoint)
+    debugger.run()
+    return pauses, debugger, interpreter
+
+
+def test_breakpoints_pause_before_their_line(capsys):
+    pauses, _, _ = debug(PROGRAM, [], breakpoints=[(8,)])
+    assert [(line, reason, i["i"], i["total"]) for line, reason, _, i in pauses] == [
+        (8, "breakpoint", 1, 0), (8, "breakpoint", 2, 1), (8, "breakpoint", 3, 5)]
+    assert capsys.readouterr().out == "14\n"
+
+
+def test_conditional_breakpoint(capsys):
+    pauses, _, _ = debug(PROGRAM, [], breakpoints=[(2, "n equal 2")])
+    assert pauses == [(2, "breakpoint", ["square"], {"i": 2, "n": 2, "total": 1})]
+
+
+def test_stepping(capsys):
+    pauses, _, _ = debug(PROGRAM, ["step_into", "step_into", "step_out", "step_over", "continue"], breakpoints=[(7,)])
+    assert [(line, reason, stack) for line, reason, stack, _ in pauses[:5]] == [
+        (7, "breakpoint", []),
+        (2, "step", ["square"]),
+        (3, "step", ["square"]),
+        (8, "step", []),
+        (7, "breakpoint", []),
+    ]
+
+
+def test_step_over_skips_calls(capsys):
+    pauses, _, _ = debug(PROGRAM, ["step_over", "step_over", "stop"], breakpoints=[(7,)])
+    assert [(line, stack) for line, _, stack, _ in pauses] == [(7, []), (8, []), (7, [])]
+    assert capsys.readouterr().out == ""
+
+
+def test_breakpoints_are_placed_on_the_next_line_with_code(capsys):
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse(PROGRAM.splitlines()))
+    debugger = Debugger(interpreter, lambda pause: "continue")
+    assert debugger.add_breakpoint(4) == 5
+    with pytest.raises(CLUError, match="No code at or after line 99"):
+        debugger.add_breakpoint(99)
+    with pytest.raises(CLUError, match="Invalid breakpoint condition"):
+        debugger.add_breakpoint(5, "i equal")
+
+
+def test_evaluate_while_paused_and_program_left_unchanged(capsys):
+    values = []
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse(PROGRAM.splitlines()))
+    debugger = Debugger(interpreter, lambda pause: values.append(debugger.evaluate("total add 100")) or "continue")
+    debugger.add_breakpoint(10)
+    debugger.run()
+    assert values == [114]
+    assert interpreter.debugger is None
+    capsys.readouterr()
+    interpreter.run()
+    assert capsys.readouterr().out == "14\n"
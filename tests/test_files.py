@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, FileStream, CLUError  # noqa: E402
+
+PROGRAM = """\
+var total is sum of numbers of 'PATH'
+output total
+var top is max of numbers of 'PATH'
+output top
+var n is 0
+foreach line in lines of 'PATH'
+    var n is n add 1
+end
+output n
+foreach row in rows of 'PATH'
+    output row
+end
+var distinct is set of lines of 'PATH'
+output len of distinct
+"""
+
+
+def run(source, capsys):
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.splitlines()
+
+
+@pytest.fixture
+def data(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("3 4\n1.5,2\n\n10\n3 4\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("mapped", (False, True))
+def test_file_builtins(capsys, monkeypatch, data, mapped):
+    if mapped:
+        monkeypatch.setattr(FileStream, "MMAP_THRESHOLD", 0)
+    assert run(PROGRAM.replace("PATH", data), capsys) == [
+        "27.5", "10", "5", "[3, 4]", "[1.5, 2]", "[10]", "[3, 4]", "4"]
+
+
+def test_streams_can_be_read_again(capsys, data):
+    source = f"var f is lines of '{data}'\nforeach l in f\n    output 'a'\nend\nforeach l in f\n    output 'b'\nend"
+    assert run(source, capsys) == ["a"] * 5 + ["b"] * 5
+
+
+def test_large_files_are_read_in_chunks(capsys, monkeypatch, tmp_path):
+    monkeypatch.setattr(FileStream, "CHUNK_LINES", 3)
+    path = tmp_path / "many.txt"
+    path.write_text("".join(f"{i}\n" for i in range(1, 101)))
+    assert run(f"var total is sum of numbers of '{path}'\noutput total", capsys) == ["5050"]
+
+
+def test_missing_files_and_unsized_streams(capsys, data):
+    with pytest.raises(CLUError, match="Cannot open file '.*missing.txt': no such file"):
+        run(f"var f is lines of '{data}.missing.txt'", capsys)
+    with pytest.raises(CLUError, match="Function 'len' cannot be applied to FileStream"):
+        run(f"var n is len of lines of '{data}'", capsys)
@@ -0,0 +1,80 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, CLUError, BUILTINS  # noqa: E402
+
+OUTERS = ["sorted", "reversed", "first", "last", "sum", "max", "min", "average", "len", "all", "any", "set"]
+
+VALUES = {
+    "ints": [3, 1, 2, 1],
+    "words": ["b", "a", "c"],
+    "mixed_numbers": [2, 1.0, 1, 2.0],
+    "zeros": [0.0, 0, -0.0, True, 1],
+    "rounding": [1e16, 1.0, -1e16, 1.0],
+}
+
+
+def evaluate(expression, x):
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse([f"var result is {expression}"]))
+    interpreter.variables["x"] = x
+    interpreter.run()
+    return interpreter.variables["result"]
+
+
+def outcome(call):
+    """repr of the result, which tells 1 from 1.0, or the error it raised"""
+    try:
+        result = call()
+    except CLUError as e:
+        return type(e).__name__, str(e).split(" (Line")[0].removeprefix("Error in assignment: ")
+    return repr(sorted(result, key=repr) if isinstance(result, set) else result)
+
+
+def unfused(expression, x):
+    """Each builtin of the chain called on its own, innermost first"""
+    value = x
+    for name in reversed(expression.split(" of ")[:-1]):
+        value = BUILTINS[name](value)
+    return value
+
+
+CHAINS = [" of ".join(chain) for depth in (1, 2, 3)
+          for chain in itertools.product(["sorted", "reversed"], repeat=depth)]
+
+
+@pytest.mark.parametrize("name", sorted(VALUES))
+@pytest.mark.parametrize("outer", OUTERS)
+def test_fused_chains_match_the_unfused_calls(name, outer):
+    x = VALUES[name]
+    for chain in CHAINS:
+        expression = f"{outer} of {chain} of x"
+        assert outcome(lambda: evaluate(expression, x)) == outcome(lambda: unfused(expression, x)), expression
+
+
+def test_stable_sort_ties_with_ints_and_floats():
+    x = [2, 1.0, 1, 2.0]
+    assert repr(evaluate("last of sorted of x", x)) == "2.0"
+    assert repr(evaluate("reversed of sorted of x", x)) == "[2.0, 2, 1, 1.0]"
+    assert repr(evaluate("sorted of reversed of x", x)) == "[1, 1.0, 2.0, 2]"
+    assert repr(evaluate("max of reversed of x", x)) == "2.0"
+
+
+def test_fused_chains_fail_like_the_unfused_calls():
+    x = [1, "a", 2]
+    for expression in ("len of sorted of x", "sorted of reversed of x", "first of sorted of x"):
+        with pytest.raises(CLUError, match="'<' not supported between instances of 'str' and 'int'"):
+            evaluate(expression, x)
+    with pytest.raises(CLUError, match=r"cannot be applied to list: \['a', 'b', 'c'\]"):
+        evaluate("sum of sorted of x", ["b", "a", "c"])
+
+
+def test_fusion_on_ranges_and_sets():
+    assert evaluate("last of sorted of x", range(1, 6)) == 5
+    assert evaluate("first of reversed of sorted of x", {4, 1, 9}) == 9
+    assert evaluate("len of reversed of x", range(10 ** 9)) == 10 ** 9
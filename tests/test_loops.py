@@ -0,0 +1,122 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, Debugger, CLUError  # noqa: E402
+
+MODES = ("run", "steps", "debug")
+
+
+def run(source, capsys, mode="run"):
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    if mode == "steps":
+        for _ in interpreter.steps(100):
+            pass
+    elif mode == "debug":
+        Debugger(interpreter, lambda pause: "continue").run()
+    else:
+        interpreter.run()
+    return capsys.readouterr().out.split()
+
+
+COUNTED = """\
+var i is 1
+var total is 0
+repeat i less_equal 20000
+    var total is total add i
+    var i is i add 1
+end
+output total
+output i
+"""
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_counted_loop_over_integers_is_not_capped(capsys, mode):
+    assert run(COUNTED, capsys, mode) == ["200010000", "20001"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("source", [
+    "var n is float of 'inf'\nvar i is 0\nrepeat i less n\n    var i is i add 1\nend",
+    "var i is 0.5\nrepeat i less_equal 20000\n    var i is i add 1\nend",
+    "var i is 1\nrepeat i less_equal 20000\n    var i is i multiply 1\n    var i is i add 1\nend",
+])
+def test_other_repeat_loops_are_capped(capsys, mode, source):
+    with pytest.raises(CLUError, match="Infinite loop detected"):
+        run(source, capsys, mode)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_counted_loop_with_a_variable_bound(capsys, mode):
+    source = "var n is 5\nvar i is 5\nrepeat i greater 0\n    output i\n    var i is i subtract 2\nend\noutput i"
+    assert run(source, capsys, mode) == ["5", "3", "1", "-1"]
+
+
+BREAK_CONTINUE = """\
+var xs is 1, 2, 3, 4, 5, 6
+foreach x in xs
+    if x equal 2
+        continue
+    end
+    if x equal 5
+        break
+    end
+    output x
+end
+var i is 0
+repeat i less 10
+    var i is i add 1
+    if i less 8
+        continue
+    end
+    output i
+    break
+end
+foreach a in range of 1 to 3
+    foreach b in range of 1 to 3
+        if b greater a
+            break
+        end
+        output b
+    end
+end
+"""
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_break_and_continue_leave_the_innermost_loop(capsys, mode):
+    assert run(BREAK_CONTINUE, capsys, mode) == ["1", "3", "4", "8", "1", "1", "2", "1", "2", "3"]
+
+
+def test_break_and_continue_inside_a_function_loop(capsys):
+    source = """\
+function last_small -> xs
+    var found is 0
+    foreach x in xs
+        if x greater 100
+            continue
+        end
+        if x equal 0
+            break
+        end
+        var found is x
+    end
+    return found
+end
+var xs is 7, 200, 9, 0, 11
+var f is last_small xs
+output f
+"""
+    assert run(source, capsys) == ["9"]
+
+
+def test_break_outside_a_loop_is_rejected():
+    with pytest.raises(CLUError, match="'break' outside of a loop"):
+        Parser().parse(["break"])
+    with pytest.raises(CLUError, match="'continue' outside of a loop"):
+        Parser().parse(["function f -> n", "    continue", "end"])
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, CLUError  # noqa: E402
+
+
+def run(source, capsys, **options):
+    interpreter = Interpreter(**options)
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.splitlines()
+
+
+def test_word_counts(capsys):
+    assert run("""\
+var counts is {}
+var words is 'the','cat','the'
+foreach w in words
+    if has of counts, w
+        var counts[w] is counts[w] add 1
+    otherwise
+        var counts[w] is 1
+    end
+end
+output counts
+output keys of counts
+output values of counts
+output get of counts, 'the'
+output len of counts
+""", capsys) == ["{the: 2, cat: 1}", "[the, cat]", "[2, 1]", "2", "2"]
+
+
+def test_map_literals_and_lookups(capsys):
+    assert run("""\
+var ages is {'amy': 21, 'bob': 19, 7: 'seven'}
+var a is ages['amy']
+output a
+output ages[7]
+output contains of ages, 'bob'
+output has of ages, 'eve'
+foreach name in ages
+    output name
+end
+""", capsys) == ["21", "seven", "True", "False", "amy", "bob", "7"]
+
+
+def test_missing_key_is_an_error(capsys):
+    with pytest.raises(CLUError, match="eve"):
+        run("var ages is {'amy': 21}\nvar a is ages['eve']", capsys)
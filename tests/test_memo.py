@@ -0,0 +1,95 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, MemoCache  # noqa: E402
+
+
+def run(source, capsys, **options):
+    interpreter = Interpreter(**options)
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.split(), interpreter
+
+
+def test_memo_caches_by_argument(capsys):
+    out, interpreter = run("""\
+memo function fib -> n
+    if n less 2
+        return n
+    end
+    var a is n subtract 1
+    var b is n subtract 2
+    return fib a add fib b
+end
+var f is fib 60
+output f
+""", capsys)
+    assert out == ["1548008755920"]
+    stats = interpreter.memo_stats()["fib"]
+    assert stats["misses"] == 61 and stats["hits"] == 58
+
+
+def test_memo_keeps_equal_values_of_different_types_apart(capsys):
+    out, _ = run("""\
+memo function kind -> x
+    return type of x
+end
+var a is kind 1
+output a
+var a is kind True
+output a
+var a is kind 1.0
+output a
+""", capsys)
+    assert out == ["int", "bool", "float"]
+
+
+def test_memo_accepts_maps_and_sets(capsys):
+    out, interpreter = run("""\
+memo function size -> m
+    return len of m
+end
+var m is {'a': 1}
+var z is size m
+output z
+var m['b'] is 2
+var z is size m
+output z
+var w is 1, 2, 2
+var s is set of w
+var z is size s
+output z
+var z is size s
+output z
+""", capsys)
+    assert out == ["1", "2", "2", "2"]
+    assert interpreter.memo_stats()["size"]["hits"] == 1
+
+
+def test_memo_results_are_not_shared_with_callers(capsys):
+    out, _ = run("""\
+memo function pair -> n
+    var l is n, 1
+    return l
+end
+var r is pair 5
+var r[1] is 99
+var r2 is pair 5
+output r2
+var r2[2] is 7
+var r3 is pair 5
+output r3
+""", capsys)
+    assert out == ["[5,", "1]", "[5,", "1]"]
+
+
+def test_memo_cache_evicts_least_recently_used():
+    cache = MemoCache(2)
+    cache.put((1,), "a")
+    cache.put((2,), "b")
+    assert cache.get((1,)) == (True, "a")
+    cache.put((3,), "c")
+    assert cache.get((2,)) == (False, None)
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 2, "maxsize": 2}
@@ -0,0 +1,79 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, CLUError  # noqa: E402
+
+GEOMETRY = """\
+function area -> w/h
+    return w multiply h
+end
+function square -> n
+    return area n n
+end
+"""
+
+
+def run(source, base_dir, capsys):
+    interpreter = Interpreter()
+    interpreter.load_program(Parser(str(base_dir)).parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.split(), interpreter
+
+
+def test_import_by_name_and_by_path(tmp_path, capsys):
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "lib" / "geometry.clu").write_text(GEOMETRY)
+    out, _ = run("""\
+import lib/geometry
+import "lib/geometry.clu"
+var a is area 3 4
+output a
+var s is square 5
+output s
+""", tmp_path, capsys)
+    assert out == ["12", "25"]
+
+
+def test_changed_module_is_read_again(tmp_path, capsys):
+    module = tmp_path / "consts.clu"
+    module.write_text("function answer\n    return 1\nend\n")
+    source = "import consts\nvar a is answer\noutput a"
+    assert run(source, tmp_path, capsys)[0] == ["1"]
+    module.write_text("function answer\n    return 42\nend\n")
+    os.utime(module, ns=(0, os.stat(module).st_mtime_ns + 10 ** 9))
+    assert run(source, tmp_path, capsys)[0] == ["42"]
+
+
+def test_import_errors(tmp_path, capsys):
+    (tmp_path / "a.clu").write_text("import b\n")
+    (tmp_path / "b.clu").write_text("import a\n")
+    (tmp_path / "script.clu").write_text("output 1\n")
+    with pytest.raises(CLUError, match="Circular import"):
+        run("import a", tmp_path, capsys)
+    with pytest.raises(CLUError, match="may only contain functions and imports"):
+        run("import script", tmp_path, capsys)
+    with pytest.raises(CLUError, match="Cannot import"):
+        run("import missing", tmp_path, capsys)
+
+
+def test_importers_do_not_share_inline_caches(tmp_path, capsys):
+    (tmp_path / "count.clu").write_text("""\
+function upto -> n
+    var i is 0
+    var total is 0
+    repeat i less n
+        var total is total add i
+        var i is i add 1
+    end
+    return total
+end
+""")
+    source = "import count\nvar t is upto 50\noutput t"
+    out, first = run(source, tmp_path, capsys)
+    out_again, second = run(source, tmp_path, capsys)
+    assert out == out_again == ["1225"]
+    assert first.specialization_stats() == second.specialization_stats()
@@ -0,0 +1,89 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, Optimizer, OptimizationReport, CLUError  # noqa: E402
+
+PROGRAM = """\
+var size is 7 multiply 2
+var unused is 5
+if 3 greater 2 and not False
+    output size
+otherwise
+    output 'no'
+end
+if 1 equal 2
+    output 'gone'
+end
+function f -> n
+    return n
+    output 'never'
+end
+foreach i in range of 1 to 2
+    break
+    output i
+end
+var t is 'ab' + 'c'
+var r is f 3
+output t
+output r
+"""
+
+
+def optimize(source):
+    program = Parser().parse(source.splitlines())
+    optimizer = Optimizer(program)
+    return optimizer.optimize(), optimizer.dump(), program
+
+
+def test_folding_and_dead_code():
+    report, dump, _ = optimize(PROGRAM)
+    assert report == OptimizationReport(folded=4, branches_removed=2, unreachable_removed=2, assignments_removed=1)
+    assert dump.splitlines() == [
+        "function f -> n",
+        "    return n",
+        "end",
+        "",
+        "var size is 14",
+        "output size",
+        "foreach i in range of 1 to 2",
+        "    break",
+        "end",
+        "var t is 'abc'",
+        "var r is f 3",
+        "output t",
+        "output r",
+    ]
+
+
+def test_optimizing_twice_changes_nothing():
+    _, dump, program = optimize(PROGRAM)
+    optimizer = Optimizer(program)
+    assert optimizer.optimize() == OptimizationReport()
+    assert optimizer.dump() == dump
+
+
+@pytest.mark.parametrize("optimize_program", (False, True))
+def test_optimized_programs_behave_the_same(capsys, optimize_program):
+    interpreter = Interpreter(optimize=optimize_program)
+    interpreter.load_program(Parser().parse(PROGRAM.splitlines()))
+    interpreter.run()
+    assert capsys.readouterr().out.split() == ["14", "abc", "3"]
+
+
+def test_failing_expressions_are_left_for_run_time(capsys):
+    report, dump, program = optimize("output 'start'\nvar z is 1 divide 0")
+    assert report.folded == 0 and "var z is 1 divide 0" in dump
+    interpreter = Interpreter()
+    interpreter.load_program(program)
+    with pytest.raises(CLUError, match="Division by zero"):
+        interpreter.run()
+    assert capsys.readouterr().out == "start\n"
+
+
+def test_variables_that_are_read_are_kept():
+    _, dump, _ = optimize("var n is 5\nfunction show\n    output n\nend\nshow")
+    assert "var n is 5" in dump
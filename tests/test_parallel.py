@@ -0,0 +1,85 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, Debugger, CLUError  # noqa: E402
+
+PROGRAM = """\
+function cost -> n
+    var steps is 0
+    var x is 0
+    repeat x less n
+        var x is x add 1
+        var steps is steps add x multiply x
+    end
+    return steps
+end
+var offset is 100
+var xs is range of 1 to 12
+var results is range of 1 to 12
+var results is sorted of results
+parallel foreach n in xs
+    var c is cost n
+    var m is c add offset
+    var results[n] is m
+    if c greater 100
+        var big is n
+    end
+    output 'n=' + str of n + ' c=' + str of c
+end
+output results
+output n
+output c
+output big
+"""
+
+
+def run(source, capsys, **options):
+    interpreter = Interpreter(**options)
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out, interpreter
+
+
+@pytest.mark.parametrize("options", [{}, {"optimize": True}, {"static_types": True}, {"auto_memoize": True}])
+def test_parallel_loop_matches_the_sequential_one(capsys, options):
+    expected, _ = run(PROGRAM.replace("parallel ", ""), capsys)
+    out, interpreter = run(PROGRAM, capsys, workers=2, **options)
+    assert out == expected
+    [report] = interpreter.parallel_reports.values()
+    assert report.parallel and report.merged == {"results"} and report.reads == {"offset"}
+
+
+@pytest.mark.parametrize("body, reason", [
+    ("    var total is total add x", "total"),
+    ("    output total\n    var total is x", "total"),
+    ("    var xs[1] is x\n    output xs", "xs"),
+    ("    if x equal 2\n        break\n    end", "break"),
+    ("    show x", "show"),
+])
+def test_dependent_iterations_run_sequentially(capsys, body, reason):
+    source = f"function show -> n\n    output n\nend\nvar total is 0\nvar xs is 1, 2, 3\nparallel foreach x in xs\n{body}\nend"
+    expected, _ = run(source.replace("parallel ", ""), capsys)
+    out, interpreter = run(source, capsys, workers=2)
+    assert out == expected
+    [report] = interpreter.parallel_reports.values()
+    assert not report.parallel and any(reason in text for text in report.reasons)
+
+
+def test_errors_in_workers_surface_in_order(capsys):
+    source = "var xs is 1, 2, 0, 4\nparallel foreach x in xs\n    output x\n    var y is 10 divide x\nend"
+    with pytest.raises(CLUError, match="Division by zero"):
+        run(source, capsys, workers=2)
+    assert capsys.readouterr().out.split() == ["1", "2", "0"]
+
+
+def test_single_worker_and_debugger_run_sequentially(capsys):
+    expected, _ = run(PROGRAM.replace("parallel ", ""), capsys)
+    assert run(PROGRAM, capsys, workers=1)[0] == expected
+    interpreter = Interpreter(workers=2)
+    interpreter.load_program(Parser().parse(PROGRAM.splitlines()))
+    Debugger(interpreter, lambda pause: "continue").run()
+    assert capsys.readouterr().out == expected
@@ -0,0 +1,154 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, PurityAnalyzer, CallProfile  # noqa: E402
+
+
+def run(source, capsys, **options):
+    interpreter = Interpreter(**options)
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.split(), interpreter
+
+
+def analyze(source):
+    return PurityAnalyzer(Parser().parse(source.splitlines())).analyze()
+
+
+def test_purity_reasons():
+    reports = analyze("""\
+function square -> n
+    return n multiply n
+end
+function shout -> n
+    output n
+end
+function scaled -> n
+    return n multiply factor
+end
+function twice -> n
+    var s is square n
+    return s add s
+end
+function loud -> n
+    shout n
+    return n
+end
+""")
+    assert reports["square"].pure and reports["twice"].pure
+    assert reports["shout"].reasons == ["line 5: produces output"]
+    assert reports["scaled"].reasons == ["line 8: reads outer variable 'factor'"]
+    assert not reports["loud"].pure
+
+
+def test_element_writes_through_aliases_are_impure():
+    reports = analyze("""\
+function alias -> m
+    var l is m
+    var l[1] is 0
+    return l
+end
+function param -> m
+    var m[1] is 0
+    return m
+end
+function loop -> rows
+    foreach row in rows
+        var row[1] is 0
+    end
+    return rows
+end
+function sometimes -> n
+    var l is n, 1
+    if n greater 1
+        var l is n
+    end
+    var l[1] is 0
+    return l
+end
+function built -> n
+    var l is n, 1
+    var l[1] is 0
+    var counts is {}
+    var counts['a'] is n
+    return l
+end
+""")
+    assert reports["alias"].reasons == ["line 3: modifies 'l' in place"]
+    assert not reports["param"].pure
+    assert not reports["loop"].pure
+    assert not reports["sometimes"].pure
+    assert reports["built"].pure
+
+
+def test_auto_memoize_caches_repeated_calls(capsys):
+    source = """\
+function square -> n
+    return n multiply n
+end
+var i is 0
+var total is 0
+repeat i less 200
+    var s is square 3
+    var total is total add s
+    var i is i add 1
+end
+output total
+"""
+    out, interpreter = run(source, capsys, auto_memoize=True)
+    assert out == ["1800"]
+    stats = interpreter.memo_stats()["square"]
+    assert stats["hits"] + stats["misses"] == 200 - CallProfile.SAMPLE_CALLS
+
+
+def test_auto_memoize_keeps_results_exact(capsys):
+    out, _ = run("""\
+function kind -> x
+    return type of x
+end
+function size -> m
+    return len of m
+end
+function pair -> n
+    var l is n, 1
+    return l
+end
+var i is 0
+repeat i less 70
+    var k is kind 1
+    var m is {'a': i}
+    var z is size m
+    var p is pair 1
+    var i is i add 1
+end
+var k is kind True
+output k
+var p[1] is 99
+var p is pair 1
+output p
+""", capsys, auto_memoize=True)
+    assert out == ["bool", "[1,", "1]"]
+
+
+def test_impure_functions_are_not_auto_memoized(capsys):
+    out, interpreter = run("""\
+function reset -> m
+    var l is m
+    var l[1] is 0
+    return 1
+end
+var i is 0
+var total is 0
+var xs is 5, 6
+repeat i less 70
+    var xs[1] is 5
+    var r is reset xs
+    var total is total add xs[1]
+    var i is i add 1
+end
+output total
+""", capsys, auto_memoize=True)
+    assert out == ["0"]
+    assert "reset" not in interpreter.memo_stats()
@@ -0,0 +1,95 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, CLUError  # noqa: E402
+
+
+def run(source, capsys, **options):
+    interpreter = Interpreter(**options)
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.split()
+
+
+def test_foreach_over_an_inclusive_range(capsys):
+    assert run("foreach i in range of 1 to 5\n    output i\nend", capsys) == ["1", "2", "3", "4", "5"]
+    assert run("foreach i in range of 3 to 1\n    output i\nend\noutput 'done'", capsys) == ["done"]
+
+
+def test_range_bounds_from_variables(capsys):
+    assert run("""\
+var low is 2
+var high is low add 2
+var total is 0
+foreach i in range of low to high
+    var total is total add i
+end
+output total
+""", capsys) == ["9"]
+
+
+def test_ranges_are_not_materialized(capsys):
+    assert run("""\
+var r is range of 1 to 1000000000000
+output len of r
+output r[5]
+foreach i in r
+    if i equal 3
+        break
+    end
+end
+output i
+""", capsys) == ["1000000000000", "5", "3"]
+
+
+def test_range_needs_integer_bounds(capsys):
+    with pytest.raises(CLUError):
+        run("foreach i in range of 1 to 'x'\n    output i\nend", capsys)
+
+
+def test_return_leaves_loops_and_nested_calls(capsys):
+    assert run("""\
+function find -> xs/target
+    var position is 1
+    foreach x in xs
+        if x equal target
+            return position
+        end
+        var position is position add 1
+    end
+    return 0
+end
+function twice -> n
+    var found is find n 3
+    return found multiply 2
+end
+var xs is 5, 4, 3
+var a is find xs 4
+output a
+var b is find xs 9
+output b
+var c is twice xs
+output c
+""", capsys) == ["2", "0", "6"]
+
+
+def test_return_without_a_value(capsys):
+    assert run("""\
+function greet -> n
+    if n less 5
+        return
+    end
+    output n
+end
+greet 1
+greet 7
+""", capsys) == ["7"]
+
+
+def test_return_outside_a_function_is_rejected():
+    with pytest.raises(CLUError, match="'return' outside of a function"):
+        Parser().parse(["return 1"])
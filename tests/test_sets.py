@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, CLUError  # noqa: E402
+
+
+def run(source, capsys, **options):
+    interpreter = Interpreter(**options)
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.splitlines()
+
+
+def test_set_operations(capsys):
+    assert run("""\
+var vocab_words is 'good','great','fine','good'
+var vocab is set of vocab_words
+output vocab
+output len of vocab
+output contains of vocab, 'great'
+output contains of vocab, 'bad'
+var extra is 'bad','ok'
+output union of vocab, extra
+output intersection of vocab, vocab_words
+output difference of vocab, extra
+""", capsys) == ["{fine, good, great}", "3", "True", "False", "{bad, fine, good, great, ok}",
+                 "{fine, good, great}", "{fine, good, great}"]
+
+
+def test_foreach_over_a_set_is_sorted_by_text(capsys):
+    assert run("""\
+var items is 10, 9, 'b', 'a', 9
+var s is set of items
+foreach x in s
+    output x
+end
+""", capsys) == ["10", "9", "a", "b"]
+
+
+def test_sets_of_ranges_and_map_keys(capsys):
+    assert run("""\
+var r is range of 1 to 4
+var s is set of r
+output s
+var ages is {'amy': 21, 'bob': 19}
+var names is set of ages
+output contains of names, 'amy'
+""", capsys) == ["{1, 2, 3, 4}", "True"]
+
+
+def test_set_items_must_be_hashable(capsys):
+    with pytest.raises(CLUError):
+        run("var a is 1, 2\nvar b is a, a\nvar s is set of b", capsys)
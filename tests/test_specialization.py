@@ -0,0 +1,76 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, InlineCache  # noqa: E402
+
+
+def run(source, capsys, **options):
+    interpreter = Interpreter(**options)
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.split(), interpreter
+
+
+def test_stable_operand_types_take_the_fast_path(capsys):
+    out, interpreter = run("""\
+var total is 0
+foreach i in range of 1 to 1000
+    var total is total add i
+end
+output total
+""", capsys)
+    assert out == ["500500"]
+    stats = interpreter.specialization_stats()
+    assert stats["sites"] == 1 and stats["specialized_sites"] == 1
+    assert stats["generic"] == InlineCache.WARMUP
+    assert stats["hits"] == 1000 - InlineCache.WARMUP
+    assert stats["by_type"] == {"int add int": 1000 - InlineCache.WARMUP}
+
+
+def test_changing_types_deoptimize_and_keep_results_exact(capsys):
+    out, interpreter = run("""\
+var xs is 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 0.5, 2
+var total is 0
+foreach x in xs
+    var total is total add x
+end
+output total
+var s is 'a'
+foreach x in xs
+    var label is s + s
+end
+output label
+""", capsys)
+    assert out == ["57.5", "aa"]
+    stats = interpreter.specialization_stats()
+    assert stats["guard_misses"] >= 1
+    assert stats["by_type"]["int add int"] == 2
+
+
+def test_sites_that_keep_changing_stay_generic():
+    cache = InlineCache("add")
+    for _ in range(InlineCache.MAX_DEOPTS):
+        for _ in range(InlineCache.WARMUP):
+            cache.observe(int, int)
+        assert cache.fast is not None
+        cache.deoptimize()
+    for _ in range(InlineCache.WARMUP):
+        cache.observe(int, int)
+    assert cache.fast is None
+
+
+def test_function_operands_are_never_specialized(capsys):
+    out, interpreter = run("""\
+function three
+    return 3
+end
+var total is 0
+foreach i in range of 1 to 20
+    var total is total add three
+end
+output total
+""", capsys)
+    assert out == ["60"]
+    assert interpreter.specialization_stats()["specialized_sites"] == 0
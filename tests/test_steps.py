@@ -0,0 +1,98 @@
+import asyncio
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, CLUError  # noqa: E402
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "*.clu")))
+
+NESTED = """\
+function countdown -> n
+    if n equal 0
+        return
+    end
+    output n
+    var m is n subtract 1
+    countdown m
+end
+function total -> xs
+    var t is 0
+    foreach x in xs
+        if x less 0
+            continue
+        end
+        var t is t add x
+    end
+    return t
+end
+countdown 3
+var xs is 4, -1, 5
+var t is total xs
+output t
+var i is 0
+repeat i less 100
+    var i is i add 1
+    if i equal 5
+        break
+    end
+end
+output i
+"""
+
+
+def load(source):
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    return interpreter
+
+
+def outcome(interpreter, run, capsys):
+    """Output, final variables and error of a run"""
+    try:
+        run(interpreter)
+        error = None
+    except CLUError as e:
+        error = str(e)
+    return capsys.readouterr().out, repr(interpreter.variables), error
+
+
+def stepped(budget):
+    def run(interpreter):
+        for _ in interpreter.steps(budget):
+            pass
+    return run
+
+
+@pytest.mark.parametrize("budget", (1, 7, 1000))
+@pytest.mark.parametrize("path", EXAMPLES + ["nested"], ids=os.path.basename)
+def test_steps_match_run(capsys, path, budget):
+    source = NESTED if path == "nested" else open(path).read()
+    expected = outcome(load(source), Interpreter.run, capsys)
+    assert outcome(load(source), stepped(budget), capsys) == expected
+
+
+def test_steps_pause_every_budget_instructions(capsys):
+    interpreter = load("var i is 0\nrepeat i less 10\n    var i is i add 1\nend\noutput i")
+    counts = list(interpreter.steps(4))
+    assert counts == list(range(4, 4 * len(counts) + 1, 4))
+    assert capsys.readouterr().out == "10\n"
+    with pytest.raises(ValueError):
+        next(interpreter.steps(0))
+
+
+def test_programs_share_an_event_loop(capsys):
+    first = load("foreach i in range of 1 to 3\n    output 'a'\nend")
+    second = load("foreach i in range of 1 to 3\n    output 'b'\nend")
+
+    async def both():
+        await asyncio.gather(first.run_async(2), second.run_async(2))
+
+    asyncio.run(both())
+    out = capsys.readouterr().out.split()
+    assert sorted(out) == ["a", "a", "a", "b", "b", "b"]
+    assert out != ["a", "a", "a", "b", "b", "b"]
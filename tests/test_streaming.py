@@ -0,0 +1,53 @@
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, CLUError  # noqa: E402
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "*.clu")))
+
+
+@pytest.mark.parametrize("path", EXAMPLES, ids=os.path.basename)
+def test_run_stream_matches_run(capsys, path):
+    interpreter = Interpreter()
+    with open(path) as f:
+        interpreter.load_program(Parser().parse(f))
+    interpreter.run()
+    expected = capsys.readouterr().out
+    with open(path) as f:
+        Interpreter().run_stream(Parser().iter_parse(f))
+    assert capsys.readouterr().out == expected
+
+
+def test_statements_run_before_the_rest_is_read(capsys):
+    seen = []
+
+    def lines():
+        for line in ["output 'first'", "function f -> n", "    output n", "end", "f 2", "output 'last'"]:
+            seen.append(capsys.readouterr().out.split())
+            yield line
+
+    Interpreter().run_stream(Parser().iter_parse(lines()))
+    assert seen[1] == ["first"] and seen[5] == ["2"]
+    assert capsys.readouterr().out == "last\n"
+
+
+def test_items_are_yielded_per_top_level_block():
+    items = list(Parser().iter_parse(["var x is 1", "foreach i in range of 1 to 2", "    output i", "end",
+                                      "function f -> n", "    return n", "end"]))
+    assert [type(item).__name__ for item in items] == ["Instruction", "Instruction", "Function"]
+
+
+def test_syntax_errors_surface_when_their_line_is_reached(capsys):
+    with pytest.raises(CLUError):
+        Interpreter().run_stream(Parser().iter_parse(["output 'before'", "var is"]))
+    assert capsys.readouterr().out == "before\n"
+
+
+def test_functions_must_be_defined_above_their_first_call(capsys):
+    with pytest.raises(CLUError, match="'f' not defined"):
+        Interpreter().run_stream(Parser().iter_parse(["f 1", "function f -> n", "    output n", "end"]))
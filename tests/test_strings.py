@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter  # noqa: E402
+
+
+def run(source, capsys, **options):
+    interpreter = Interpreter(**options)
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.run()
+    return capsys.readouterr().out.splitlines()
+
+
+def test_growing_a_string_in_a_loop(capsys):
+    assert run("""\
+var s is ''
+foreach i in range of 1 to 5
+    var s is s + str of i + ','
+end
+output s
+output len of s
+output type of s
+if s equal '1,2,3,4,5,'
+    output 'same'
+end
+""", capsys) == ["1,2,3,4,5,", "10", "str", "same"]
+
+
+def test_copies_do_not_see_later_appends(capsys):
+    assert run("""\
+var s is 'ab'
+var s is s + 'c'
+var t is s
+var s is s + 'd'
+var words is t, s
+output t
+output s
+output words
+""", capsys) == ["abc", "abcd", "[abc, abcd]"]
+
+
+def test_appending_inside_a_function(capsys):
+    assert run("""\
+function join -> xs
+    var out is ''
+    foreach x in xs
+        var out is out + x
+    end
+    return out
+end
+var xs is 'a', 'b', 'c'
+var j is join xs
+var j2 is join xs
+output j + j2
+""", capsys) == ["abcabc"]
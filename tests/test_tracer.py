@@ -0,0 +1,51 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, ExecutionTracer  # noqa: E402
+
+NESTED = """\
+var inner is 1, 2
+var outer is inner, inner
+var k is 0
+var inner[1] is 99
+var mp is {'a': 1}
+var mp['x'] is inner
+var inner[2] is 7
+var z is 0
+"""
+
+
+def trace(source, capacity):
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    tracer = ExecutionTracer(interpreter, capacity)
+    tracer.run()
+    return tracer
+
+
+def test_replay_keeps_nested_containers_as_they_were():
+    tracer = trace(NESTED, 64)
+
+    state = tracer.state_at(3)
+    assert state == {"inner": [1, 2], "outer": [[1, 2], [1, 2]], "k": 0}
+
+    state = tracer.state_at(7)
+    assert state["outer"] == [[99, 7], [99, 7]]
+    assert state["mp"] == {"a": 1, "x": [99, 7]}
+    # Aliases stay shared in the rebuilt state
+    assert state["outer"][0] is state["inner"] and state["outer"][1] is state["inner"]
+    assert state["mp"]["x"] is state["inner"]
+
+
+def test_replay_from_keyframes_after_wrapping():
+    full = trace(NESTED, 64)
+    for capacity in (4, 5, 8):
+        tracer = trace(NESTED, capacity)
+        assert tracer.first_step > 0
+        for step in range(tracer.first_step, tracer.steps):
+            state = tracer.state_at(step)
+            assert state == full.state_at(step)
+            if "outer" in state:
+                assert state["outer"][0] is state["inner"]
@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, TypeInferencer, CLUTypeError  # noqa: E402
+
+PROGRAM = """\
+var xs is 1, 2, 3
+var total is 0
+foreach x in xs
+    var total is total add x
+end
+var half is total divide 4
+var ratio is 7.0 divide 2
+var name is 'a'
+var flag is True
+if flag
+    var mixed is 1
+otherwise
+    var mixed is 2.5
+end
+var counts is {}
+var r is range of 1 to 3
+var s is sum of xs
+output s
+output half
+output ratio
+"""
+
+
+def infer(source):
+    return TypeInferencer(Parser().parse(source.splitlines())).infer()
+
+
+def test_inferred_types():
+    assert infer(PROGRAM).variables["<main>"] == {
+        "xs": "list[int]", "total": "int", "x": "int", "half": "int", "ratio": "float", "name": "str",
+        "flag": "bool", "mixed": "number", "counts": "map", "r": "range", "s": "int",
+    }
+
+
+@pytest.mark.parametrize("source, message", [
+    ("var s is sum of 'abc'", "Line 1: Function 'sum' cannot be applied to str"),
+    ("var n is 5\nforeach x in n\n    output x\nend", "Line 2: Cannot loop over int"),
+])
+def test_type_errors_are_reported_before_running(capsys, source, message):
+    errors = infer(source).errors
+    assert [str(e) for e in errors][0].startswith(message)
+    interpreter = Interpreter(static_types=True)
+    with pytest.raises(CLUTypeError, match=message):
+        interpreter.load_program(Parser().parse(source.splitlines()))
+    assert capsys.readouterr().out == ""
+
+
+def test_static_types_give_the_same_output(capsys):
+    outputs = []
+    for static_types in (False, True):
+        interpreter = Interpreter(static_types=static_types)
+        interpreter.load_program(Parser().parse(PROGRAM.splitlines()))
+        interpreter.run()
+        outputs.append(capsys.readouterr().out)
+    assert outputs[0] == outputs[1] == "6\n1\n3.5\n"
+
+
+def test_proven_operations_skip_warm_up(capsys):
+    interpreter = Interpreter(static_types=True)
+    interpreter.load_program(Parser().parse(PROGRAM.splitlines()))
+    interpreter.run()
+    stats = interpreter.specialization_stats()
+    assert stats["sites"] == stats["specialized_sites"] == 3
+    assert stats["generic"] == 0 and stats["hits"] == 5
+
+
+def test_loading_a_specialized_program_again(capsys):
+    program = Parser().parse(PROGRAM.splitlines())
+    for _ in range(2):
+        interpreter = Interpreter(static_types=True)
+        interpreter.load_program(program)
+        interpreter.run()
+        assert capsys.readouterr().out == "6\n1\n3.5\n"
@@ -0,0 +1,65 @@
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Validator, Diagnostic  # noqa: E402
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "*.clu")))
+
+SOURCE = """\
+var x is 5
+output y
+var s is frob of x
+function f -> a/b
+    return a add b
+end
+f 1
+if x greater 2
+    output x
+end
+end
+var t is 1 2
+repeat x less 3
+"""
+
+
+def test_every_problem_is_reported_at_once():
+    assert Validator().validate(SOURCE) == [
+        Diagnostic(2, 8, "Variable 'y' is not defined"),
+        Diagnostic(3, 10, "Unknown built-in function 'frob'"),
+        Diagnostic(7, 1, "Function 'f' expects 2 arguments, got 1"),
+        Diagnostic(11, 1, "'end' without an open block"),
+        Diagnostic(12, 12, "Unexpected '2': the rest of the expression is ignored", "warning"),
+        Diagnostic(13, 1, "'repeat' block is missing its 'end'"),
+    ]
+
+
+@pytest.mark.parametrize("path", EXAMPLES, ids=os.path.basename)
+def test_examples_have_no_errors(path):
+    with open(path) as f:
+        assert [d for d in Validator().validate(f.read()) if d.severity == "error"] == []
+
+
+def test_revalidating_after_edits():
+    validator = Validator()
+    lines = SOURCE.splitlines()
+    assert len(validator.validate(lines)) == 6
+    lines[1] = "output x"
+    lines[3] = "function f -> a"
+    lines[4] = "    return a"
+    diagnostics = validator.validate(lines)
+    assert [d.line for d in diagnostics] == [3, 11, 12, 13]
+    assert validator.validate(lines) == diagnostics
+
+
+def test_validate_response():
+    validator = Validator()
+    assert validator.validate_response("var x is 1\noutput x") == {"valid": True, "error": None, "diagnostics": []}
+    response = validator.validate_response("var x is 1 2\noutput y")
+    assert response["valid"] is False
+    assert response["error"] == "Line 2: Variable 'y' is not defined"
+    assert [d["severity"] for d in response["diagnostics"]] == ["warning", "error"]
@@ -0,0 +1,80 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clucore import Parser, Interpreter, VariableWatcher  # noqa: E402
+
+
+def watch(source, interval=0.0, **variables):
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse(source.splitlines()))
+    interpreter.variables.update(variables)
+    published = []
+    VariableWatcher(interpreter, published.append, interval).run()
+    return published
+
+
+def final(published):
+    """name -> (summary, type) of the last publication of each variable"""
+    return {change.name: (change.summary, change.type_name) for changes in published for change in changes}
+
+
+def test_summaries_of_nested_values(capsys):
+    values = final(watch("""\
+var counts is {'a': 1}
+var words is 'hi'
+var pair is 1, 2
+var pair[2] is 3, 4
+""", nested=[1, [[[7, 8], 6], 4]], big=list(range(100))))
+    assert values["nested"] == ("[1, [[[2 items], 6], 4]]", "list")
+    assert values["pair"] == ("[1, [3, 4]]", "list")
+    assert values["counts"] == ("{'a': 1}", "map")
+    assert values["words"] == ("'hi'", "str")
+    assert values["big"] == ("[0, 1, 2, 3, 4, ... (100 items)]", "list")
+
+
+def test_summaries_stay_short(capsys):
+    values = final(watch("var outer is inner, inner, inner", inner=list(range(10 ** 6)), text="x" * 10 ** 6))
+    assert values["outer"][0].startswith("[[0, 1, 2, 3, 4, ...")
+    assert len(values["outer"][0]) <= 80 and len(values["text"][0]) <= 80
+
+
+def test_changes_are_coalesced_per_publication(capsys):
+    published = watch("""\
+var total is 0
+foreach i in range of 1 to 1000
+    var total is total add i
+end
+""", interval=3600)
+    assert len(published) == 1
+    assert sorted((change.name, change.summary, change.line) for change in published[0]) == [
+        ("i", "1000", None), ("total", "500500", 3)]
+
+
+def test_counted_loops_publish_while_running(capsys):
+    interpreter = Interpreter()
+    interpreter.load_program(Parser().parse("var i is 0\nrepeat i less 600\n    var i is i add 1\nend".splitlines()))
+    published = []
+    watcher = VariableWatcher(interpreter, published.append, interval=0.0)
+    watcher.run()
+    assert len(published) == 600 // VariableWatcher.CHECK_EVERY + 1
+    assert [change.line for change in published[0]] == [3]
+    assert published[-1][0].summary == "600"
+    assert interpreter.watcher is None
+
+
+def test_function_locals_disappear_after_the_call(capsys):
+    published = watch("""\
+function slow -> n
+    var k is 0
+    repeat k less 300
+        var k is k add 1
+    end
+    return k
+end
+var r is slow 1
+""")
+    changes = [(change.name, change.summary) for changes in published for change in changes]
+    assert ("k", None) in changes and ("n", None) in changes
+    assert final(published)["r"] == ("300", "int")